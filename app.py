@@ -1,7 +1,7 @@
-from flask import Flask, render_template, request, jsonify, redirect, url_for, session, send_file
-import stripe
+from flask import Flask, Response, render_template, request, jsonify, redirect, url_for, session, send_file, stream_with_context
 import os
 import json
+import math
 
 from utils.db import (
     get_user_by_email,
@@ -12,31 +12,46 @@ from utils.db import (
     delete_user_by_id,
     reset_scans,
     make_admin,
+    increment_scans_used,
 )
 
-from utils.analyzer import run_local_seo_analysis
-from utils.pdf_builder import build_pdf
-
-import psycopg2
 import io
+import queue
+import threading
+
+from utils.assets import init_assets, render_public
+from utils.memory import init_memory
+
+# Heavy subsystems (stripe, reportlab via pdf_builder, bs4/requests via
+# analyzer, openai via ai_tools) are imported inside the routes that use
+# them, so booting a worker that only serves / or /pricing stays cheap.
+# gunicorn.conf.py preloads the shared ones in the master before forking.
 
 
 app = Flask(__name__)
 app.secret_key = os.environ.get("FLASK_SECRET", "super-secret-key")
+init_assets(app)
+init_memory(app)
 
 # Stripe keys
-stripe.api_key = os.environ.get("STRIPE_SECRET_KEY")
+STRIPE_SECRET_KEY = os.environ.get("STRIPE_SECRET_KEY")
 STRIPE_PUBLIC_KEY = os.environ.get("STRIPE_PUBLIC_KEY")
 STRIPE_PRICE_ID = os.environ.get("STRIPE_PRICE_ID")
 WEBHOOK_SECRET = os.environ.get("WEBHOOK_SECRET")
 
 
+def get_stripe():
+    import stripe
+    stripe.api_key = STRIPE_SECRET_KEY
+    return stripe
+
+
 # ===============================================================
 # HOME
 # ===============================================================
 @app.route("/")
 def index():
-    return render_template("landing.html")
+    return render_public("landing.html")
 
 
 # ===============================================================
@@ -104,7 +119,7 @@ def dashboard():
 # ===============================================================
 @app.route("/pricing")
 def pricing():
-    return render_template("pricing.html", stripe_public_key=STRIPE_PUBLIC_KEY)
+    return render_public("pricing.html", stripe_public_key=STRIPE_PUBLIC_KEY)
 
 
 @app.route("/create-checkout-session", methods=["POST"])
@@ -112,6 +127,8 @@ def create_checkout_session():
     if "user_email" not in session:
         return jsonify({"error": "Not logged in"}), 401
 
+    stripe = get_stripe()
+
     try:
         checkout_session = stripe.checkout.Session.create(
             mode="subscription",
@@ -144,6 +161,7 @@ def cancel():
 def webhook():
     payload = request.data
     sig_header = request.headers.get("stripe-signature")
+    stripe = get_stripe()
 
     try:
         event = stripe.Webhook.construct_event(payload, sig_header, WEBHOOK_SECRET)
@@ -160,6 +178,10 @@ def webhook():
         subscription_id = data.get("subscription")
 
         if email:
+            user = get_user_by_email(email)
+            if user and not user["is_pro"]:
+                from utils.api_tokens import revoke_tokens
+                revoke_tokens(user["id"])
             update_subscription_by_email(
                 email=email,
                 stripe_customer_id=customer_id,
@@ -179,6 +201,10 @@ def webhook():
 
         user = get_user_by_subscription(sub_id)
         if user:
+            # API tokens carry the plan; a change has to end the old ones
+            if bool(user["is_pro"]) != (status == "active"):
+                from utils.api_tokens import revoke_tokens
+                revoke_tokens(user["id"])
             update_subscription_by_email(
                 email=user["email"],
                 stripe_customer_id=customer_id,
@@ -203,6 +229,24 @@ def logout():
 # ===============================================================
 # ANALYZER /scan
 # ===============================================================
+def consume_scan(user):
+    """Free limit enforcement; returns an error code or None."""
+    if not user["is_pro"]:
+        if user["scans_used"] >= 2:
+            return "limit"
+        increment_scans_used(user["email"])
+    return None
+
+
+def competitor_summary(main, competitor):
+    """Competitor scores plus the hashed TF-IDF content gap against main."""
+    from utils.content_gap import content_gap
+
+    data = competitor.summary()
+    data["content_gap"] = content_gap(main, [competitor]) if main.ok and competitor.ok else None
+    return data
+
+
 @app.route("/scan", methods=["POST"])
 def scan():
     if "user_email" not in session:
@@ -215,70 +259,435 @@ def scan():
 
     user = get_user_by_email(session["user_email"])
 
-    # Free limit enforcement
-    if not user["is_pro"]:
-        if user["scans_used"] >= 2:
-            return jsonify({"error": "limit"})
-        conn = psycopg2.connect(os.environ["DB_URL"], sslmode="require")
-        cur = conn.cursor()
-        cur.execute("UPDATE users SET scans_used = scans_used + 1 WHERE email = %s", (user["email"],))
-        conn.commit()
-        cur.close()
-        conn.close()
+    error = consume_scan(user)
+    if error:
+        return jsonify({"error": error})
+
+    from utils.analyzer import run_local_seo_analysis
+    from utils.history import record_scan
 
     # Main scan
-    (
-        main_score,
-        audit,
-        tips,
-        content,
-        tech,
-        keyword_score,
-        onpage,
-        links,
-        page_meta,
-    ) = run_local_seo_analysis(url, keyword)
-
-    result = {
-        "score": main_score,
-        "audit": audit,
-        "tips": tips,
-        "content": content,
-        "technical": tech,
-        "keyword": keyword_score,
-        "onpage": onpage,
-        "links": links,
-        "page_meta": page_meta,
-    }
+    main = run_local_seo_analysis(url, keyword)
+    record_scan(user["id"], url, keyword, main)
+
+    result = main.to_dict()
 
     # Competitor scan (Pro only)
     if competitor_url and user["is_pro"]:
-        (
-            c_score,
-            c_audit,
-            c_tips,
-            c_content,
-            c_tech,
-            c_keyword,
-            c_onpage,
-            c_links,
-            _
-        ) = run_local_seo_analysis(competitor_url, keyword)
-
-        result["competitor_data"] = {
-            "content": c_content,
-            "technical": c_tech,
-            "keyword": c_keyword,
-            "onpage": c_onpage,
-            "links": c_links,
-            "score": c_score
-        }
+        competitor = run_local_seo_analysis(competitor_url, keyword)
+        result["competitor_data"] = competitor_summary(main, competitor)
     else:
         result["competitor_data"] = None
 
     return jsonify(result)
 
 
+# ===============================================================
+# COMPETITOR MATRIX (main page + N competitors, Pro only)
+# ===============================================================
+@app.route("/scan/matrix", methods=["POST"])
+def scan_matrix():
+    if "user_email" not in session:
+        return jsonify({"error": "not_logged_in"}), 401
+
+    user = get_user_by_email(session["user_email"])
+    if not user["is_pro"]:
+        return jsonify({"error": "pro_only"}), 403
+
+    data = request.get_json() or {}
+    url = data.get("url")
+    keyword = data.get("keyword") or None
+    if not url:
+        return jsonify({"error": "missing_url"}), 400
+
+    from utils.competitors import analyze_all, competitor_matrix, matrix_urls
+    from utils.history import record_scan
+
+    competitor_urls = matrix_urls(url, data.get("competitors"))
+    if not competitor_urls:
+        return jsonify({"error": "missing_competitors"}), 400
+
+    # All pages at once: latency follows the slowest page, not the sum
+    main, *competitors = analyze_all([url] + competitor_urls, keyword)
+    record_scan(user["id"], url, keyword, main)
+
+    return jsonify(competitor_matrix(url, main, competitor_urls, competitors, keyword))
+
+
+# ===============================================================
+# ANALYZER /scan/stream (live progress over server-sent events)
+# ===============================================================
+# Stage events: fetched, parsed, content_scored (partial scores), links
+# (n/total checked), delivery, done; then `result`, and for Pro users
+# the same sequence prefixed with `competitor_`. The scan runs in a worker thread;
+# when the browser disconnects the generator is closed, which sets
+# `cancel` and stops the scan at its next checkpoint.
+# It is a JSON POST like /scan (read with fetch(), not EventSource): a
+# cross-site link or form can't send a JSON body without a CORS
+# preflight, so it can't spend the user's scans.
+SCAN_KEEPALIVE_SECONDS = 15
+
+
+@app.route("/scan/stream", methods=["POST"])
+def scan_stream():
+    def single(event, data):
+        return Response(sse_event(event, data), mimetype="text/event-stream")
+
+    if "user_email" not in session:
+        return single("scan_error", {"error": "not_logged_in"})
+
+    data = request.get_json(silent=True) or {}
+    url = data.get("url")
+    keyword = data.get("keyword") or None
+    competitor_url = data.get("competitor") or None
+    if not url:
+        return single("scan_error", {"error": "missing_url"})
+
+    user = get_user_by_email(session["user_email"])
+
+    error = consume_scan(user)
+    if error:
+        return single("scan_error", {"error": error})
+
+    from utils.analyzer import ScanCancelled, run_local_seo_analysis
+    from utils.history import record_scan
+
+    events = queue.Queue()
+    cancel = threading.Event()
+
+    def progress_to(prefix):
+        return lambda stage, data: events.put((prefix + stage, data))
+
+    def work():
+        try:
+            main = run_local_seo_analysis(url, keyword, progress=progress_to(""), cancel=cancel)
+            record_scan(user["id"], url, keyword, main)
+            events.put(("result", main.to_dict()))
+
+            if competitor_url and user["is_pro"]:
+                competitor = run_local_seo_analysis(
+                    competitor_url, keyword, progress=progress_to("competitor_"), cancel=cancel
+                )
+                events.put(("competitor_result", competitor_summary(main, competitor)))
+        except ScanCancelled:
+            print("SCAN STREAM: cancelled", url)
+        except Exception as e:
+            print("SCAN STREAM ERROR:", e)
+            events.put(("scan_error", {"error": "scan_failed"}))
+        finally:
+            events.put(None)
+
+    threading.Thread(target=work, name="scan-stream", daemon=True).start()
+
+    def stream():
+        try:
+            while True:
+                try:
+                    item = events.get(timeout=SCAN_KEEPALIVE_SECONDS)
+                except queue.Empty:
+                    # Comment line: keeps proxies from timing out and lets
+                    # the server notice a dead client.
+                    yield ": keepalive\n\n"
+                    continue
+                if item is None:
+                    yield sse_event("end", {})
+                    break
+                yield sse_event(*item)
+        finally:
+            cancel.set()
+
+    return Response(
+        stream(),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+# ===============================================================
+# SCAN HISTORY (trends from daily rollups)
+# ===============================================================
+@app.route("/history")
+def history():
+    if "user_email" not in session:
+        return jsonify({"error": "not_logged_in"}), 401
+
+    from utils.history import latest_urls, recent_scans, score_trend
+
+    user = get_user_by_email(session["user_email"])
+    url = request.args.get("url")
+
+    if not url:
+        return jsonify({
+            "urls": [
+                {"url": r["url"], "day": r["day"].isoformat(), "score": r["last_score"]}
+                for r in latest_urls(user["id"])
+            ]
+        })
+
+    days = min(int(request.args.get("days", 90)), 730)
+
+    return jsonify({
+        "url": url,
+        "trend": [
+            {
+                "day": r["day"].isoformat(),
+                "scans": r["scans"],
+                "avg_score": round(r["avg_score"], 1),
+                "min": r["score_min"],
+                "max": r["score_max"],
+                "last": r["last_score"],
+            }
+            for r in score_trend(user["id"], url, days)
+        ],
+        "recent": [
+            {
+                "id": r["id"],
+                "scanned_at": r["scanned_at"].isoformat(),
+                "score": r["score"],
+                "content": r["content"],
+                "technical": r["technical"],
+                "keyword": r["keyword_score"],
+                "onpage": r["onpage"],
+                "links": r["links"],
+            }
+            for r in recent_scans(user["id"], url)
+        ],
+    })
+
+
+# ===============================================================
+# NEAR-DUPLICATE PAGES (SimHash groups over scanned pages)
+# ===============================================================
+@app.route("/duplicates")
+def duplicates():
+    if "user_email" not in session:
+        return jsonify({"error": "not_logged_in"}), 401
+
+    from utils.near_dup import duplicate_groups, similar_pages
+
+    user = get_user_by_email(session["user_email"])
+    url = request.args.get("url")
+
+    if url:
+        return jsonify({"url": url, "similar": similar_pages(user["id"], url)})
+    return jsonify({"groups": duplicate_groups(user["id"])})
+
+
+# ===============================================================
+# INTERNAL LINK GRAPH (orphans, click depth, PageRank per site)
+# ===============================================================
+@app.route("/link-graph")
+def link_graph():
+    if "user_email" not in session:
+        return jsonify({"error": "not_logged_in"}), 401
+
+    site = (request.args.get("site") or "").strip()
+    if not site:
+        return jsonify({"error": "missing_site"}), 400
+
+    from utils.link_graph import site_graph, site_of
+
+    user = get_user_by_email(session["user_email"])
+    site = site_of(site if "://" in site else f"https://{site}")
+    return jsonify(site_graph(user["id"], site))
+
+
+# ===============================================================
+# MONITORS (scheduled re-scans, Pro only)
+# ===============================================================
+@app.route("/monitors", methods=["GET", "POST"])
+def monitors():
+    if "user_email" not in session:
+        return jsonify({"error": "not_logged_in"}), 401
+
+    user = get_user_by_email(session["user_email"])
+    if not user["is_pro"]:
+        return jsonify({"error": "pro_only"}), 403
+
+    from utils.scheduler import add_monitor, list_monitors, recent_alerts
+
+    if request.method == "POST":
+        data = request.get_json() or {}
+        if not data.get("url"):
+            return jsonify({"error": "missing_url"}), 400
+        try:
+            interval_hours = float(data.get("interval_hours", 24))
+        except (TypeError, ValueError):
+            return jsonify({"error": "bad_interval"}), 400
+        # interval_seconds is an INTEGER column; a year is plenty
+        if not math.isfinite(interval_hours) or interval_hours > 24 * 365:
+            return jsonify({"error": "bad_interval"}), 400
+        monitor_id = add_monitor(user["id"], data["url"], data.get("keyword"), interval_hours)
+        if monitor_id is None:
+            return jsonify({"error": "monitor_limit"}), 400
+        return jsonify({"id": monitor_id})
+
+    return jsonify({
+        "monitors": [
+            {
+                "id": m["id"],
+                "url": m["url"],
+                "keyword": m["keyword"],
+                "interval_hours": m["interval_seconds"] / 3600,
+                "next_run_at": m["next_run_at"].isoformat(),
+                "last_run_at": m["last_run_at"].isoformat() if m["last_run_at"] else None,
+                "last_scores": m["last_scores"],
+            }
+            for m in list_monitors(user["id"])
+        ],
+        "alerts": [
+            {
+                "id": a["id"],
+                "monitor_id": a["monitor_id"],
+                "url": a["url"],
+                "previous_score": a["previous_score"],
+                "score": a["score"],
+                "details": a["details"],
+                "created_at": a["created_at"].isoformat(),
+            }
+            for a in recent_alerts(user["id"])
+        ],
+    })
+
+
+@app.route("/monitors/<int:monitor_id>/delete", methods=["POST"])
+def delete_monitor(monitor_id):
+    if "user_email" not in session:
+        return jsonify({"error": "not_logged_in"}), 401
+
+    from utils.scheduler import remove_monitor
+
+    user = get_user_by_email(session["user_email"])
+    remove_monitor(user["id"], monitor_id)
+    return jsonify({"ok": True})
+
+
+# ===============================================================
+# SITE CRAWLS (frontier worked by `crawler` processes, Pro only)
+# ===============================================================
+@app.route("/crawls", methods=["POST"])
+def create_crawl():
+    if "user_email" not in session:
+        return jsonify({"error": "not_logged_in"}), 401
+
+    user = get_user_by_email(session["user_email"])
+    if not user["is_pro"]:
+        return jsonify({"error": "pro_only"}), 403
+
+    data = request.get_json() or {}
+    if not data.get("url"):
+        return jsonify({"error": "missing_url"}), 400
+
+    from utils.crawler import CRAWL_MAX_DEPTH, CRAWL_MAX_PAGES, start_crawl
+
+    crawl_id = start_crawl(
+        user["id"], data["url"], data.get("keyword"),
+        int(data.get("max_pages", CRAWL_MAX_PAGES)), int(data.get("max_depth", CRAWL_MAX_DEPTH))
+    )
+    if crawl_id is None:
+        return jsonify({"error": "crawl_limit"}), 400
+    return jsonify({"id": crawl_id})
+
+
+@app.route("/crawls/<int:crawl_id>")
+def crawl_progress(crawl_id):
+    if "user_email" not in session:
+        return jsonify({"error": "not_logged_in"}), 401
+
+    from utils.crawler import crawl_status
+
+    user = get_user_by_email(session["user_email"])
+    status = crawl_status(user["id"], crawl_id)
+    if status is None:
+        return jsonify({"error": "not_found"}), 404
+    return jsonify(status)
+
+
+# ===============================================================
+# API TOKENS (issued from a session, used as Bearer on /api/v1)
+# ===============================================================
+@app.route("/api/tokens", methods=["GET", "POST"])
+def api_tokens():
+    if "user_email" not in session:
+        return jsonify({"error": "not_logged_in"}), 401
+
+    from utils.api_tokens import issue_token, list_tokens, tokens_enabled
+
+    user = get_user_by_email(session["user_email"])
+    if request.method == "GET":
+        return jsonify([
+            {
+                "jti": row["jti"],
+                "plan": row["plan"],
+                "label": row["label"],
+                "created_at": row["created_at"].isoformat(),
+                "expires_at": row["expires_at"].isoformat(),
+                "revoked": row["revoked_at"] is not None,
+            }
+            for row in list_tokens(user["id"])
+        ])
+
+    if not tokens_enabled():
+        return jsonify({"error": "api_tokens_disabled"}), 503
+    issued = issue_token(user, (request.get_json(silent=True) or {}).get("label"))
+    if issued is None:
+        return jsonify({"error": "token_limit"}), 400
+    token, jti, expires_at = issued
+    return jsonify({"token": token, "jti": jti, "expires_at": expires_at.isoformat()})
+
+
+@app.route("/api/tokens/<jti>/revoke", methods=["POST"])
+def revoke_api_token(jti):
+    if "user_email" not in session:
+        return jsonify({"error": "not_logged_in"}), 401
+
+    from utils.api_tokens import revoke_tokens
+
+    user = get_user_by_email(session["user_email"])
+    if not revoke_tokens(user["id"], jti):
+        return jsonify({"error": "not_found"}), 404
+    return jsonify({"ok": True})
+
+
+def api_auth():
+    """(claims, None) or (None, error response); signature + memory only."""
+    from utils.api_tokens import authorize
+
+    claims, error = authorize(request.headers.get("Authorization"))
+    if error:
+        code, status, headers = error
+        return None, (jsonify({"error": code}), status, headers)
+    return claims, None
+
+
+@app.route("/api/v1/whoami")
+def api_whoami():
+    claims, error = api_auth()
+    if error:
+        return error
+    return jsonify({"user_id": claims["uid"], "plan": claims["plan"]}), 200, claims["rate_headers"]
+
+
+@app.route("/api/v1/scan", methods=["POST"])
+def api_scan():
+    claims, error = api_auth()
+    if error:
+        return error
+    if claims["plan"] != "pro":
+        return jsonify({"error": "pro_only"}), 403, claims["rate_headers"]
+
+    data = request.get_json(silent=True) or {}
+    if not data.get("url"):
+        return jsonify({"error": "missing_url"}), 400, claims["rate_headers"]
+
+    from utils.analyzer import run_local_seo_analysis
+    from utils.history import record_scan
+
+    main = run_local_seo_analysis(data["url"], data.get("keyword"))
+    record_scan(claims["uid"], data["url"], data.get("keyword"), main)
+    return jsonify(main.to_dict()), 200, claims["rate_headers"]
+
+
 # ===============================================================
 # NEW → WORKING /export-pdf POST ROUTE
 # ===============================================================
@@ -306,6 +715,8 @@ def export_pdf():
 
     competitor_data = data.get("competitor_data")
 
+    from utils.pdf_builder import build_pdf
+
     try:
         pdf_bytes = build_pdf(
             user_data=user,
@@ -346,53 +757,15 @@ def pdf_download():
     if not url:
         return "Missing URL", 400
 
-    (
-        score,
-        audit,
-        tips,
-        content,
-        tech,
-        keyword_score,
-        onpage,
-        links,
-        _
-    ) = run_local_seo_analysis(url, keyword)
+    from utils.analyzer import run_local_seo_analysis
+    from utils.pdf_builder import build_pdf
 
-    analysis_data = {
-        "score": score,
-        "audit": audit,
-        "tips": tips,
-        "content": content,
-        "technical": tech,
-        "keyword": keyword_score,
-        "onpage": onpage,
-        "links": links
-    }
+    result = run_local_seo_analysis(url, keyword)
+    analysis_data = result.to_dict()
 
     competitor_data = None
     if competitor:
-        (
-            c_score,
-            c_audit,
-            c_tips,
-            c_content,
-            c_tech,
-            c_keyword,
-            c_onpage,
-            c_links,
-            _
-        ) = run_local_seo_analysis(competitor, keyword)
-
-        competitor_data = {
-            "score": c_score,
-            "audit": c_audit,
-            "tips": c_tips,
-            "content": c_content,
-            "technical": c_tech,
-            "keyword": c_keyword,
-            "onpage": c_onpage,
-            "links": c_links
-        }
+        competitor_data = run_local_seo_analysis(competitor, keyword).to_dict()
 
     pdf_bytes = build_pdf(
         user_data=user,
@@ -411,6 +784,124 @@ def pdf_download():
     )
 
 
+# ===============================================================
+# BULK EXPORT (streamed CSV / JSONL / XLSX, Pro only)
+# ===============================================================
+@app.route("/export/scans")
+def export_scans():
+    if "user_email" not in session:
+        return jsonify({"error": "not_logged_in"}), 401
+
+    user = get_user_by_email(session["user_email"])
+    if not user["is_pro"]:
+        return jsonify({"error": "pro_only"}), 403
+
+    from utils.export import FORMATS, export_snapshot, export_stream
+
+    fmt = request.args.get("format", "csv")
+    if fmt not in FORMATS:
+        return jsonify({"error": "unknown_format"}), 400
+    try:
+        after_id = int(request.args.get("after_id", 0))
+        snapshot = int(request.args.get("snapshot") or export_snapshot(user["id"]))
+    except ValueError:
+        return jsonify({"error": "bad_cursor"}), 400
+
+    mimetype, extension = FORMATS[fmt]
+    # xlsx is already a zip; gzip only the text formats
+    gzip = fmt != "xlsx" and "gzip" in request.headers.get("Accept-Encoding", "")
+    chunks = export_stream(
+        fmt, user["id"], snapshot, after_id,
+        url=request.args.get("url") or None,
+        detail=request.args.get("detail") == "1",
+        gzip=gzip,
+    )
+
+    headers = {
+        "Content-Disposition": f'attachment; filename="scans-{snapshot}.{extension}"',
+        # Resume with ?snapshot=<this>&after_id=<last id received>
+        "X-Export-Snapshot": str(snapshot),
+        "Accept-Ranges": "none",
+        "Cache-Control": "no-store",
+        "X-Accel-Buffering": "no",
+    }
+    if gzip:
+        headers["Content-Encoding"] = "gzip"
+        headers["Vary"] = "Accept-Encoding"
+    return Response(stream_with_context(chunks), mimetype=mimetype, headers=headers)
+
+
+# ===============================================================
+# AI TOOLS (full response + server-sent events stream)
+# ===============================================================
+AI_TOOL_KINDS = ("title", "meta", "keywords", "rewrite")
+
+
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@app.route("/ai/<kind>", methods=["POST"])
+def ai_generate(kind):
+    if "user_email" not in session:
+        return jsonify({"error": "not_logged_in"}), 401
+    if kind not in AI_TOOL_KINDS:
+        return jsonify({"error": "unknown_tool"}), 404
+
+    data = request.form or request.get_json(silent=True) or {}
+    url = data.get("url")
+    if not url:
+        return jsonify({"error": "missing_url"}), 400
+
+    from utils.analyzer import extract_page_context
+    from utils.ai_tools import PROMPTS, complete
+
+    user = get_user_by_email(session["user_email"])
+    prompt = PROMPTS[kind](url, extract_page_context(url), data.get("keyword") or None)
+    return jsonify({"result": complete(prompt, user["id"])})
+
+
+# POST with a JSON body, like /scan/stream: a cross-site <img> or link
+# cannot spend the user's OpenAI quota, and a cross-site form cannot send
+# application/json without a CORS preflight.
+@app.route("/ai/<kind>/stream", methods=["POST"])
+def ai_stream(kind):
+    if "user_email" not in session:
+        return jsonify({"error": "not_logged_in"}), 401
+    if kind not in AI_TOOL_KINDS:
+        return jsonify({"error": "unknown_tool"}), 404
+
+    data = request.get_json(silent=True) or {}
+    url = data.get("url")
+    if not url:
+        return jsonify({"error": "missing_url"}), 400
+
+    from utils.analyzer import extract_page_context
+    from utils.ai_tools import PROMPTS, stream_completion
+
+    user = get_user_by_email(session["user_email"])
+
+    # `start` goes out before the page fetch, so the browser hears back
+    # at once. When the browser goes away the WSGI server closes this
+    # generator, which closes `tokens` and with it the upstream OpenAI
+    # stream.
+    def events():
+        yield sse_event("start", {"kind": kind})
+        prompt = PROMPTS[kind](url, extract_page_context(url), data.get("keyword") or None)
+        tokens = stream_completion(prompt, user["id"])
+        try:
+            for event, payload in tokens:
+                yield sse_event(event, payload)
+        finally:
+            tokens.close()
+
+    return Response(
+        stream_with_context(events()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 # ===============================================================
 # ADMIN ROUTES
 # ===============================================================
@@ -422,6 +913,9 @@ def admin_users():
 
 @app.route("/admin/delete/<int:user_id>")
 def admin_delete_user(user_id):
+    # Signed tokens stay valid until revoked, even once the user is gone
+    from utils.api_tokens import revoke_tokens
+    revoke_tokens(user_id)
     delete_user_by_id(user_id)
     return redirect("/admin/users")
 
@@ -438,6 +932,21 @@ def admin_make_admin_route(user_id):
     return redirect("/admin/users")
 
 
+@app.route("/admin/memory")
+def admin_memory():
+    if "user_email" not in session:
+        return jsonify({"error": "not_logged_in"}), 401
+
+    user = get_user_by_email(session["user_email"])
+    if not user["is_admin"]:
+        return jsonify({"error": "admin_only"}), 403
+
+    from utils.memory import heap_report
+
+    # ?reset=1 makes this snapshot the baseline for the next growth report
+    return jsonify(heap_report(reset_baseline=request.args.get("reset") == "1"))
+
+
 # ===============================================================
 # RUN LOCAL
 # ===============================================================
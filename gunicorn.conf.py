@@ -0,0 +1,49 @@
+import gc
+import importlib
+import os
+
+# ===============================================================
+# GUNICORN CONFIG
+# ===============================================================
+# The app module itself imports almost nothing heavy. Here the master
+# preloads the subsystems most workers end up needing, then freezes the
+# GC so those objects are never touched again, and forks. Workers then
+# share those pages copy-on-write instead of each importing its own copy.
+
+workers = int(os.environ.get("WEB_CONCURRENCY", 2))
+threads = int(os.environ.get("GUNICORN_THREADS", 1))
+preload_app = os.environ.get("GUNICORN_PRELOAD", "1") == "1"
+
+# Shared by most requests; stripe/openai/reportlab stay lazy (rare routes)
+PRELOAD_MODULES = [
+    "psycopg2",
+    "psycopg2.extras",
+    "requests",
+    "bs4",
+    "utils.analyzer",
+]
+
+
+def on_starting(server):
+    if not preload_app:
+        return
+    for module in PRELOAD_MODULES:
+        importlib.import_module(module)
+
+
+def when_ready(server):
+    if preload_app:
+        gc.collect()
+        gc.freeze()
+
+
+def post_fork(server, worker):
+    from utils.startup import proc_memory_kb
+    memory = proc_memory_kb()
+    server.log.info("worker %s booted rss=%skB pss=%skB", worker.pid, memory["rss_kb"], memory["pss_kb"])
+
+    # Each web worker owns its analyzer pool; start it now so the first
+    # scans don't pay for spawning and importing
+    from utils.workers import pool_enabled, prewarm_pool
+    if pool_enabled():
+        server.log.info("worker %s analyzer pool ready: %s", worker.pid, prewarm_pool())
@@ -7,7 +7,7 @@ function saveURL() {
     fetch("/save_url", {
         method: "POST",
         headers: { "Content-Type": "application/x-www-form-urlencoded" },
-        body: "url=" + encodeURIComponent(url)
+        body: "url=" + encodeURIComponent(url) + "&keyword=" + encodeURIComponent(aiKeyword())
     })
     .then(res => res.json())
     .then(data => {
@@ -27,7 +27,7 @@ function analyzeURL() {
     fetch("/analyze_url", {
         method: "POST",
         headers: { "Content-Type": "application/x-www-form-urlencoded" },
-        body: "url=" + encodeURIComponent(url)
+        body: "url=" + encodeURIComponent(url) + "&keyword=" + encodeURIComponent(aiKeyword())
     })
     .then(res => res.json())
     .then(data => {
@@ -45,6 +45,11 @@ function analyzeURL() {
 // ----------------------
 // HELPER: RUN AI ENDPOINT
 // ----------------------
+function aiKeyword() {
+    let input = document.getElementById("keywordInput");
+    return input ? input.value : "";
+}
+
 function runAI(endpoint, outputBoxId) {
     let url = document.getElementById("urlInput").value;
 
@@ -53,7 +58,7 @@ function runAI(endpoint, outputBoxId) {
     fetch(`/ai/${endpoint}`, {
         method: "POST",
         headers: { "Content-Type": "application/x-www-form-urlencoded" },
-        body: "url=" + encodeURIComponent(url)
+        body: "url=" + encodeURIComponent(url) + "&keyword=" + encodeURIComponent(aiKeyword())
     })
     .then(res => res.json())
     .then(data => {
@@ -62,6 +67,75 @@ function runAI(endpoint, outputBoxId) {
 }
 
 
+// ----------------------
+// HELPER: STREAM AI ENDPOINT (server-sent events over fetch)
+// ----------------------
+// Server-sent event frames off a fetch() body: calls onEvent(name, data)
+// per frame (same reader as the dashboard's live scan).
+async function readEvents(response, onEvent) {
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = "";
+    while (true) {
+        const {value, done} = await reader.read();
+        if (done) return;
+        buffer += decoder.decode(value, {stream: true});
+        let boundary;
+        while ((boundary = buffer.indexOf("\n\n")) >= 0) {
+            const frame = buffer.slice(0, boundary);
+            buffer = buffer.slice(boundary + 2);
+            let event = "message", data = "";
+            frame.split("\n").forEach(line => {
+                if (line.startsWith("event: ")) event = line.slice(7);
+                else if (line.startsWith("data: ")) data += line.slice(6);
+            });
+            if (data) onEvent(event, JSON.parse(data));
+        }
+    }
+}
+
+function streamAI(endpoint, outputBoxId) {
+    let url = document.getElementById("urlInput").value;
+    let box = document.getElementById(outputBoxId);
+
+    if (box._aiStream) box._aiStream.abort();
+    box.innerText = "Generating...";
+
+    let controller = new AbortController();
+    let started = false;
+    box._aiStream = controller;
+
+    const handle = (event, data) => {
+        if (event === "token") {
+            if (!started) {
+                box.innerText = "";
+                started = true;
+            }
+            box.innerText += data;
+        } else if (event === "error") {
+            box.innerText = data;
+            controller.abort();
+        } else if (event === "done") {
+            controller.abort();
+        }
+    };
+
+    fetch(`/ai/${endpoint}/stream`, {
+        method: "POST",
+        headers: { "Content-Type": "application/json" },
+        body: JSON.stringify({url: url, keyword: aiKeyword()}),
+        signal: controller.signal
+    })
+    .then(response => {
+        if (!response.ok) return response.json().then(data => { box.innerText = data.error; });
+        return readEvents(response, handle);
+    })
+    .catch(() => {
+        if (!controller.signal.aborted) box.innerText = "Network error. Please try again.";
+    });
+}
+
+
 // ----------------------
 // MESSAGE POPUP
 // ----------------------
@@ -1,6 +1,12 @@
 import os
+import time
 from openai import OpenAI
 from utils.db import fetch_one
+from utils.analyzer import extract_page_context
+from utils.prompt_builder import build_page_prompt
+
+AI_MODEL = "gpt-4o-mini"
+NO_KEY_MESSAGE = "⚠️ No API key found. Add your OpenAI key in Settings."
 
 # ---------------------------------------------------
 # GET USER API KEY
@@ -13,45 +19,75 @@ def get_user_api_key(user_id):
 
 
 # ---------------------------------------------------
-# GENERATE SEO TITLE
+# PROMPTS
 # ---------------------------------------------------
-def generate_title(url, user_id):
-    api_key = get_user_api_key(user_id)
-    if not api_key:
-        return "⚠️ No API key found. Add your OpenAI key in Settings."
+# Each prompt takes the page context from analyzer.extract_page_context()
+# when available, so the model works from the actual page instead of
+# guessing from the URL alone. The scan keyword, if any, steers which
+# sentences make it into the excerpt.
+def grounded(instruction, context, keyword=None):
+    if not context:
+        return instruction
+    return build_page_prompt(instruction, context, keyword=keyword)
+
+
+def title_prompt(url, context=None, keyword=None):
+    return grounded(
+        f"Write an optimized SEO page title for this website: {url}. Keep it under 60 characters.",
+        context,
+        keyword,
+    )
 
-    client = OpenAI(api_key=api_key)
 
-    prompt = f"Write an optimized SEO page title for this website: {url}. Keep it under 60 characters."
+def meta_prompt(url, context=None, keyword=None):
+    return grounded(
+        f"Write an SEO-focused meta description for this website: {url}. "
+        "Keep it under 155 characters and make it click-worthy.",
+        context,
+        keyword,
+    )
+
+
+def keywords_prompt(url, context=None, keyword=None):
+    return grounded(
+        f"Generate a list of 10 high-value SEO keywords for the website: {url}. "
+        "Return them in a simple comma-separated list.",
+        context,
+        keyword,
+    )
 
-    try:
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[{"role": "user", "content": prompt}]
-        )
-        return response.choices[0].message.content.strip()
-    except Exception as e:
-        return f"AI Error: {str(e)}"
+
+def rewrite_prompt(url, context=None, keyword=None):
+    return grounded(
+        f"Rewrite the homepage content for this site: {url}. "
+        "Keep the structure clear, improve readability, and make it SEO friendly. "
+        "Avoid sounding robotic.",
+        context,
+        keyword,
+    )
+
+
+PROMPTS = {
+    "title": title_prompt,
+    "meta": meta_prompt,
+    "keywords": keywords_prompt,
+    "rewrite": rewrite_prompt,
+}
 
 
 # ---------------------------------------------------
-# GENERATE META DESCRIPTION
+# BLOCKING COMPLETION (full string)
 # ---------------------------------------------------
-def generate_meta(url, user_id):
+def complete(prompt, user_id):
     api_key = get_user_api_key(user_id)
     if not api_key:
-        return "⚠️ No API key found. Add your OpenAI key in Settings."
+        return NO_KEY_MESSAGE
 
     client = OpenAI(api_key=api_key)
 
-    prompt = (
-        f"Write an SEO-focused meta description for this website: {url}. "
-        "Keep it under 155 characters and make it click-worthy."
-    )
-
     try:
         response = client.chat.completions.create(
-            model="gpt-4o-mini",
+            model=AI_MODEL,
             messages=[{"role": "user", "content": prompt}]
         )
         return response.choices[0].message.content.strip()
@@ -60,51 +96,90 @@ def generate_meta(url, user_id):
 
 
 # ---------------------------------------------------
-# GENERATE KEYWORDS
+# STREAMING COMPLETION (token generator)
 # ---------------------------------------------------
-def generate_keywords(url, user_id):
+# Yields ("token", text) for every delta as it arrives, then a single
+# ("done", metrics) with time-to-first-token and total time in ms.
+# Closing the generator (e.g. the client disconnected) closes the
+# upstream HTTP stream so OpenAI stops generating billable tokens.
+def stream_completion(prompt, user_id):
     api_key = get_user_api_key(user_id)
     if not api_key:
-        return "⚠️ No API key found. Add your OpenAI key in Settings."
+        yield "error", NO_KEY_MESSAGE
+        return
 
     client = OpenAI(api_key=api_key)
 
-    prompt = (
-        f"Generate a list of 10 high-value SEO keywords for the website: {url}. "
-        "Return them in a simple comma-separated list."
-    )
+    started = time.perf_counter()
+    first_token_at = None
+    chunks = 0
+    stream = None
 
     try:
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[{"role": "user", "content": prompt}]
+        stream = client.chat.completions.create(
+            model=AI_MODEL,
+            messages=[{"role": "user", "content": prompt}],
+            stream=True
         )
-        return response.choices[0].message.content.strip()
+
+        for chunk in stream:
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if not delta:
+                continue
+
+            if first_token_at is None:
+                first_token_at = time.perf_counter()
+            chunks += 1
+            yield "token", delta
+
+    except GeneratorExit:
+        print(f"AI STREAM: cancelled after {chunks} chunks")
+        raise
     except Exception as e:
-        return f"AI Error: {str(e)}"
+        yield "error", f"AI Error: {str(e)}"
+        return
+    finally:
+        if stream is not None:
+            stream.close()
+
+    metrics = {
+        "ttft_ms": int((first_token_at - started) * 1000) if first_token_at else None,
+        "total_ms": int((time.perf_counter() - started) * 1000),
+        "chunks": chunks,
+    }
+    print(f"AI STREAM: ttft={metrics['ttft_ms']}ms total={metrics['total_ms']}ms chunks={chunks}")
+    yield "done", metrics
 
 
 # ---------------------------------------------------
-# REWRITE HOMEPAGE CONTENT
+# GENERATE SEO TITLE
 # ---------------------------------------------------
-def rewrite_homepage(url, user_id):
-    api_key = get_user_api_key(user_id)
-    if not api_key:
-        return "⚠️ No API key found. Add your OpenAI key in Settings."
+def generate_title(url, user_id, keyword=None):
+    return complete(title_prompt(url, extract_page_context(url), keyword), user_id)
 
-    client = OpenAI(api_key=api_key)
 
-    prompt = (
-        f"Rewrite the homepage content for this site: {url}. "
-        "Keep the structure clear, improve readability, and make it SEO friendly. "
-        "Avoid sounding robotic."
-    )
+# ---------------------------------------------------
+# GENERATE META DESCRIPTION
+# ---------------------------------------------------
+def generate_meta(url, user_id, keyword=None):
+    return complete(meta_prompt(url, extract_page_context(url), keyword), user_id)
 
-    try:
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[{"role": "user", "content": prompt}]
-        )
-        return response.choices[0].message.content.strip()
-    except Exception as e:
-        return f"AI Error: {str(e)}"
+
+# ---------------------------------------------------
+# GENERATE KEYWORDS
+# ---------------------------------------------------
+def generate_keywords(url, user_id, keyword=None):
+    return complete(keywords_prompt(url, extract_page_context(url), keyword), user_id)
+
+
+# ---------------------------------------------------
+# REWRITE HOMEPAGE CONTENT
+# ---------------------------------------------------
+def rewrite_homepage(url, user_id, keyword=None):
+    return complete(rewrite_prompt(url, extract_page_context(url), keyword), user_id)
+
+
+def stream_rewrite_homepage(url, user_id, keyword=None):
+    return stream_completion(rewrite_prompt(url, extract_page_context(url), keyword), user_id)
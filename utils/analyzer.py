@@ -1,8 +1,19 @@
-import requests
 from bs4 import BeautifulSoup
 from collections import Counter
 import re
 import math
+import os
+import threading
+from concurrent.futures import Future
+
+from utils.budget import ScanBudget, fetch_body, limit_nodes
+from utils.charset import detect_encoding
+from utils.delivery import DELIVERY_TIMEOUT, audit_delivery, delivery_tips
+from utils.image_audit import image_tips
+from utils.link_audit import LINK_CHECK_BUDGET, audit_links
+from utils.near_dup import simhash, sketch_hex
+from utils.scan_result import AuditItem, ScanResult, SubScores
+from utils.workers import pool_enabled, run_in_pool
 
 
 # ---------------------------------------------------
@@ -18,19 +29,121 @@ def clean_text(text):
 # ---------------------------------------------------
 # FETCH + PARSE PAGE
 # ---------------------------------------------------
-def fetch_page(url):
-    try:
-        response = requests.get(url, timeout=10, headers={
-            "User-Agent": "Mozilla/5.0"
-        })
-        if response.status_code != 200:
-            return None, None
+def fetch_page(url, budget=None):
+    budget = budget or ScanBudget()
+    raw, encoding = fetch_body(url, budget)
+    if raw is None:
+        return None, None
 
-        soup = BeautifulSoup(response.text, "html.parser")
-        return response.text, soup
+    # Decoded once, with the encoding found by header/BOM/meta sniffing
+    encoding, _ = detect_encoding(raw, encoding)
+    html = raw.decode(encoding, errors="replace")
+    soup = BeautifulSoup(limit_nodes(html, budget), "html.parser")
+    return html, soup
 
-    except:
+
+# ---------------------------------------------------
+# FETCH RAW BYTES (parsed elsewhere, e.g. the process pool)
+# ---------------------------------------------------
+def fetch_raw(url, budget=None):
+    budget = budget or ScanBudget()
+    raw, encoding = fetch_body(url, budget)
+    if raw is None:
         return None, None
+    # bs4 takes the bytes plus the encoding and skips its own guessing
+    encoding, _ = detect_encoding(raw, encoding)
+    return limit_nodes(raw, budget), encoding
+
+
+# ---------------------------------------------------
+# PAGE FEATURES (everything the scorers need, no tree)
+# ---------------------------------------------------
+# Both the DOM path below and the streaming path in utils/stream_scan
+# produce this same dict, so scoring never touches BeautifulSoup.
+MAX_LINKS = 5000
+MAX_ASSETS = 500
+
+
+def empty_features():
+    return {
+        "title": None,
+        "description": None,
+        "viewport": False,
+        "canonical": None,
+        "schema": False,
+        "h1": [],
+        "h1_count": 0,
+        "h2_count": 0,
+        "h3_count": 0,
+        "img_count": 0,
+        "img_with_alt": 0,
+        "links": [],  # (href, nofollow)
+        "base_href": None,
+        "assets": [],  # (kind, src): stylesheet / script / image, document order
+        "images": [],  # (src, width attr, height attr)
+        "word_count": 0,
+        "term_counts": Counter(),
+        "bigram_counts": Counter(),  # "word word", adjacent cleaned words
+        "raw_words": 0,
+        "sentences": 0,
+        "syllables": 0,
+    }
+
+
+def extract_features(soup):
+    features = empty_features()
+
+    if soup.title:
+        features["title"] = soup.title.string if soup.title.string is not None else soup.title.get_text()
+
+    meta_desc_tag = soup.find("meta", attrs={"name": "description"})
+    if meta_desc_tag:
+        features["description"] = meta_desc_tag.get("content", "")
+
+    features["viewport"] = bool(soup.find("meta", attrs={"name": "viewport"}))
+    canonical_link = soup.find("link", rel="canonical") or soup.find("link", attrs={"rel": "canonical"})
+    features["canonical"] = canonical_link.get("href") if canonical_link else None
+    features["schema"] = bool(soup.find("script", type="application/ld+json"))
+
+    h1 = soup.find_all("h1")
+    features["h1"] = [h.get_text(strip=True) for h in h1][:3]
+    features["h1_count"] = len(h1)
+    features["h2_count"] = len(soup.find_all("h2"))
+    features["h3_count"] = len(soup.find_all("h3"))
+
+    imgs = soup.find_all("img")
+    features["img_count"] = len(imgs)
+    features["img_with_alt"] = sum(1 for img in imgs if img.get("alt"))
+    features["images"] = [
+        (img.get("src"), img.get("width"), img.get("height"))
+        for img in imgs if img.get("src")
+    ][:MAX_ASSETS]
+
+    features["links"] = [
+        (a.get("href"), "nofollow" in (a.get("rel") or []))
+        for a in soup.find_all("a") if a.get("href")
+    ][:MAX_LINKS]
+    base = soup.find("base", href=True)
+    features["base_href"] = base.get("href") if base else None
+
+    for tag in soup.find_all(["link", "script", "img"]):
+        if len(features["assets"]) >= MAX_ASSETS:
+            break
+        if tag.name == "link" and "stylesheet" in (tag.get("rel") or []) and tag.get("href"):
+            features["assets"].append(("stylesheet", tag.get("href")))
+        elif tag.name == "script" and tag.get("src"):
+            features["assets"].append(("script", tag.get("src")))
+        elif tag.name == "img" and tag.get("src"):
+            features["assets"].append(("image", tag.get("src")))
+
+    text = soup.get_text(separator=" ")
+    words = clean_text(text).split()
+    features["word_count"] = len(words)
+    features["term_counts"] = Counter(words)
+    features["bigram_counts"] = Counter(map(" ".join, zip(words, words[1:])))
+    features["raw_words"], features["sentences"], features["syllables"] = text_counts(text)
+
+    return features
 
 
 # ---------------------------------------------------
@@ -38,11 +151,12 @@ def fetch_page(url):
 # ---------------------------------------------------
 def extract_semantic_phrases(text, top_n=15):
     words = clean_text(text).split()
-    if len(words) < 20:
-        return []
+    return rank_semantic_terms(Counter(words), len(words), top_n)
+
 
-    freq = Counter(words)
-    total = len(words)
+def rank_semantic_terms(freq, total, top_n=15):
+    if total < 20:
+        return []
 
     scores = {}
     for w, c in freq.items():
@@ -56,19 +170,55 @@ def extract_semantic_phrases(text, top_n=15):
     return [x[0] for x in ranked[:top_n]]
 
 
+# Bigrams worth reporting as phrases (content gap): no short words,
+# numbers or function words on either side
+PHRASE_STOPWORDS = frozenset(
+    "the and for with you your are this that from our was not but can all has have "
+    "will its into than then them they their there what when which who how more".split()
+)
+
+
+def topical_phrase(phrase):
+    first, _, second = phrase.partition(" ")
+    return all(
+        len(word) > 2 and not word.isdigit() and word not in PHRASE_STOPWORDS
+        for word in (first, second)
+    )
+
+
+def top_phrases(bigram_counts, limit):
+    return Counter(dict(Counter(
+        {phrase: count for phrase, count in bigram_counts.items() if topical_phrase(phrase)}
+    ).most_common(limit)))
+
+
 # ---------------------------------------------------
 # READABILITY SCORE (Flesch-like heuristic)
 # ---------------------------------------------------
-def readability_score(text):
+SYLLABLE_RE = re.compile(r"[aeiouy]+")
+
+
+def text_counts(text):
     words = text.split()
-    if len(words) == 0:
+    return (
+        len(words),
+        text.count('.') + text.count('!') + text.count('?'),
+        sum(len(SYLLABLE_RE.findall(w)) for w in words),
+    )
+
+
+def readability_score(text):
+    return readability_from_counts(*text_counts(text))
+
+
+def readability_from_counts(words, sentences, syllables):
+    if words == 0:
         return 30
 
-    sentences = max(1, text.count('.') + text.count('!') + text.count('?'))
-    syllables = sum(len(re.findall(r"[aeiouy]+", w)) for w in words)
+    sentences = max(1, sentences)
 
-    wps = len(words) / sentences
-    spw = syllables / len(words)
+    wps = words / sentences
+    spw = syllables / words
 
     # Simplified readability scoring (0–100)
     score = 100 - (wps * 5) - (spw * 20)
@@ -78,108 +228,71 @@ def readability_score(text):
 # ---------------------------------------------------
 # HEADING STRUCTURE SCORE
 # ---------------------------------------------------
-def heading_structure_score(soup):
-    h1 = soup.find_all("h1")
-    h2 = soup.find_all("h2")
-    h3 = soup.find_all("h3")
+def heading_structure_score(features):
+    h1 = features["h1_count"]
+    h2 = features["h2_count"]
+    h3 = features["h3_count"]
 
     score = 0
 
     # H1 rules
-    if len(h1) == 1:
+    if h1 == 1:
         score += 30
-    elif len(h1) > 1:
+    elif h1 > 1:
         score += 5
     else:
         score += 0
 
     # H2 presence
-    if len(h2) >= 2:
+    if h2 >= 2:
         score += 30
-    elif len(h2) == 1:
+    elif h2 == 1:
         score += 15
 
     # H3 depth
-    if len(h3) >= 2:
+    if h3 >= 2:
         score += 20
-    elif len(h3) == 1:
+    elif h3 == 1:
         score += 10
 
     # Max = 80 → scale to 100
     return min(100, int(score * 1.25))
 
 
-# ---------------------------------------------------
-# BROKEN LINK CHECK (up to 20)
-# ---------------------------------------------------
-def link_health_score(url, soup):
-    links = soup.find_all("a")
-    broken = 0
-    checked = 0
-
-    for link in links:
-        href = link.get("href")
-        if not href or href.startswith("#") or href.startswith("mailto"):
-            continue
-
-        if href.startswith("/"):
-            href = url.rstrip("/") + href
-
-        try:
-            r = requests.get(href, timeout=5)
-            if r.status_code >= 400:
-                broken += 1
-        except:
-            broken += 1
-
-        checked += 1
-        if checked >= 20:
-            break
-
-    if checked == 0:
-        return 70  # neutral
-
-    good_ratio = (checked - broken) / checked
-    return int(good_ratio * 100)
-
-
 # ---------------------------------------------------
 # TECHNICAL HEALTH SCORE
 # ---------------------------------------------------
-def technical_score(soup):
+def technical_score(features):
     score = 0
 
     # Meta description
-    meta = soup.find("meta", attrs={"name": "description"})
-    if meta:
-        md = meta.get("content", "")
+    md = features["description"]
+    if md is not None:
         if 50 <= len(md) <= 160:
             score += 20
         else:
             score += 10
 
     # Viewport tag (mobile)
-    if soup.find("meta", attrs={"name": "viewport"}):
+    if features["viewport"]:
         score += 20
 
     # Schema / JSON-LD
-    if soup.find("script", type="application/ld+json"):
+    if features["schema"]:
         score += 20
 
     # Title rules
-    title = soup.find("title")
-    if title:
-        t = title.text.strip()
+    title = features["title"]
+    if title is not None:
+        t = title.strip()
         if 20 <= len(t) <= 70:
             score += 20
         else:
             score += 10
 
     # Image alt text ratio
-    imgs = soup.find_all("img")
-    if imgs:
-        with_alt = sum(1 for img in imgs if img.get("alt"))
-        ratio = with_alt / len(imgs)
+    if features["img_count"]:
+        ratio = features["img_with_alt"] / features["img_count"]
         score += int(ratio * 20)
     else:
         score += 10
@@ -190,15 +303,14 @@ def technical_score(soup):
 # ---------------------------------------------------
 # KEYWORD RELEVANCE SCORE
 # ---------------------------------------------------
-def keyword_relevance(keyword, text):
+def keyword_relevance(keyword, features):
     if not keyword:
         return 60  # neutral
 
-    words = clean_text(text).split()
-    if len(words) == 0:
+    if features["word_count"] == 0:
         return 30
 
-    density = words.count(keyword.lower()) / len(words)
+    density = features["term_counts"].get(keyword.lower(), 0) / features["word_count"]
     score = min(100, int(density * 30000))
     return max(5, score)
 
@@ -206,7 +318,12 @@ def keyword_relevance(keyword, text):
 # ---------------------------------------------------
 # AI-STYLE OPTIMIZATION TIPS
 # ---------------------------------------------------
-def generate_tips(soup, keyword):
+# Generic fallback; replaced by measured delivery tips when the delivery
+# audit ran (see finish_scores)
+SPEED_TIP = "• Optimize page load speed by compressing images and minimizing scripts."
+
+
+def generate_tips(features, keyword):
     tips = []
 
     if keyword:
@@ -217,61 +334,276 @@ def generate_tips(soup, keyword):
     tips.append("• Improve internal linking to help search engines understand your content.")
     tips.append("• Add descriptive alt text to all images.")
     tips.append("• Implement structured data (JSON-LD) for better SERP features.")
-    tips.append("• Optimize page load speed by compressing images and minimizing scripts.")
+    tips.append(SPEED_TIP)
     tips.append("• Ensure your page is mobile-friendly with responsive elements.")
 
     return "\n".join(tips)
 
 
 # ---------------------------------------------------
-# MAIN HYBRID-AI ANALYZER ENTRY POINT
+# KEY PARAGRAPHS (body copy, in document order)
 # ---------------------------------------------------
-def run_local_seo_analysis(url, keyword=None):
+def key_paragraphs(soup, limit=60):
+    paragraphs = []
+    for tag in soup.find_all(["p", "li", "blockquote"]):
+        text = tag.get_text(separator=" ", strip=True)
+        if len(text.split()) >= 5:
+            paragraphs.append(text)
+        if len(paragraphs) >= limit:
+            break
+    return paragraphs
+
+
+# ---------------------------------------------------
+# PAGE CONTEXT FOR AI PROMPTS (no link checks)
+# ---------------------------------------------------
+def extract_page_context(url):
     html, soup = fetch_page(url)
     if not soup:
-        return (
-            0, "Error fetching page.", "Unable to analyze page.",
-            0, 0, 0, 0, 0, {}
-        )
+        return None
+    return page_context(url, soup)
 
-    text = soup.get_text(separator=" ")
-    text_clean = clean_text(text)
 
+def page_context(url, soup):
+    text_clean = clean_text(soup.get_text(separator=" "))
+    meta_desc_tag = soup.find("meta", attrs={"name": "description"})
+
+    return {
+        "url": url,
+        "title": soup.title.string.strip() if soup.title and soup.title.string else None,
+        "description": meta_desc_tag.get("content", "").strip() if meta_desc_tag else None,
+        "h1": [h.get_text(strip=True) for h in soup.find_all("h1")][:3],
+        "top_terms": extract_semantic_phrases(text_clean)[:10],
+        "paragraphs": key_paragraphs(soup),
+    }
+
+
+# ---------------------------------------------------
+# MAIN HYBRID-AI ANALYZER ENTRY POINT
+# ---------------------------------------------------
+# streaming=True parses the response body chunk by chunk without ever
+# building a tree or a full-text string (see utils/stream_scan); the
+# default comes from the SCAN_STREAMING env var.
+SCAN_STREAMING = os.environ.get("SCAN_STREAMING", "0") == "1"
+
+ERROR_RESULT = ScanResult.error()
+
+
+# ---------------------------------------------------
+# PROGRESS + CANCELLATION
+# ---------------------------------------------------
+# progress(stage, data) is called as each stage completes (fetched,
+# parsed, content_scored, links, delivery, done). `cancel` is a
+# threading.Event; once set, the scan stops at the next stage boundary
+# or link probe and raises ScanCancelled, so abandoned scans stop making
+# outbound requests.
+class ScanCancelled(Exception):
+    pass
+
+
+def checkpoint(cancel):
+    if cancel is not None and cancel.is_set():
+        raise ScanCancelled()
+
+
+def report(progress, stage, **data):
+    if progress is not None:
+        progress(stage, data)
+
+
+# `budget` (utils.budget.ScanBudget) caps bytes, nodes, wall time and
+# outbound requests; stages that hit it are cut short and listed in
+# page_meta["truncated"], the rest of the result is still computed.
+def run_local_seo_analysis(url, keyword=None, streaming=None, progress=None, cancel=None, budget=None):
+    if streaming is None:
+        streaming = SCAN_STREAMING
+    budget = budget or ScanBudget()
+
+    if streaming:
+        # Fetch and parse are one pass here
+        from utils.stream_scan import stream_features
+        features = stream_features(url, budget)
+        if features:
+            report(progress, "fetched")
+
+    elif pool_enabled():
+        # Parse + text metrics + scoring run in a worker process; only the
+        # raw bytes go in and a compact record comes back.
+        raw, encoding = fetch_raw(url, budget)
+        if raw is None:
+            return ERROR_RESULT
+        report(progress, "fetched", bytes=len(raw))
+        checkpoint(cancel)
+        try:
+            record = run_in_pool(analyze_html, raw, encoding, keyword)
+        except Exception as e:
+            print("ANALYZER POOL ERROR:", repr(e))
+            return ERROR_RESULT
+        report(progress, "parsed")
+        return finish_scores(url, record, progress, cancel, budget)
+
+    else:
+        html, soup = fetch_page(url, budget)
+        if soup:
+            report(progress, "fetched", bytes=len(html))
+            checkpoint(cancel)
+        features = extract_features(soup) if soup else None
+
+    if not features:
+        return ERROR_RESULT
+
+    report(progress, "parsed")
+    checkpoint(cancel)
+    return score_features(url, features, keyword, progress, cancel, budget)
+
+
+def score_features(url, features, keyword=None, progress=None, cancel=None, budget=None):
+    return finish_scores(url, page_scores(features, keyword), progress, cancel, budget)
+
+
+# ---------------------------------------------------
+# CPU-BOUND STAGE (safe to run in a worker process)
+# ---------------------------------------------------
+def analyze_html(raw, encoding=None, keyword=None):
+    soup = BeautifulSoup(raw, "html.parser", from_encoding=encoding)
+    return page_scores(extract_features(soup), keyword)
+
+
+MAX_RESULT_TERMS = 2000
+
+
+# Every score that needs no network I/O. Returns a compact, picklable
+# record (no tree; only the MAX_RESULT_TERMS most frequent terms and
+# bigrams) for finish_scores().
+def page_scores(features, keyword=None):
     # CONTENT SCORE (C3: combined)
-    wc = len(text_clean.split())
+    wc = features["word_count"]
     wc_score = min(100, int((wc / 800) * 100))  # word count target ~800
 
-    sem_terms = extract_semantic_phrases(text_clean)
+    sem_terms = rank_semantic_terms(features["term_counts"], wc)
     sem_score = min(100, len(sem_terms) * 5)  # up to ~15 terms → 75
 
-    read_score = readability_score(text)
+    read_score = readability_from_counts(features["raw_words"], features["sentences"], features["syllables"])
 
-    heading_score = heading_structure_score(soup)
+    heading_score = heading_structure_score(features)
 
     content_score = int((wc_score * 0.35) + (sem_score * 0.35) + (read_score * 0.15) + (heading_score * 0.15))
 
     # KEYWORD SCORE
-    keyword_score_value = keyword_relevance(keyword, text_clean)
+    keyword_score_value = keyword_relevance(keyword, features)
 
     # TECHNICAL SCORE
-    meta_desc_tag = soup.find("meta", attrs={"name": "description"})
-    canonical_link = soup.find("link", rel="canonical") or soup.find("link", attrs={"rel": "canonical"})
-    schema_present = bool(soup.find("script", type="application/ld+json"))
-    viewport_present = bool(soup.find("meta", attrs={"name": "viewport"}))
-    imgs = soup.find_all("img")
-    if imgs:
-        with_alt = sum(1 for img in imgs if img.get("alt"))
-        alt_coverage = int((with_alt / len(imgs)) * 100)
+    description = features["description"]
+    if features["img_count"]:
+        alt_coverage = int((features["img_with_alt"] / features["img_count"]) * 100)
     else:
         alt_coverage = None
 
-    technical_score_value = technical_score(soup)
+    technical_score_value = technical_score(features)
 
     # ON-PAGE SCORE (headings + meta balance)
-    onpage_score = int((heading_score * 0.6) + ((100 if soup.find('meta', attrs={'name': 'description'}) else 50) * 0.4))
+    onpage_score = int((heading_score * 0.6) + ((100 if description is not None else 50) * 0.4))
+
+    tips = generate_tips(features, keyword)
+
+    title = features["title"].strip() if features["title"] is not None else None
+
+    page_meta = {
+        "title": title if title is not None else "No title detected",
+        "description": (
+            description if description is not None else "No meta description detected"
+        ),
+        "word_count": wc,
+        "top_terms": sem_terms[:6],
+        "h1": features["h1"],
+        "readability_score": read_score,
+        "schema_present": features["schema"],
+        "alt_coverage": alt_coverage,
+        "canonical_url": features["canonical"],
+        "title_length": len(title) if title else 0,
+        "description_length": len(description) if description is not None else 0,
+        "h1_count": features["h1_count"],
+        "viewport_present": features["viewport"],
+        # Near-duplicate sketch (utils/near_dup), stored with the scan history
+        "simhash": sketch_hex(simhash(features["term_counts"])),
+    }
+
+    return {
+        "wc_score": wc_score,
+        "read_score": read_score,
+        "sem_score": sem_score,
+        "heading_score": heading_score,
+        "content": content_score,
+        "keyword": keyword_score_value,
+        "technical": technical_score_value,
+        "onpage": onpage_score,
+        "tips": tips,
+        "page_meta": page_meta,
+        "links": list(dict.fromkeys(features["links"])),  # exact repeats add nothing
+        "base_href": features["base_href"],
+        "assets": list(dict.fromkeys(features["assets"])),
+        "images": features["images"],
+        "terms": Counter(dict(features["term_counts"].most_common(MAX_RESULT_TERMS))),
+        "phrases": top_phrases(features["bigram_counts"], MAX_RESULT_TERMS),
+    }
 
-    # LINK SCORE
-    link_score = link_health_score(url, soup)
+
+# ---------------------------------------------------
+# LINK AUDIT + FINAL SCORE (network I/O, stays in the calling thread)
+# ---------------------------------------------------
+def finish_scores(url, record, progress=None, cancel=None, budget=None):
+    budget = budget or ScanBudget()
+    wc_score = record["wc_score"]
+    read_score = record["read_score"]
+    sem_score = record["sem_score"]
+    heading_score = record["heading_score"]
+    content_score = record["content"]
+    keyword_score_value = record["keyword"]
+    technical_score_value = record["technical"]
+    onpage_score = record["onpage"]
+
+    report(
+        progress, "content_scored",
+        content=content_score, keyword=keyword_score_value,
+        technical=technical_score_value, onpage=onpage_score,
+    )
+    checkpoint(cancel)
+
+    # DELIVERY AUDIT (asset header probes, overlaps the link checks).
+    # The link checks' grants are set aside first; delivery gets the rest
+    link_checks = min(LINK_CHECK_BUDGET, len(record["links"]))
+    delivery_budget = budget.share(budget.max_requests - budget.requests - link_checks)
+    delivery_done = Future()
+
+    def run_delivery():
+        try:
+            delivery_done.set_result(audit_delivery(
+                url, record["assets"], record["images"], record["base_href"], delivery_budget, cancel
+            ))
+        except Exception as e:
+            print("DELIVERY AUDIT ERROR:", repr(e))
+            budget.truncate("delivery", "error")
+            delivery_done.set_result({})
+
+    threading.Thread(target=run_delivery, name="delivery-audit", daemon=True).start()
+
+    # LINK SCORE (full inventory, sampled checks)
+    link_stats = {}
+    link_audit = audit_links(
+        url, record["links"], record["base_href"], stats=link_stats,
+        on_checked=lambda done, total: report(progress, "links", checked=done, total=total),
+        cancel=cancel, budget=budget,
+    )
+    try:
+        # The report is built in the thread and handed over whole, so a
+        # late audit never changes what this scan already returned
+        delivery = delivery_done.result(budget.timeout(DELIVERY_TIMEOUT + 2))
+    except TimeoutError:
+        budget.truncate("delivery", "max_seconds")
+        delivery = {}
+    checkpoint(cancel)
+    link_score = link_audit["score"]
+    report(progress, "delivery", score=delivery.get("score"))
 
     # MAIN SCORE (S2 content-heavy model)
     main_score = int(
@@ -283,55 +615,53 @@ def run_local_seo_analysis(url, keyword=None):
     )
 
     main_score = max(5, min(100, main_score))
+    report(progress, "done", score=main_score, links=link_score)
+
+    audit = [
+        AuditItem("CONTENT ANALYSIS", "Word count score", wc_score),
+        AuditItem("CONTENT ANALYSIS", "Readability score", read_score),
+        AuditItem("CONTENT ANALYSIS", "Semantic richness score", sem_score),
+        AuditItem("CONTENT ANALYSIS", "Heading structure", heading_score),
+        AuditItem("KEYWORD ANALYSIS", "Keyword relevance score", keyword_score_value),
+        AuditItem("TECHNICAL HEALTH", "Technical score", technical_score_value),
+        AuditItem("ON-PAGE STRUCTURE", "On-page score", onpage_score),
+        AuditItem("LINK HEALTH", "Link score", link_score),
+    ]
+    if delivery:
+        audit.append(AuditItem("PAGE SPEED", "Page weight score", delivery["score"]))
+        audit.append(AuditItem("IMAGES", "Image optimization score", delivery["images"]["score"]))
+
+    tips = record["tips"]
+    if delivery:
+        measured = delivery_tips(delivery) + image_tips(delivery["images"])
+        tips = "\n".join(
+            line for tip in tips.split("\n")
+            for line in (measured if tip == SPEED_TIP else [tip])
+        )
 
-    audit_text = (
-        "CONTENT ANALYSIS:\n"
-        f"- Word count score: {wc_score}\n"
-        f"- Readability score: {read_score}\n"
-        f"- Semantic richness score: {sem_score}\n"
-        f"- Heading structure: {heading_score}\n\n"
-
-        "KEYWORD ANALYSIS:\n"
-        f"- Keyword relevance score: {keyword_score_value}\n\n"
-
-        "TECHNICAL HEALTH:\n"
-        f"- Technical score: {technical_score_value}\n\n"
-
-        "ON-PAGE STRUCTURE:\n"
-        f"- On-page score: {onpage_score}\n\n"
-
-        "LINK HEALTH:\n"
-        f"- Link score: {link_score}\n"
-    )
-
-    tips = generate_tips(soup, keyword)
-
-    page_meta = {
-        "title": soup.title.string.strip() if soup.title else "No title detected",
-        "description": (
-            meta_desc_tag.get("content", "") if meta_desc_tag else "No meta description detected"
-        ),
-        "word_count": wc,
-        "top_terms": sem_terms[:6],
-        "h1": [h.get_text(strip=True) for h in soup.find_all("h1")][:3],
-        "readability_score": read_score,
-        "schema_present": schema_present,
-        "alt_coverage": alt_coverage,
-        "canonical_url": canonical_link.get("href") if canonical_link else None,
-        "title_length": len(soup.title.string.strip()) if soup.title and soup.title.string else 0,
-        "description_length": len(meta_desc_tag.get("content", "")) if meta_desc_tag else 0,
-        "h1_count": len(soup.find_all("h1")),
-        "viewport_present": viewport_present,
+    page_meta = dict(record["page_meta"])
+    page_meta["broken_links"] = link_audit["broken"]
+    page_meta["link_audit"] = {k: v for k, v in link_audit.items() if k not in ("score", "broken", "outlinks")}
+    page_meta["delivery"] = delivery or None
+    page_meta["truncated"] = budget.truncated
+    page_meta["instrumentation"] = {
+        "link_cache": link_stats,
+        "budget": budget.usage(),
     }
 
-    return (
+    return ScanResult(
         main_score,
-        audit_text,
+        SubScores(
+            content=content_score,
+            technical=technical_score_value,
+            keyword=keyword_score_value,
+            onpage=onpage_score,
+            links=link_score,
+        ),
+        audit,
         tips,
-        content_score,
-        technical_score_value,
-        keyword_score_value,
-        onpage_score,
-        link_score,
         page_meta,
+        outlinks=link_audit["outlinks"],
+        terms=record["terms"],
+        phrases=record["phrases"],
     )
@@ -0,0 +1,352 @@
+import hashlib
+import os
+import secrets
+import sys
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+
+import psycopg2.extras
+from itsdangerous import BadSignature, SignatureExpired, URLSafeTimedSerializer
+from utils.db import get_connection
+
+# ============================================================
+# API TOKENS (signed, stateless auth for programmatic clients)
+# ============================================================
+# A token is the claims {uid, plan, jti} signed with HMAC-SHA256 by
+# itsdangerous, plus its issue time:
+#   Authorization: Bearer <token>
+# Authorizing a request is CPU only, with no DB round trip:
+#   1. signature and age (API_TOKEN_TTL) checked by itsdangerous
+#   2. jti looked up in the in-memory deny list
+#   3. a token bucket per jti (API_RATE_PRO / API_RATE_FREE per minute)
+#
+# api_tokens keeps one row per issued token, used for listing and
+# revoking. The deny list is every revoked, unexpired jti. Each process
+# loads it on first use, then reloads it in the background every
+# API_DENYLIST_REFRESH seconds. If it cannot be refreshed for
+# API_DENYLIST_MAX_STALE seconds, requests are refused rather than
+# trusting a stale list. A revocation takes effect at once
+# in the process that handles it and within one refresh everywhere else.
+# A plan change revokes the user's tokens, so plan claims never outlive it.
+#
+# Buckets are per process: with N gunicorn workers a client can get up to
+# N × the per-minute rate. Past API_BUCKETS_MAX the longest-idle bucket
+# is dropped, never a live one.
+#
+# There is no default secret: without API_TOKEN_SECRET (or FLASK_SECRET)
+# tokens are neither issued nor accepted.
+#
+# python -m utils.api_tokens                   → per-request auth cost, token vs. session lookup
+# python -m utils.api_tokens --check-buckets   → LRU bucket cap on a simulated clock
+
+API_TOKEN_SECRET = os.environ.get("API_TOKEN_SECRET") or os.environ.get("FLASK_SECRET")
+API_TOKEN_TTL = int(os.environ.get("API_TOKEN_TTL_HOURS", 24 * 7)) * 3600
+API_TOKENS_PER_USER = int(os.environ.get("API_TOKENS_PER_USER", 5))
+API_DENYLIST_REFRESH = float(os.environ.get("API_DENYLIST_REFRESH", 30))
+API_DENYLIST_MAX_STALE = float(os.environ.get("API_DENYLIST_MAX_STALE", 600))
+API_RATE_PRO = int(os.environ.get("API_RATE_PRO", 120))
+API_RATE_FREE = int(os.environ.get("API_RATE_FREE", 20))
+API_BUCKETS_MAX = 50_000
+
+CREATE_TABLES = """
+    CREATE TABLE IF NOT EXISTS api_tokens (
+        jti TEXT PRIMARY KEY,
+        user_id INTEGER NOT NULL,
+        plan TEXT NOT NULL,
+        label TEXT,
+        created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+        expires_at TIMESTAMPTZ NOT NULL,
+        revoked_at TIMESTAMPTZ
+    );
+    CREATE INDEX IF NOT EXISTS api_tokens_user_idx ON api_tokens (user_id, created_at DESC);
+    CREATE INDEX IF NOT EXISTS api_tokens_revoked_idx
+        ON api_tokens (expires_at) WHERE revoked_at IS NOT NULL;
+"""
+
+
+def make_serializer(secret):
+    return URLSafeTimedSerializer(secret, salt="api-token", signer_kwargs={"digest_method": hashlib.sha256})
+
+
+_serializer = make_serializer(API_TOKEN_SECRET) if API_TOKEN_SECRET else None
+if _serializer is None:
+    print("API TOKENS DISABLED: set API_TOKEN_SECRET or FLASK_SECRET")
+
+_denied = frozenset()
+_denied_at = None  # monotonic time of the last successful load
+_local_revoked = set()
+_refreshing = threading.Lock()
+_buckets = OrderedDict()  # jti → (tokens, updated), least recently used first
+_buckets_lock = threading.Lock()
+
+
+def tokens_enabled():
+    return _serializer is not None
+
+
+def plan_of(user):
+    return "pro" if user["is_pro"] else "free"
+
+
+# -------------------------------------------------------------
+# ISSUE / LIST / REVOKE (session routes, DB)
+# -------------------------------------------------------------
+def issue_token(user, label=None):
+    """(token, jti, expires_at), or None past API_TOKENS_PER_USER."""
+    if not tokens_enabled():
+        raise RuntimeError("API tokens need API_TOKEN_SECRET or FLASK_SECRET")
+    jti = secrets.token_urlsafe(12)
+    expires_at = datetime.now(timezone.utc) + timedelta(seconds=API_TOKEN_TTL)
+
+    conn = get_connection()
+    cur = conn.cursor()
+    cur.execute(
+        "SELECT count(*) FROM api_tokens WHERE user_id = %s AND revoked_at IS NULL AND expires_at > now()",
+        (user["id"],)
+    )
+    if cur.fetchone()[0] >= API_TOKENS_PER_USER:
+        cur.close()
+        conn.close()
+        return None
+
+    cur.execute(
+        "INSERT INTO api_tokens (jti, user_id, plan, label, expires_at) VALUES (%s, %s, %s, %s, %s)",
+        (jti, user["id"], plan_of(user), (label or "")[:100] or None, expires_at)
+    )
+    conn.commit()
+    cur.close()
+    conn.close()
+
+    token = _serializer.dumps({"uid": user["id"], "plan": plan_of(user), "jti": jti})
+    return token, jti, expires_at
+
+
+def list_tokens(user_id):
+    conn = get_connection()
+    cur = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
+    cur.execute(
+        """
+        SELECT jti, plan, label, created_at, expires_at, revoked_at
+        FROM api_tokens
+        WHERE user_id = %s AND expires_at > now()
+        ORDER BY created_at DESC
+        """,
+        (user_id,)
+    )
+    rows = cur.fetchall()
+    cur.close()
+    conn.close()
+    return rows
+
+
+def revoke_tokens(user_id, jti=None):
+    """Revokes one of the user's tokens, or all of them (jti=None)."""
+    conn = get_connection()
+    cur = conn.cursor()
+    cur.execute(
+        """
+        UPDATE api_tokens SET revoked_at = now()
+        WHERE user_id = %s AND revoked_at IS NULL AND (%s::text IS NULL OR jti = %s)
+        RETURNING jti
+        """,
+        (user_id, jti, jti)
+    )
+    revoked = [row[0] for row in cur.fetchall()]
+    conn.commit()
+    cur.close()
+    conn.close()
+
+    # Effective here right away; other processes pick it up on refresh
+    _local_revoked.update(revoked)
+    return revoked
+
+
+# -------------------------------------------------------------
+# DENY LIST (in memory, refreshed in the background)
+# -------------------------------------------------------------
+def load_denylist():
+    conn = get_connection()
+    cur = conn.cursor()
+    cur.execute("SELECT jti FROM api_tokens WHERE revoked_at IS NOT NULL AND expires_at > now()")
+    jtis = frozenset(row[0] for row in cur.fetchall())
+    cur.close()
+    conn.close()
+    return jtis
+
+
+def set_denylist(jtis, clock=time.monotonic):
+    global _denied, _denied_at
+    _denied = frozenset(jtis)
+    _denied_at = clock()
+    _local_revoked.difference_update(_denied)
+
+
+def refresh_denylist():
+    if not _refreshing.acquire(blocking=False):
+        return  # another thread is already on it
+    try:
+        set_denylist(load_denylist())
+    except Exception as e:
+        print("API DENYLIST ERROR:", e)
+    finally:
+        _refreshing.release()
+
+
+def denylist_fresh(clock=time.monotonic):
+    """False when the list is too old to trust; kicks off a reload when due."""
+    if _denied_at is None:
+        refresh_denylist()  # first request in this process waits for one load
+        if _denied_at is None:
+            return False
+    age = clock() - _denied_at
+    if age >= API_DENYLIST_REFRESH and not _refreshing.locked():
+        threading.Thread(target=refresh_denylist, name="api-denylist", daemon=True).start()
+    return age < API_DENYLIST_MAX_STALE
+
+
+# -------------------------------------------------------------
+# RATE LIMIT (token bucket per jti)
+# -------------------------------------------------------------
+def take(jti, plan, clock=time.monotonic):
+    """(allowed, remaining, retry_after seconds)."""
+    per_minute = API_RATE_PRO if plan == "pro" else API_RATE_FREE
+    rate = per_minute / 60
+    now = clock()
+    with _buckets_lock:
+        tokens, updated = _buckets.pop(jti, (per_minute, now))
+        tokens = min(per_minute, tokens + (now - updated) * rate)
+        allowed = tokens >= 1
+        if allowed:
+            tokens -= 1
+        _buckets[jti] = (tokens, now)
+        if len(_buckets) > API_BUCKETS_MAX:
+            _buckets.popitem(last=False)  # the longest idle
+    return allowed, int(tokens), 0 if allowed else round((1 - tokens) / rate, 1)
+
+
+# -------------------------------------------------------------
+# AUTHORIZE (hot path: no DB)
+# -------------------------------------------------------------
+def bearer_token(header):
+    scheme, _, token = (header or "").partition(" ")
+    return token.strip() if scheme.lower() == "bearer" and token.strip() else None
+
+
+def authorize(header):
+    """(claims, None) or (None, (error, HTTP status, extra headers))."""
+    token = bearer_token(header)
+    if token is None:
+        return None, ("missing_token", 401, {})
+    if not tokens_enabled():
+        return None, ("auth_unavailable", 503, {})
+    try:
+        claims = _serializer.loads(token, max_age=API_TOKEN_TTL)
+    except SignatureExpired:
+        return None, ("token_expired", 401, {})
+    except BadSignature:
+        return None, ("invalid_token", 401, {})
+
+    if not denylist_fresh():
+        return None, ("auth_unavailable", 503, {"Retry-After": "5"})
+    jti = claims.get("jti")
+    if jti in _denied or jti in _local_revoked:
+        return None, ("token_revoked", 401, {})
+
+    allowed, remaining, retry_after = take(jti, claims.get("plan"))
+    headers = {"X-RateLimit-Remaining": str(remaining)}
+    if not allowed:
+        headers["Retry-After"] = str(max(1, int(retry_after + 0.99)))
+        return None, ("rate_limited", 429, headers)
+    claims["rate_headers"] = headers
+    return claims, None
+
+
+# -------------------------------------------------------------
+# BENCHMARK (auth cost per request, no DB)
+# -------------------------------------------------------------
+def benchmark(requests=5000):
+    import app as web
+
+    global _serializer
+    _serializer = _serializer or make_serializer(secrets.token_hex(32))
+    set_denylist([])  # as if just refreshed; the benchmark has no DB
+    token = _serializer.dumps({"uid": 1, "plan": "pro", "jti": "bench"})
+    header = f"Bearer {token}"
+
+    global API_RATE_PRO
+    API_RATE_PRO = 10 ** 9  # measure auth, not the limiter refusing
+
+    started = time.perf_counter()
+    for _ in range(requests):
+        authorize(header)
+    verify_us = (time.perf_counter() - started) / requests * 1e6
+
+    client = web.app.test_client()
+    started = time.perf_counter()
+    for _ in range(requests):
+        response = client.get("/api/v1/whoami", headers={"Authorization": header})
+        assert response.status_code == 200, response.get_data()
+    request_us = (time.perf_counter() - started) / requests * 1e6
+
+    print(f"authorize():              {verify_us:8.1f} µs")
+    print(f"GET /api/v1/whoami:       {request_us:8.1f} µs per request (Flask test client, no DB)")
+
+    # The session path pays a connection + SELECT * per request
+    from utils.db import get_user_by_email
+    lookups = min(requests, 200)
+    try:
+        started = time.perf_counter()
+        for _ in range(lookups):
+            get_user_by_email("admin@admin.com")
+    except Exception as e:
+        print("get_user_by_email():      skipped, no DB:", str(e).splitlines()[0])
+        return
+    lookup_us = (time.perf_counter() - started) / lookups * 1e6
+    print(f"get_user_by_email():      {lookup_us:8.1f} µs (what each session request pays)")
+
+
+# -------------------------------------------------------------
+# BUCKET CAP CHECK (simulated clock, no DB)
+# -------------------------------------------------------------
+def check_buckets(cap=3, others=10, step=0.1):
+    """A hot client stays limited while `others` new jtis churn through a
+    cap of `cap` buckets: eviction drops the idle ones, never the hot one."""
+    global API_BUCKETS_MAX
+    saved = API_BUCKETS_MAX, _buckets.copy()
+    API_BUCKETS_MAX = cap
+    _buckets.clear()
+    now = [0.0]
+    clock = lambda: now[0]
+
+    try:
+        drained = sum(take("hot", "free", clock)[0] for _ in range(API_RATE_FREE))
+        assert drained == API_RATE_FREE and not take("hot", "free", clock)[0]
+
+        for n in range(others):
+            now[0] += step
+            assert take(f"other{n}", "free", clock)[0], f"other{n} refused"
+            now[0] += step
+            # Refills at API_RATE_FREE/min: far less than one token over the run
+            assert not take("hot", "free", clock)[0], f"hot bucket reset after other{n}"
+            assert len(_buckets) <= cap, len(_buckets)
+
+        kept = list(_buckets)
+        assert kept == [f"other{n}" for n in range(others - cap + 1, others)] + ["hot"], kept
+        print(f"cap {cap}: hot jti refused on all {others} turns, "
+              f"{others} other jtis allowed, kept {kept} after {others * 2 * step:.1f}s")
+    finally:
+        API_BUCKETS_MAX = saved[0]
+        _buckets.clear()
+        _buckets.update(saved[1])
+
+
+if __name__ == "__main__":
+    # Through the package module: it is the one app.py's routes use
+    from utils.api_tokens import benchmark, check_buckets
+    if "--check-buckets" in sys.argv:
+        check_buckets()
+        sys.exit(0)
+    benchmark()
+    sys.exit(0)
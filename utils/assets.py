@@ -0,0 +1,221 @@
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+import sys
+import threading
+from collections import OrderedDict
+
+from flask import Response, abort, render_template, request, session, url_for
+
+# ============================================================
+# STATIC ASSETS + PUBLIC PAGE CACHING
+# ============================================================
+# asset_url("css/style.css") → /assets/css/style.<hash>.css
+# Fingerprinted URLs change whenever the file changes, so they are served
+# with a one-year immutable Cache-Control. Text assets are compressed
+# once per process (gzip, plus brotli when the optional `brotli` package
+# is installed) and the matching variant is picked from Accept-Encoding.
+#
+# Public pages are rendered once per variant (path + login state) and
+# served with an ETag so repeat visits get a 304. The canonical/og:url
+# origin comes from PUBLIC_SITE_URL; without it the Host header is part of
+# the variant so one client's Host never ends up in another's page. The
+# render cache is an LRU of PUBLIC_PAGE_CACHE_SIZE entries either way.
+#
+# python -m utils.assets   → checks the cache headers on / and an asset
+
+ASSET_MAX_AGE = 365 * 24 * 3600
+PAGE_MAX_AGE = int(os.environ.get("PUBLIC_PAGE_MAX_AGE", 300))
+PAGE_CACHE_SIZE = int(os.environ.get("PUBLIC_PAGE_CACHE_SIZE", 64))
+PUBLIC_SITE_URL = (os.environ.get("PUBLIC_SITE_URL") or "").rstrip("/")
+COMPRESSIBLE = {".css", ".js", ".svg", ".txt", ".json", ".html"}
+
+FINGERPRINTED = re.compile(r"^(?P<stem>.+)\.(?P<hash>[0-9a-f]{12})(?P<ext>\.[A-Za-z0-9]+)$")
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+_static_dir = None
+_manifest = {}
+_variants = {}
+_pages = OrderedDict()
+_lock = threading.Lock()
+
+
+# -------------------------------------------------------------
+# MANIFEST (logical path → fingerprinted path)
+# -------------------------------------------------------------
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(65536), b""):
+            digest.update(block)
+    return digest.hexdigest()[:12]
+
+
+def build_manifest(static_dir):
+    manifest = {}
+    for root, dirs, files in os.walk(static_dir):
+        for name in files:
+            path = os.path.join(root, name)
+            logical = os.path.relpath(path, static_dir).replace(os.sep, "/")
+            stem, ext = os.path.splitext(logical)
+            manifest[logical] = f"{stem}.{file_hash(path)}{ext}"
+    return manifest
+
+
+def asset_url(filename):
+    fingerprinted = _manifest.get(filename)
+    if not fingerprinted:
+        return url_for("static", filename=filename)
+    return url_for("asset", filename=fingerprinted)
+
+
+# -------------------------------------------------------------
+# COMPRESSED VARIANTS (built once per file per process)
+# -------------------------------------------------------------
+def load_variants(logical):
+    with _lock:
+        if logical in _variants:
+            return _variants[logical]
+
+    with open(os.path.join(_static_dir, logical), "rb") as f:
+        raw = f.read()
+
+    variants = {"identity": raw}
+    if os.path.splitext(logical)[1] in COMPRESSIBLE:
+        variants["gzip"] = gzip.compress(raw, compresslevel=9, mtime=0)
+        if brotli is not None:
+            variants["br"] = brotli.compress(raw, quality=11)
+
+    with _lock:
+        _variants[logical] = variants
+    return variants
+
+
+def pick_encoding(variants):
+    accepted = request.headers.get("Accept-Encoding", "")
+    for encoding in ("br", "gzip"):
+        if encoding in variants and encoding in accepted:
+            return encoding
+    return "identity"
+
+
+def serve_asset(filename):
+    match = FINGERPRINTED.match(filename)
+    if not match:
+        abort(404)
+
+    logical = match.group("stem") + match.group("ext")
+    if _manifest.get(logical) != filename:
+        abort(404)  # stale or unknown fingerprint
+
+    etag = match.group("hash")
+    if etag in request.if_none_match:
+        response = Response(status=304)
+    else:
+        variants = load_variants(logical)
+        encoding = pick_encoding(variants)
+        response = Response(
+            variants[encoding],
+            mimetype=mimetypes.guess_type(logical)[0] or "application/octet-stream",
+        )
+        if encoding != "identity":
+            response.headers["Content-Encoding"] = encoding
+
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = f"public, max-age={ASSET_MAX_AGE}, immutable"
+    response.headers["Vary"] = "Accept-Encoding"
+    return response
+
+
+# -------------------------------------------------------------
+# PUBLIC PAGES (render cache + ETag/304)
+# -------------------------------------------------------------
+def render_public(template, **context):
+    logged_in = bool(session.get("user_email"))
+    host = None if PUBLIC_SITE_URL else request.host
+    key = (template, request.path, host, logged_in, bool(session.get("is_admin")))
+
+    with _lock:
+        cached = _pages.get(key)
+        if cached is not None:
+            _pages.move_to_end(key)
+
+    if cached is None:
+        if PUBLIC_SITE_URL:
+            context["canonical_url"] = PUBLIC_SITE_URL + request.path
+        body = render_template(template, **context).encode()
+        cached = (body, hashlib.md5(body).hexdigest())
+        with _lock:
+            _pages[key] = cached
+            while len(_pages) > PAGE_CACHE_SIZE:
+                _pages.popitem(last=False)
+
+    body, etag = cached
+    response = Response(body, mimetype="text/html")
+    response.set_etag(etag)
+    if logged_in:
+        response.headers["Cache-Control"] = "private, no-cache"
+    else:
+        response.headers["Cache-Control"] = f"public, max-age={PAGE_MAX_AGE}"
+    response.headers["Vary"] = "Cookie"
+    return response.make_conditional(request)
+
+
+# -------------------------------------------------------------
+# APP WIRING
+# -------------------------------------------------------------
+def init_assets(app):
+    global _static_dir, _manifest
+    _static_dir = app.static_folder
+    _manifest = build_manifest(_static_dir)
+
+    app.add_url_rule("/assets/<path:filename>", "asset", serve_asset)
+    app.jinja_env.globals["asset_url"] = asset_url
+
+
+# -------------------------------------------------------------
+# HEADER CHECK (Flask test client)
+# -------------------------------------------------------------
+def check_headers():
+    from app import app
+
+    client = app.test_client()
+
+    page = client.get("/")
+    assert page.status_code == 200
+    assert page.headers["ETag"] and page.headers["Vary"] == "Cookie"
+    assert page.headers["Cache-Control"] == f"public, max-age={PAGE_MAX_AGE}"
+    assert client.get("/", headers={"If-None-Match": page.headers["ETag"]}).status_code == 304
+
+    # Other Host headers never grow the cache past its cap
+    for i in range(PAGE_CACHE_SIZE * 3):
+        client.get("/", headers={"Host": f"h{i}.example"})
+    assert len(_pages) <= PAGE_CACHE_SIZE
+
+    with app.test_request_context():
+        url = asset_url("css/style.css")
+    asset = client.get(url, headers={"Accept-Encoding": "gzip"})
+    assert asset.status_code == 200 and asset.headers["Content-Encoding"] == "gzip"
+    assert asset.headers["Cache-Control"] == f"public, max-age={ASSET_MAX_AGE}, immutable"
+    assert asset.headers["Vary"] == "Accept-Encoding"
+    assert client.get(url, headers={"If-None-Match": asset.headers["ETag"]}).status_code == 304
+
+    stale = FINGERPRINTED.sub(lambda m: f"{m['stem']}.{'0' * 12}{m['ext']}", url)
+    assert client.get(stale).status_code == 404
+
+    print(f"/: ETag {page.headers['ETag']}, {page.headers['Cache-Control']}")
+    print(f"{url}: {asset.headers['Cache-Control']}, gzip {len(asset.data)} bytes")
+    print(f"page cache: {len(_pages)} entries after {PAGE_CACHE_SIZE * 3} Host variants")
+
+
+if __name__ == "__main__":
+    # Through the package module: it is the one app.py initialized
+    from utils.assets import check_headers
+    check_headers()
+    sys.exit(0)
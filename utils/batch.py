@@ -0,0 +1,401 @@
+import argparse
+import gzip
+import io
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+import zlib
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from utils.budget import SCAN_MAX_BYTES, SCAN_MAX_DECOMPRESSED_BYTES
+from utils.charset import header_charset
+from utils.workers import warm_worker
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+# ============================================================
+# OFFLINE BATCH ANALYZER (HTML directories, WARC archives)
+# ============================================================
+# Re-scores stored pages without fetching them:
+#
+#   python -m utils.batch crawl.warc.gz -o scores.jsonl
+#   python -m utils.batch pages/ --base-url https://example.com/ -o scores.parquet
+#
+# The parent process streams the inputs (WARC/WARC.gz record by record,
+# or HTML files from a directory tree) and hands batches of raw pages to
+# a pool of worker processes. Each worker runs the analyzer's scoring
+# pipeline (charset detection, analyze_html, finish_scores) under a
+# budget of zero outbound requests: link and asset probes are skipped
+# and recorded in page_meta["truncated"], so links score neutral and
+# results depend only on the stored bytes. Workers return finished
+# output rows (JSON lines, or column tuples for Parquet), so the parent
+# only reads, dispatches and writes. At most BATCH_IN_FLIGHT batches per
+# worker are outstanding, which keeps memory flat on multi-GB archives,
+# and results come out in input order.
+#
+# Parquet output needs pyarrow (optional, not in requirements.txt).
+#
+# python -m utils.batch --bench   → synthetic WARC.gz, pages/s for 1..N workers
+
+BATCH_PAGES = int(os.environ.get("BATCH_PAGES", 16))
+BATCH_IN_FLIGHT = 4
+PARQUET_ROW_GROUP = 10_000
+MAX_RECORD_BYTES = SCAN_MAX_BYTES + 64 * 1024  # page plus HTTP headers
+HTML_SUFFIXES = {".html", ".htm", ".xhtml"}
+
+PARQUET_COLUMNS = (
+    ("url", "string"), ("source", "string"), ("error", "string"),
+    ("score", "int16"), ("content", "int16"), ("technical", "int16"),
+    ("keyword", "int16"), ("onpage", "int16"), ("links", "int16"),
+    ("title", "string"), ("title_length", "int32"), ("description_length", "int32"),
+    ("word_count", "int32"), ("readability_score", "int16"), ("h1_count", "int32"),
+    ("alt_coverage", "int16"), ("schema_present", "bool"), ("viewport_present", "bool"),
+    ("canonical_url", "string"), ("links_total", "int32"), ("simhash", "string"),
+)
+META_COLUMNS = ("title", "title_length", "description_length", "word_count", "readability_score",
+                "h1_count", "alt_coverage", "schema_present", "viewport_present", "canonical_url")
+
+
+# ---------------------------------------------------
+# WARC (streamed, record by record)
+# ---------------------------------------------------
+def open_maybe_gzip(path):
+    raw = open(path, "rb")
+    if raw.peek(2)[:2] == b"\x1f\x8b":
+        # Per-record gzip members read back as one stream
+        return io.BufferedReader(gzip.GzipFile(fileobj=raw), 1 << 20)
+    return raw
+
+
+def warc_records(stream):
+    """(headers, block) for every record; blocks over MAX_RECORD_BYTES
+    come back as None and are skipped without being held in memory."""
+    while True:
+        line = stream.readline()
+        if not line:
+            return
+        if not line.strip():
+            continue
+        if not line.startswith(b"WARC/"):
+            raise ValueError(f"not a WARC record header: {line[:40]!r}")
+
+        headers = {}
+        for line in iter(stream.readline, b""):
+            if not line.strip():
+                break
+            name, _, value = line.decode("utf-8", "replace").partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        length = int(headers.get("content-length", 0))
+        if length <= MAX_RECORD_BYTES:
+            yield headers, stream.read(length)
+            continue
+        while length > 0:
+            chunk = stream.read(min(length, 1 << 20))
+            if not chunk:
+                return
+            length -= len(chunk)
+        yield headers, None
+
+
+def dechunk(body):
+    parts, pos = [], 0
+    while True:
+        end = body.find(b"\r\n", pos)
+        if end < 0:
+            break
+        try:
+            size = int(body[pos:end].split(b";")[0], 16)
+        except ValueError:
+            break
+        if size == 0:
+            break
+        parts.append(body[end + 2:end + 2 + size])
+        pos = end + 2 + size + 2
+    return b"".join(parts)
+
+
+def http_payload(block):
+    """(body, declared charset) of a 200 HTML response, else None."""
+    head, sep, body = block.partition(b"\r\n\r\n")
+    if not sep:
+        return None
+    lines = head.decode("iso-8859-1").split("\r\n")
+    status = lines[0].split(" ", 2)
+    if len(status) < 2 or status[1] != "200":
+        return None
+
+    headers = {}
+    for line in lines[1:]:
+        name, _, value = line.partition(":")
+        headers[name.strip().lower()] = value.strip()
+
+    content_type = headers.get("content-type", "")
+    if content_type and "html" not in content_type.lower():
+        return None
+    if "chunked" in headers.get("transfer-encoding", "").lower():
+        body = dechunk(body)
+
+    encoding = headers.get("content-encoding", "").lower()
+    if encoding in ("gzip", "x-gzip", "deflate"):
+        inflater = zlib.decompressobj(47 if encoding != "deflate" else zlib.MAX_WBITS)
+        try:
+            body = inflater.decompress(body, SCAN_MAX_DECOMPRESSED_BYTES)
+        except zlib.error:
+            return None
+    elif encoding not in ("", "identity"):
+        return None  # br / zstd: not worth a dependency here
+
+    return body[:SCAN_MAX_BYTES], header_charset(content_type)
+
+
+def warc_pages(path):
+    """(source, url, body, declared charset) for HTML responses in a WARC."""
+    source = str(path)
+    with open_maybe_gzip(path) as stream:
+        for headers, block in warc_records(stream):
+            if block is None or headers.get("warc-type") != "response":
+                continue
+            if not headers.get("content-type", "").startswith("application/http"):
+                continue
+            payload = http_payload(block)
+            if payload is not None:
+                yield source, headers.get("warc-target-uri", "").strip("<>"), payload[0], payload[1]
+
+
+# ---------------------------------------------------
+# HTML DIRECTORIES
+# ---------------------------------------------------
+def file_pages(root, base_url=None):
+    root = Path(root)
+    paths = [root] if root.is_file() else sorted(
+        p for p in root.rglob("*") if p.is_file() and p.suffix.lower() in HTML_SUFFIXES
+    )
+    for path in paths:
+        if base_url:
+            relative = path.relative_to(root).as_posix() if path != root else path.name
+            url = base_url.rstrip("/") + "/" + relative
+        else:
+            url = path.resolve().as_uri()
+        with open(path, "rb") as f:
+            yield str(path), url, f.read(SCAN_MAX_BYTES), None
+
+
+def input_pages(inputs, base_url=None):
+    for name in inputs:
+        path = Path(name)
+        if path.is_dir() or path.suffix.lower() in HTML_SUFFIXES:
+            yield from file_pages(path, base_url)
+        else:
+            yield from warc_pages(path)
+
+
+def batches(pages, size=BATCH_PAGES):
+    batch = []
+    for page in pages:
+        batch.append(page)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+# ---------------------------------------------------
+# WORKER (module level, picklable)
+# ---------------------------------------------------
+def score_page(url, body, declared, keyword=None):
+    from utils.analyzer import analyze_html, finish_scores
+    from utils.budget import ScanBudget
+    from utils.charset import detect_encoding
+
+    encoding, _ = detect_encoding(body, declared)
+    record = analyze_html(body, encoding, keyword)
+    # No outbound requests: link and asset probes are skipped, not failed
+    return finish_scores(url, record, budget=ScanBudget(max_requests=0))
+
+
+def output_row(source, url, result, error, fmt):
+    if fmt == "jsonl":
+        data = {"url": url, "source": source}
+        if error:
+            data["error"] = error
+        else:
+            data.update(result.to_dict())
+        return json.dumps(data, separators=(",", ":"), default=str)
+
+    if error:
+        return (url, source, error) + (None,) * (len(PARQUET_COLUMNS) - 3)
+    meta = result.page_meta
+    return (
+        (url, source, None, result.score) + result.subscores.as_tuple()
+        + tuple(meta.get(field) for field in META_COLUMNS)
+        + ((meta.get("link_audit") or {}).get("total"), meta.get("simhash"))
+    )
+
+
+def score_batch(batch, keyword, fmt):
+    rows = []
+    for source, url, body, declared in batch:
+        try:
+            result, error = score_page(url, body, declared, keyword), None
+        except Exception as e:
+            result, error = None, f"{type(e).__name__}: {e}"[:300]
+        rows.append(output_row(source, url, result, error, fmt))
+    return rows
+
+
+# ---------------------------------------------------
+# RUN (bounded in-flight batches, results in input order)
+# ---------------------------------------------------
+def scored_rows(pages, keyword=None, fmt="jsonl", processes=None):
+    processes = processes or os.cpu_count() or 1
+    if processes == 1:
+        for batch in batches(pages):
+            yield from score_batch(batch, keyword, fmt)
+        return
+
+    with ProcessPoolExecutor(max_workers=processes,
+                             mp_context=multiprocessing.get_context("spawn"),
+                             initializer=warm_worker) as pool:
+        pending = deque()
+        for batch in batches(pages):
+            pending.append(pool.submit(score_batch, batch, keyword, fmt))
+            if len(pending) >= processes * BATCH_IN_FLIGHT:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+
+def write_jsonl(rows, out):
+    count = 0
+    for line in rows:
+        out.write(line + "\n")
+        count += 1
+    return count
+
+
+def parquet_table(group, schema):
+    columns = zip(*group)  # rows → columns
+    return pyarrow.Table.from_arrays(
+        [pyarrow.array(column, type=field.type) for column, field in zip(columns, schema)], schema=schema
+    )
+
+
+def write_parquet(rows, path):
+    """One row group per PARQUET_ROW_GROUP rows; only one group in memory."""
+    schema = pyarrow.schema([(name, pyarrow.type_for_alias(kind)) for name, kind in PARQUET_COLUMNS])
+    count = 0
+    with pyarrow.parquet.ParquetWriter(path, schema, compression="zstd") as writer:
+        group = []
+        for row in rows:
+            group.append(row)
+            if len(group) >= PARQUET_ROW_GROUP:
+                writer.write_table(parquet_table(group, schema))
+                count += len(group)
+                group = []
+        if group:
+            writer.write_table(parquet_table(group, schema))
+            count += len(group)
+    return count
+
+
+def run(inputs, output=None, fmt=None, keyword=None, processes=None, base_url=None):
+    fmt = fmt or ("parquet" if output and output.endswith(".parquet") else "jsonl")
+    if fmt == "parquet" and pyarrow is None:
+        raise SystemExit("parquet output needs pyarrow (pip install pyarrow)")
+    if fmt == "parquet" and not output:
+        raise SystemExit("parquet output needs -o FILE")
+
+    # Offline means no DB round trips either (link status cache)
+    os.environ["LINK_CACHE"] = "0"
+
+    started = time.perf_counter()
+    rows = scored_rows(input_pages(inputs, base_url), keyword, fmt, processes)
+    if fmt == "parquet":
+        count = write_parquet(rows, output)
+    elif output:
+        with open(output, "w", encoding="utf-8") as out:
+            count = write_jsonl(rows, out)
+    else:
+        count = write_jsonl(rows, sys.stdout)
+
+    elapsed = time.perf_counter() - started
+    print(f"{count} pages in {elapsed:.1f}s ({count / elapsed:.1f} pages/s)", file=sys.stderr)
+    return count, elapsed
+
+
+# -------------------------------------------------------------
+# BENCHMARK (synthetic WARC.gz, 1..N workers)
+# -------------------------------------------------------------
+def write_warc(path, pages=2000, seed_words=400):
+    """Gzipped WARC with one response record per synthetic page, each
+    record its own gzip member (as crawlers write them)."""
+    words = ["espresso", "grinder", "burr", "portafilter", "tamp", "crema", "roast", "bean",
+             "extraction", "pressure", "dose", "ratio", "milk", "steam", "cup", "water"]
+    with open(path, "wb") as out:
+        for n in range(pages):
+            text = " ".join(words[(n * 7 + i * i) % len(words)] for i in range(seed_words))
+            links = "".join(f'<a href="/p{(n + k) % pages}">related {k}</a>' for k in range(1, 6))
+            html = (
+                f"<!doctype html><html><head><title>Page {n} about espresso</title>"
+                f"<meta name='description' content='Fixture page {n}'></head><body>"
+                f"<h1>Espresso page {n}</h1><h2>Grinders</h2><p>{text}.</p><p>{text}.</p>{links}"
+                f"<img src='/i{n}.jpg' alt='cup'></body></html>"
+            ).encode()
+            http = (b"HTTP/1.1 200 OK\r\nContent-Type: text/html; charset=utf-8\r\n"
+                    b"Content-Length: " + str(len(html)).encode() + b"\r\n\r\n" + html)
+            record = (
+                b"WARC/1.0\r\nWARC-Type: response\r\n"
+                b"WARC-Target-URI: https://fixture.example/p" + str(n).encode() + b"\r\n"
+                b"Content-Type: application/http; msgtype=response\r\n"
+                b"Content-Length: " + str(len(http)).encode() + b"\r\n\r\n" + http + b"\r\n\r\n"
+            )
+            out.write(gzip.compress(record, 6))
+
+
+def benchmark(pages=1000):
+    with tempfile.TemporaryDirectory() as tmp:
+        archive = os.path.join(tmp, "bench.warc.gz")
+        write_warc(archive, pages)
+        size = os.path.getsize(archive)
+        print(f"{pages} pages, {size / 1e6:.1f} MB gzipped WARC, {os.cpu_count()} CPUs")
+        counts = sorted({1, 2, 4, os.cpu_count() or 1})
+        baseline = None
+        for processes in counts:
+            count, elapsed = run([archive], os.path.join(tmp, "out.jsonl"), processes=processes)
+            rate = count / elapsed
+            baseline = baseline or rate
+            print(f"  {processes:>2} worker(s): {rate:7.1f} pages/s  (×{rate / baseline:.2f})")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m utils.batch", description="Offline SEO scoring of stored pages.")
+    parser.add_argument("inputs", nargs="*", help="WARC / WARC.gz files, HTML files or directories")
+    parser.add_argument("-o", "--output", help="output file (.jsonl or .parquet); JSONL to stdout if omitted")
+    parser.add_argument("--format", choices=("jsonl", "parquet"), help="default: from the output suffix")
+    parser.add_argument("--keyword", help="target keyword for keyword scoring")
+    parser.add_argument("--processes", type=int, help="worker processes (default: all cores)")
+    parser.add_argument("--base-url", help="URL prefix for files in HTML directories")
+    parser.add_argument("--bench", action="store_true", help="throughput on a synthetic archive")
+    args = parser.parse_args(argv)
+
+    if args.bench:
+        benchmark()
+        return
+    if not args.inputs:
+        parser.error("no inputs")
+    run(args.inputs, args.output, args.format, args.keyword, args.processes, args.base_url)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,345 @@
+import os
+import re
+import sys
+import threading
+import time
+
+import requests
+
+from utils.charset import header_charset
+
+# ============================================================
+# PER-SCAN RESOURCE BUDGETS
+# ============================================================
+# Every scan gets a ScanBudget. Any stage that hits a limit stops early
+# and the scan carries on with what it has. Each cut is recorded in
+# `truncated` as {"stage", "reason"}, and that list ends up in
+# page_meta["truncated"].
+#
+#   SCAN_MAX_BYTES               bytes read off the wire (compressed)
+#   SCAN_MAX_DECOMPRESSED_BYTES  body bytes after Content-Encoding
+#   SCAN_MAX_NODES               start tags parsed
+#   SCAN_MAX_SECONDS             wall time for the whole scan
+#   SCAN_MAX_REQUESTS            outbound requests (page + link probes)
+#
+# A stage running alongside others gets a share() of the budget, capped
+# at the requests it may take, so it can't use up another stage's grants.
+#
+# python -m utils.budget   → oversized, gzip-bomb, slow-drip and stalled
+#                            pages from a local server, cut where expected
+
+SCAN_MAX_BYTES = int(os.environ.get("SCAN_MAX_BYTES", 5 * 1024 * 1024))
+SCAN_MAX_DECOMPRESSED_BYTES = int(os.environ.get("SCAN_MAX_DECOMPRESSED_BYTES", 20 * 1024 * 1024))
+SCAN_MAX_NODES = int(os.environ.get("SCAN_MAX_NODES", 200000))
+SCAN_MAX_SECONDS = float(os.environ.get("SCAN_MAX_SECONDS", 45))
+SCAN_MAX_REQUESTS = int(os.environ.get("SCAN_MAX_REQUESTS", 60))
+
+READ_SIZE = 16 * 1024
+FETCH_TIMEOUT = 10
+
+# Header-only probes of page resources (delivery + image audits)
+PROBE_HEADERS = {
+    "User-Agent": "Mozilla/5.0",
+    "Accept-Encoding": "gzip, deflate, br",
+}
+MAX_AGE = re.compile(r"max-age=(\d+)")
+EXPIRES_ASSUMED_SECONDS = 7 * 24 * 3600
+
+START_TAG = re.compile(r"<[A-Za-z]")
+START_TAG_BYTES = re.compile(rb"<[A-Za-z]")
+
+
+class ScanBudget:
+    def __init__(self, max_bytes=SCAN_MAX_BYTES, max_decompressed=SCAN_MAX_DECOMPRESSED_BYTES,
+                 max_nodes=SCAN_MAX_NODES, max_seconds=SCAN_MAX_SECONDS,
+                 max_requests=SCAN_MAX_REQUESTS, clock=time.monotonic):
+        self.max_bytes = max_bytes
+        self.max_decompressed = max_decompressed
+        self.max_nodes = max_nodes
+        self.max_requests = max_requests
+        self.clock = clock
+        self.started = clock()
+        self.deadline = self.started + max_seconds
+        self.requests = 0
+        self.truncated = []
+        self.document = {}  # delivery timings of the page itself, see open_page
+        self.lock = threading.Lock()
+
+    def remaining(self):
+        return self.deadline - self.clock()
+
+    def expired(self):
+        return self.remaining() <= 0
+
+    def timeout(self, limit):
+        return max(0.1, min(limit, self.remaining()))
+
+    def take_request(self):
+        with self.lock:
+            if self.requests >= self.max_requests:
+                return False
+            self.requests += 1
+            return True
+
+    def truncate(self, stage, reason):
+        entry = {"stage": stage, "reason": reason}
+        with self.lock:
+            if entry not in self.truncated:
+                self.truncated.append(entry)
+
+    def usage(self):
+        return {
+            "requests": self.requests,
+            "elapsed_ms": int((self.clock() - self.started) * 1000),
+        }
+
+    def share(self, max_requests):
+        return BudgetShare(self, max_requests)
+
+
+class BudgetShare:
+    """One stage's view of a ScanBudget: at most `max_requests` grants,
+    each also charged to the scan; time, cuts and the rest are the scan's."""
+
+    def __init__(self, budget, max_requests):
+        self.budget = budget
+        self.max_requests = max(0, max_requests)
+        self.requests = 0
+        self.lock = threading.Lock()
+
+    def __getattr__(self, name):
+        return getattr(self.budget, name)
+
+    def take_request(self):
+        with self.lock:
+            if self.requests >= self.max_requests or not self.budget.take_request():
+                return False
+            self.requests += 1
+            return True
+
+
+# -------------------------------------------------------------
+# FETCH UNDER BUDGET
+# -------------------------------------------------------------
+def open_page(url, budget):
+    """Streaming GET for the page itself, or None."""
+    if budget.expired():
+        budget.truncate("fetch", "max_seconds")
+        return None
+    if not budget.take_request():
+        budget.truncate("fetch", "max_requests")
+        return None
+
+    started = time.perf_counter()
+    try:
+        response = requests.get(url, timeout=budget.timeout(FETCH_TIMEOUT), stream=True, headers={
+            "User-Agent": "Mozilla/5.0"
+        })
+    except requests.RequestException:
+        budget.truncate("fetch", "request_error")
+        return None
+
+    if response.status_code != 200:
+        response.close()
+        return None
+
+    # With stream=True the call returns once the headers are in: ≈ TTFB
+    budget.document = {
+        "started": started,
+        "ttfb_ms": int((time.perf_counter() - started) * 1000),
+        "content_encoding": response.headers.get("Content-Encoding"),
+        "cache_control": response.headers.get("Cache-Control"),
+    }
+    return response
+
+
+def body_chunks(response, budget):
+    """Decompressed body chunks until EOF or the first exhausted budget."""
+    raw = response.raw
+    # read1 returns as soon as *some* bytes arrive, so a slow-drip server
+    # cannot hold a read past the deadline (urllib3 1.x lacks it)
+    read1 = getattr(raw, "read1", None)
+    fallback = None if read1 else raw.stream(READ_SIZE, decode_content=True)
+
+    try:
+        yield from read_limited(raw, read1, fallback, budget)
+    finally:
+        document = budget.document
+        if "started" in document:
+            document["download_ms"] = int((time.perf_counter() - document.pop("started")) * 1000)
+            document["transfer_bytes"] = raw.tell()
+
+
+def read_limited(raw, read1, fallback, budget):
+    received = 0
+    while True:
+        if budget.expired():
+            budget.truncate("fetch", "max_seconds")
+            return
+
+        try:
+            chunk = read1(READ_SIZE, decode_content=True) if read1 else next(fallback, b"")
+        except Exception:
+            budget.truncate("fetch", "read_error")
+            return
+        if not chunk:
+            return
+
+        if received + len(chunk) > budget.max_decompressed:
+            yield chunk[:budget.max_decompressed - received]
+            budget.truncate("fetch", "max_decompressed_bytes")
+            return
+        received += len(chunk)
+        yield chunk
+
+        if raw.tell() >= budget.max_bytes:
+            budget.truncate("fetch", "max_bytes")
+            return
+
+
+def fetch_body(url, budget):
+    response = open_page(url, budget)
+    if response is None:
+        return None, None
+
+    try:
+        body = b"".join(body_chunks(response, budget))
+    finally:
+        response.close()
+
+    if not body:
+        return None, None
+    # Only an explicit charset: requests' ISO-8859-1 default for text/*
+    # would hide a <meta charset> (see utils/charset)
+    return body, header_charset(response.headers.get("Content-Type"))
+
+
+def cache_seconds(headers):
+    cache_control = (headers.get("Cache-Control") or "").lower()
+    if "no-store" in cache_control or "no-cache" in cache_control:
+        return 0
+    match = MAX_AGE.search(cache_control)
+    if match:
+        return int(match.group(1))
+    # An explicit Expires without max-age: treat as a week
+    return EXPIRES_ASSUMED_SECONDS if headers.get("Expires") else 0
+
+
+# -------------------------------------------------------------
+# NODE BUDGET (cap the markup before a tree is built)
+# -------------------------------------------------------------
+def limit_nodes(markup, budget):
+    pattern = START_TAG_BYTES if isinstance(markup, bytes) else START_TAG
+    for count, match in enumerate(pattern.finditer(markup), 1):
+        if count > budget.max_nodes:
+            budget.truncate("parse", "max_nodes")
+            return markup[:match.start()]
+    return markup
+
+
+# -------------------------------------------------------------
+# LIMIT CHECK (hostile pages from a local server)
+# -------------------------------------------------------------
+def hostile_site(drip_interval=0.1):
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    import gzip
+
+    head = b"<html><head><title>Hostile page</title></head><body><h1>Hostile page</h1>"
+    paragraph = b"<p>" + b"espresso grinder burr portafilter tamp " * 20 + b"</p>"
+    oversized = head + paragraph * (4 * 1024 * 1024 // len(paragraph))
+    bomb = gzip.compress(head + b"<p>" + b" " * (64 * 1024 * 1024), compresslevel=9)
+
+    class Page(BaseHTTPRequestHandler):
+        def do_GET(self):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            if self.path == "/oversized":
+                self.send_header("Content-Length", str(len(oversized)))
+                self.end_headers()
+                self.write(oversized)
+            elif self.path == "/bomb":
+                self.send_header("Content-Encoding", "gzip")
+                self.send_header("Content-Length", str(len(bomb)))
+                self.end_headers()
+                self.write(bomb)
+            else:
+                # /drip: a few bytes at a time, forever; /stall: headers only
+                self.send_header("Content-Length", str(10 ** 9))
+                self.end_headers()
+                self.write(head)
+                started = time.monotonic()
+                while time.monotonic() - started < 30:
+                    time.sleep(drip_interval)
+                    if self.path == "/drip" and not self.write(b"tamp "):
+                        return
+
+        def write(self, data):
+            try:
+                self.wfile.write(data)
+                self.wfile.flush()
+                return True
+            except OSError:
+                return False  # the client hung up, which is the point
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Page)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, len(bomb)
+
+
+def check_limits():
+    from utils.analyzer import run_local_seo_analysis
+
+    server, bomb_size = hostile_site()
+    base = f"http://127.0.0.1:{server.server_port}"
+    cut = {"stage": "fetch", "reason": None}
+
+    def fetch(path, **limits):
+        budget = ScanBudget(**limits)
+        started = time.monotonic()
+        body, _ = fetch_body(base + path, budget)
+        return body or b"", budget, time.monotonic() - started
+
+    body, budget, _ = fetch("/oversized", max_bytes=256 * 1024)
+    print(f"oversized: read {len(body):,} of 4 MiB, truncated {budget.truncated}")
+    assert 256 * 1024 <= len(body) < 256 * 1024 + READ_SIZE * 2, len(body)
+    assert budget.truncated == [dict(cut, reason="max_bytes")], budget.truncated
+
+    body, budget, _ = fetch("/bomb", max_decompressed=1024 * 1024)
+    print(f"gzip bomb ({bomb_size:,} bytes → 64 MiB): kept {len(body):,}, truncated {budget.truncated}")
+    assert len(body) == 1024 * 1024, len(body)
+    assert budget.truncated == [dict(cut, reason="max_decompressed_bytes")], budget.truncated
+
+    for path in ("/drip", "/stall"):
+        body, budget, elapsed = fetch(path, max_seconds=1.5)
+        print(f"{path[1:]}: {elapsed:.2f}s for a 1.5s budget, {len(body):,} bytes, truncated {budget.truncated}")
+        assert elapsed < 1.5 + 0.5, elapsed
+        assert body.startswith(b"<html>"), body[:40]
+        assert budget.truncated[0]["reason"] in ("max_seconds", "read_error"), budget.truncated
+
+    body, budget, _ = fetch("/oversized", max_requests=0)
+    assert body == b"" and budget.truncated == [dict(cut, reason="max_requests")], budget.truncated
+
+    # The scan still scores what was read, and reports the cut
+    for streaming in (False, True):
+        for path, limits, reason in (
+            ("/oversized", {"max_bytes": 256 * 1024}, "max_bytes"),
+            ("/drip", {"max_seconds": 1.5}, "max_seconds"),
+        ):
+            started = time.monotonic()
+            result = run_local_seo_analysis(base + path, streaming=streaming, budget=ScanBudget(**limits))
+            elapsed = time.monotonic() - started
+            print(f"scan {path[1:]} (streaming={streaming}): {elapsed:.2f}s, score {result.score}, "
+                  f"truncated {result.page_meta.get('truncated')}")
+            assert result.ok and result.page_meta["title"] == "Hostile page", result.page_meta.get("title")
+            assert dict(cut, reason=reason) in result.page_meta["truncated"], result.page_meta["truncated"]
+            assert elapsed < 5, elapsed
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    check_limits()
+    sys.exit(0)
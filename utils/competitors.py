@@ -0,0 +1,122 @@
+import os
+import statistics
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.analyzer import clean_text, rank_semantic_terms, run_local_seo_analysis
+from utils.content_gap import content_gap
+from utils.scan_result import SUBSCORE_FIELDS
+
+# ============================================================
+# COMPETITOR MATRIX
+# ============================================================
+# The main page and up to COMPETITOR_MAX competitors are analyzed
+# concurrently, each with its own scan budget, so the whole matrix takes
+# about as long as the slowest page. Every page is tokenized once, by its
+# own scan; the term Counter it returns (ScanResult.terms) is all the
+# matrix needs.
+#
+# One keyword model is compiled for the whole matrix: the target
+# keyword's terms, then the semantic terms of every page, in that order.
+# Each page's term density (per 1000 words) is measured against that one
+# list, and a gap is a term most competitors use that the main page
+# lacks or underuses.
+
+COMPETITOR_MAX = int(os.environ.get("COMPETITOR_MAX", 10))
+MATRIX_CONCURRENCY = int(os.environ.get("MATRIX_CONCURRENCY", 6))
+TERMS_PER_PAGE = 15
+MAX_GAPS = 25
+UNDERUSED_RATIO = 0.5  # main density below half the competitor median
+
+MATRIX_COLUMNS = ("score",) + SUBSCORE_FIELDS
+
+
+def matrix_urls(url, competitors):
+    seen = {url}
+    picked = []
+    for competitor in competitors or []:
+        competitor = (competitor or "").strip()
+        if competitor and competitor not in seen:
+            seen.add(competitor)
+            picked.append(competitor)
+    return picked[:COMPETITOR_MAX]
+
+
+def analyze_all(urls, keyword=None):
+    """ScanResults in `urls` order, fetched and scored concurrently."""
+    with ThreadPoolExecutor(max_workers=min(MATRIX_CONCURRENCY, len(urls)),
+                            thread_name_prefix="matrix") as pool:
+        return list(pool.map(lambda u: run_local_seo_analysis(u, keyword), urls))
+
+
+# ---------------------------------------------------
+# SHARED KEYWORD MODEL
+# ---------------------------------------------------
+def compile_terms(keyword, counters):
+    terms = dict.fromkeys(clean_text(keyword or "").split())
+    for counts in counters:
+        terms.update(dict.fromkeys(rank_semantic_terms(counts, sum(counts.values()), TERMS_PER_PAGE)))
+    return list(terms)
+
+
+def densities(terms, counts, word_count):
+    if not word_count:
+        return [0.0] * len(terms)
+    return [round(counts.get(term, 0) * 1000 / word_count, 2) for term in terms]
+
+
+def coverage_gaps(terms, main, competitors):
+    """Terms most competitors use that the main page lacks or underuses."""
+    if not competitors:
+        return []
+    quorum = max(1, (len(competitors) + 1) // 2)
+
+    gaps = []
+    for i, term in enumerate(terms):
+        used = [row[i] for row in competitors if row[i] > 0]
+        if len(used) < quorum:
+            continue
+        median = statistics.median(used)
+        if main[i] < median * UNDERUSED_RATIO:
+            gaps.append({
+                "term": term,
+                "competitors_using": len(used),
+                "competitor_median": round(median, 2),
+                "main": main[i],
+                "missing": main[i] == 0,
+            })
+    gaps.sort(key=lambda g: (g["competitors_using"], g["competitor_median"]), reverse=True)
+    return gaps[:MAX_GAPS]
+
+
+# ---------------------------------------------------
+# MATRIX
+# ---------------------------------------------------
+def competitor_matrix(main_url, main, competitor_urls, competitors, keyword=None):
+    pages = [(main_url, "main", main)] + [
+        (url, "competitor", result) for url, result in zip(competitor_urls, competitors)
+    ]
+    ok = [(url, role, result) for url, role, result in pages if result.ok]
+
+    terms = compile_terms(keyword, [result.terms or {} for _, _, result in ok])
+    rows = []
+    vectors = {}
+    for url, role, result in pages:
+        row = {"url": url, "role": role, "ok": result.ok}
+        if result.ok:
+            row.update(result.summary())
+            row["word_count"] = result.page_meta.get("word_count", 0)
+            vectors[url] = densities(terms, result.terms or {}, row["word_count"])
+        rows.append(row)
+
+    main_vector = vectors.get(main_url)
+    competitor_vectors = [vectors[url] for url, role, _ in ok if role == "competitor"]
+
+    return {
+        "columns": list(MATRIX_COLUMNS),
+        "rows": rows,
+        "terms": terms,
+        "density": vectors,
+        "gaps": coverage_gaps(terms, main_vector, competitor_vectors) if main_vector else [],
+        "content_gap": content_gap(main, [result for _, role, result in ok if role == "competitor"])
+        if main.ok else None,
+    }
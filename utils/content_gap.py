@@ -0,0 +1,177 @@
+import sys
+import time
+from collections import Counter
+
+import numpy as np
+
+# ============================================================
+# CONTENT GAP (hashed TF-IDF vectors)
+# ============================================================
+# Each page's words and bigrams (ScanResult.terms / .phrases, counted
+# once by its scan) are hashed into a fixed HASH_DIM-wide vector. The
+# hashing trick has no vocabulary to build or store, and every page lands
+# in the same space. The pages form a matrix:
+#   tf      1 + log(count)
+#   idf     log((1 + pages) / (1 + pages using the slot)) + 1
+#   rows    L2-normalized, so cosine similarity is one mat-vec
+# Only the slots some page uses become matrix columns. Gap weight per
+# slot = mean competitor weight − main page weight, and the top slots map
+# back to the most frequent term that hashed there. All local, no model.
+#
+# python -m utils.content_gap   → timing on synthetic pages
+
+HASH_BITS = 18
+HASH_DIM = 1 << HASH_BITS
+MAX_GAP_TERMS = 20
+MAX_GAP_PHRASES = 15
+MIN_TERM_LENGTH = 4  # same cut as rank_semantic_terms
+
+# Multiply-shift hashing over the UTF-32 code points of each entry, all
+# entries at once: sum(code[i] * WEIGHTS[i]) mod 2^64, top HASH_BITS bits.
+# Fixed seed, so a term maps to the same slot in every process.
+HASH_WEIGHTS = np.random.default_rng(0x5E0).integers(1, 1 << 63, 256, dtype=np.uint64) | np.uint64(1)
+
+
+def term_slots(codes):
+    """Slots for a numpy unicode array of entries."""
+    width = min(codes.dtype.itemsize // 4, len(HASH_WEIGHTS))
+    points = codes.view(np.uint32).reshape(len(codes), -1)[:, :width].astype(np.uint64)
+    return (points * HASH_WEIGHTS[:width]).sum(axis=1) >> np.uint64(64 - HASH_BITS)
+
+
+# ---------------------------------------------------
+# HASHED VECTORS
+# ---------------------------------------------------
+def hashed_matrix(pages):
+    """tf matrix over the hash slots any page uses, plus each slot's label.
+
+    `pages` is a list of (terms, phrases) Counters. A dozen pages touch a
+    few thousand of the HASH_DIM slots, so the all-zero columns are never
+    materialized. Filtering and hashing are vectorized over all entries.
+    Labels come back as a callable: column → most frequent entry there.
+    """
+    keys, counts, sizes = [], [], []
+    for terms, phrases in pages:
+        for source in (terms or {}, phrases or {}):
+            keys.extend(source)
+            counts.extend(source.values())
+            sizes.append(len(source))
+    if not keys:
+        return np.zeros((len(pages), 0), np.float32), None
+
+    codes = np.array(keys)
+    rows = np.repeat(np.arange(len(pages)), np.add.reduceat(sizes, np.arange(0, len(sizes), 2)))
+    phrase = np.repeat(np.tile([False, True], len(pages)), sizes)
+    # Phrases arrive pre-filtered (analyzer.topical_phrase); words need
+    # the same length cut as the semantic terms
+    keep = phrase | ((np.strings.str_len(codes) >= MIN_TERM_LENGTH) & ~np.strings.isdigit(codes))
+    codes, rows = codes[keep], rows[keep]
+    counts = np.array(counts, dtype=np.float32)[keep]
+    if not len(codes):
+        return np.zeros((len(pages), 0), np.float32), None
+
+    used, columns = np.unique(term_slots(codes), return_inverse=True)
+    matrix = np.zeros((len(pages), len(used)), dtype=np.float32)
+    # Colliding entries on one page add up, like one bigger term
+    np.add.at(matrix, (rows, columns), 1 + np.log(counts))
+
+    # Label: the entry with the highest count in each slot
+    order = np.lexsort((counts, columns))
+    last = np.flatnonzero(np.append(columns[order][1:] != columns[order][:-1], True))
+    best = order[last]
+    return matrix, lambda column: str(codes[best[column]])
+
+
+def tfidf(matrix):
+    df = np.count_nonzero(matrix, axis=0)
+    idf = np.log((1 + len(matrix)) / (1 + df)).astype(np.float32) + 1
+    weighted = matrix * idf
+    norms = np.linalg.norm(weighted, axis=1, keepdims=True)
+    return np.divide(weighted, norms, out=np.zeros_like(weighted), where=norms > 0)
+
+
+# ---------------------------------------------------
+# GAP REPORT (main page = row 0)
+# ---------------------------------------------------
+def content_gap(main, competitors):
+    """Similarity to each competitor and the high-weight terms and phrases
+    competitors cover that the main page does not.
+
+    `main` / `competitors` are ScanResults (or anything with .terms and
+    .phrases Counters); failed scans should be left out by the caller.
+    """
+    if not competitors or not (main.terms or main.phrases):
+        return None
+
+    counts, labels = hashed_matrix([(main.terms, main.phrases)] + [(c.terms, c.phrases) for c in competitors])
+    vectors = tfidf(counts)
+    similarity = vectors[1:] @ vectors[0]
+
+    gap = vectors[1:].mean(axis=0) - vectors[0]
+    coverage = np.count_nonzero(counts[1:], axis=0)
+    # Only slots competitors weight more than the main page; enough
+    # candidates to fill both lists even if one kind dominates
+    limit = 4 * (MAX_GAP_TERMS + MAX_GAP_PHRASES)
+    candidates = np.flatnonzero(gap > 0)
+    if len(candidates) > limit:
+        candidates = candidates[np.argpartition(-gap[candidates], limit)[:limit]]
+    ranked = candidates[np.argsort(-gap[candidates], kind="stable")]
+
+    terms, phrases = [], []
+    for column in ranked.tolist():
+        label = labels(column)
+        entry = {
+            "term": label,
+            "weight": round(float(gap[column]), 4),
+            "competitors_using": int(coverage[column]),
+            "missing": bool(counts[0, column] == 0),
+        }
+        if " " in label:
+            if len(phrases) < MAX_GAP_PHRASES:
+                phrases.append(entry)
+        elif len(terms) < MAX_GAP_TERMS:
+            terms.append(entry)
+
+    return {
+        "similarity": [round(float(s), 3) for s in similarity],
+        "missing_terms": terms,
+        "missing_phrases": phrases,
+    }
+
+
+# -------------------------------------------------------------
+# BENCHMARK (a dozen 10k-word pages)
+# -------------------------------------------------------------
+class SyntheticPage:
+    # Capped like ScanResult.terms / .phrases (analyzer.MAX_RESULT_TERMS)
+    def __init__(self, words, cap=2000):
+        from utils.analyzer import top_phrases
+        self.terms = Counter(dict(Counter(words).most_common(cap)))
+        self.phrases = top_phrases(Counter(map(" ".join, zip(words, words[1:]))), cap)
+
+
+def benchmark(pages=12, words=10_000, rounds=20, seed=5):
+    rng = np.random.default_rng(seed)
+    vocabulary = np.array([f"word{i}" for i in range(30_000)])
+    # Zipf-like vocabulary use, as in real text
+    ranks = np.minimum(rng.zipf(1.15, (pages, words)), len(vocabulary)) - 1
+    corpus = [SyntheticPage(vocabulary[row].tolist()) for row in ranks]
+    # Plant a topic only the competitors cover
+    for page in corpus[1:]:
+        page.terms["portafilter"] += 40
+        page.phrases["espresso portafilter"] += 25
+
+    started = time.perf_counter()
+    for _ in range(rounds):
+        report = content_gap(corpus[0], corpus[1:])
+    elapsed = (time.perf_counter() - started) / rounds * 1000
+
+    distinct = sum(len(page.terms) + len(page.phrases) for page in corpus)
+    print(f"{pages} pages × {words} words ({distinct} distinct terms+bigrams): {elapsed:.1f} ms per report")
+    print("  top missing terms:", [t["term"] for t in report["missing_terms"][:5]])
+    print("  top missing phrases:", [p["term"] for p in report["missing_phrases"][:5]])
+
+
+if __name__ == "__main__":
+    benchmark()
+    sys.exit(0)
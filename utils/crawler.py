@@ -0,0 +1,648 @@
+import os
+import posixpath
+import socket
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+import psycopg2.extras
+from utils.db import get_connection
+from utils.link_graph import site_of
+from utils.urls import normalize_url, url_host
+
+# ============================================================
+# SITE CRAWLS (shared frontier in Postgres)
+# ============================================================
+# A crawl is a frontier of URLs in crawl_frontier, deduped by a unique
+# index on (crawl_id, normalized url). Any number of worker processes, on
+# any number of machines, join by running the worker loop:
+#
+#   claim     lock hosts that are due (crawl_hosts, SKIP LOCKED), take a
+#             few queued URLs of each (SKIP LOCKED again) and lease them
+#   scan      run_local_seo_analysis at each URL's fetch slot, on a
+#             one-request budget: the page fetch is the only request the
+#             slot pays for, so the scan's link and asset probes are cut
+#             (cached results still count; the crawl reaches linked pages
+#             itself)
+#   complete  store the outcome, enqueue the page's new internal links
+#
+# Per-host politeness lives in crawl_hosts.next_fetch_at. A claim holds
+# the host row lock while it hands out fetch slots one delay apart and
+# moves next_fetch_at past the last one, so the delay holds across all
+# workers. Slots are handed out at most CRAWL_LOOKAHEAD seconds ahead.
+#
+# A lease expires CRAWL_LEASE_SECONDS after its slot. Expired leases (a
+# worker died) are requeued by the next claim, up to CRAWL_MAX_ATTEMPTS,
+# and a late result from the old lease holder is discarded.
+#
+# python -m utils.crawler                 → worker loop (Procfile `crawler`)
+# python -m utils.crawler --processes 4   → four worker processes
+# python -m utils.crawler --scale-check   → fixture site + local DB_URL:
+#                                            pages/s for 1, 2, 4 workers and
+#                                            the per-host delay across them
+
+CRAWL_HOST_DELAY = float(os.environ.get("CRAWL_HOST_DELAY", 1))
+CRAWL_CLAIM_LIMIT = int(os.environ.get("CRAWL_CLAIM_LIMIT", 8))
+CRAWL_LOOKAHEAD = float(os.environ.get("CRAWL_LOOKAHEAD", 5))
+CRAWL_LEASE_SECONDS = int(os.environ.get("CRAWL_LEASE_SECONDS", 120))
+CRAWL_MAX_ATTEMPTS = int(os.environ.get("CRAWL_MAX_ATTEMPTS", 3))
+CRAWL_MAX_PAGES = int(os.environ.get("CRAWL_MAX_PAGES", 500))
+CRAWL_MAX_DEPTH = int(os.environ.get("CRAWL_MAX_DEPTH", 5))
+CRAWL_THREADS = int(os.environ.get("CRAWL_THREADS", 4))
+CRAWL_IDLE_SECONDS = float(os.environ.get("CRAWL_IDLE_SECONDS", 2))
+CRAWL_MAX_PER_USER = int(os.environ.get("CRAWL_MAX_PER_USER", 2))
+CRAWL_SCAN_REQUESTS = 1  # the page itself, see crawl_scan
+
+# Links to files the analyzer has nothing to say about
+SKIPPED_EXTENSIONS = {
+    ".pdf", ".jpg", ".jpeg", ".png", ".gif", ".webp", ".svg", ".ico", ".css", ".js",
+    ".zip", ".gz", ".mp3", ".mp4", ".webm", ".xml", ".json", ".txt", ".doc", ".docx",
+}
+
+CREATE_TABLES = """
+    CREATE TABLE IF NOT EXISTS crawls (
+        id SERIAL PRIMARY KEY,
+        user_id INTEGER NOT NULL,
+        site TEXT NOT NULL,
+        root_url TEXT NOT NULL,
+        keyword TEXT,
+        max_pages INTEGER NOT NULL,
+        max_depth SMALLINT NOT NULL,
+        queued INTEGER NOT NULL DEFAULT 0,
+        status TEXT NOT NULL DEFAULT 'running',
+        created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+        finished_at TIMESTAMPTZ
+    );
+    CREATE INDEX IF NOT EXISTS crawls_user_idx ON crawls (user_id, created_at DESC);
+
+    CREATE TABLE IF NOT EXISTS crawl_frontier (
+        id BIGSERIAL PRIMARY KEY,
+        crawl_id INTEGER NOT NULL,
+        url TEXT NOT NULL,
+        host TEXT NOT NULL,
+        depth SMALLINT NOT NULL,
+        state TEXT NOT NULL DEFAULT 'queued',
+        attempts SMALLINT NOT NULL DEFAULT 0,
+        worker TEXT,
+        fetch_at TIMESTAMPTZ,
+        lease_until TIMESTAMPTZ,
+        score SMALLINT,
+        error TEXT,
+        done_at TIMESTAMPTZ
+    );
+    -- url is stored normalized (utils.urls.normalize_url)
+    CREATE UNIQUE INDEX IF NOT EXISTS crawl_frontier_url_idx ON crawl_frontier (crawl_id, url);
+    CREATE INDEX IF NOT EXISTS crawl_frontier_queued_idx
+        ON crawl_frontier (host, depth, id) WHERE state = 'queued';
+    CREATE INDEX IF NOT EXISTS crawl_frontier_leases_idx
+        ON crawl_frontier (lease_until) WHERE state = 'leased';
+    CREATE INDEX IF NOT EXISTS crawl_frontier_crawl_idx ON crawl_frontier (crawl_id, state);
+
+    CREATE TABLE IF NOT EXISTS crawl_hosts (
+        host TEXT PRIMARY KEY,
+        delay_seconds REAL NOT NULL,
+        next_fetch_at TIMESTAMPTZ NOT NULL DEFAULT now()
+    );
+"""
+
+
+def worker_name():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+# -------------------------------------------------------------
+# PLANNING (pure)
+# -------------------------------------------------------------
+def host_slots(start, delay, horizon, limit):
+    """Fetch offsets (seconds from now) for up to `limit` URLs of one host:
+    the first at `start`, then one every `delay`, none after `horizon`."""
+    if limit <= 0 or start > horizon:
+        return []
+    if delay <= 0:
+        return [start] * limit
+    count = min(limit, int((horizon - start) // delay) + 1)
+    return [start + i * delay for i in range(count)]
+
+
+def crawlable(url, site):
+    """Normalized URL if it belongs to the crawled site, else None."""
+    key = normalize_url(url)
+    if not key or site_of(key) != site:
+        return None
+    extension = posixpath.splitext(urlsplit(key).path)[1].lower()
+    if extension in SKIPPED_EXTENSIONS:
+        return None
+    return key
+
+
+# -------------------------------------------------------------
+# START / STATUS
+# -------------------------------------------------------------
+def ensure_hosts(cur, hosts, delay=CRAWL_HOST_DELAY):
+    if hosts:
+        psycopg2.extras.execute_values(
+            cur,
+            "INSERT INTO crawl_hosts (host, delay_seconds) VALUES %s ON CONFLICT (host) DO NOTHING",
+            [(host, delay) for host in sorted(set(hosts))]
+        )
+
+
+def set_host_delay(host, seconds):
+    conn = get_connection()
+    cur = conn.cursor()
+    cur.execute(
+        """
+        INSERT INTO crawl_hosts (host, delay_seconds) VALUES (%s, %s)
+        ON CONFLICT (host) DO UPDATE SET delay_seconds = EXCLUDED.delay_seconds
+        """,
+        (host, seconds)
+    )
+    conn.commit()
+    cur.close()
+    conn.close()
+
+
+def start_crawl(user_id, url, keyword=None, max_pages=CRAWL_MAX_PAGES, max_depth=CRAWL_MAX_DEPTH):
+    root = normalize_url(url)
+    if not root:
+        return None
+
+    conn = get_connection()
+    cur = conn.cursor()
+
+    cur.execute("SELECT count(*) FROM crawls WHERE user_id = %s AND status = 'running'", (user_id,))
+    if cur.fetchone()[0] >= CRAWL_MAX_PER_USER:
+        cur.close()
+        conn.close()
+        return None
+
+    cur.execute(
+        """
+        INSERT INTO crawls (user_id, site, root_url, keyword, max_pages, max_depth, queued)
+        VALUES (%s, %s, %s, %s, %s, %s, 1)
+        RETURNING id
+        """,
+        (user_id, site_of(root), root, keyword or None,
+         min(int(max_pages), CRAWL_MAX_PAGES), min(int(max_depth), CRAWL_MAX_DEPTH))
+    )
+    crawl_id = cur.fetchone()[0]
+    cur.execute(
+        "INSERT INTO crawl_frontier (crawl_id, url, host, depth) VALUES (%s, %s, %s, 0)",
+        (crawl_id, root, url_host(root))
+    )
+    ensure_hosts(cur, [url_host(root)])
+
+    conn.commit()
+    cur.close()
+    conn.close()
+    return crawl_id
+
+
+def crawl_status(user_id, crawl_id):
+    conn = get_connection()
+    cur = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
+    cur.execute(
+        """
+        SELECT id, site, root_url, keyword, max_pages, max_depth, status, created_at, finished_at
+        FROM crawls WHERE id = %s AND user_id = %s
+        """,
+        (crawl_id, user_id)
+    )
+    crawl = cur.fetchone()
+    if crawl is None:
+        cur.close()
+        conn.close()
+        return None
+
+    cur.execute(
+        "SELECT state, count(*), avg(score) FROM crawl_frontier WHERE crawl_id = %s GROUP BY state",
+        (crawl_id,)
+    )
+    states = {state: (count, avg) for state, count, avg in cur.fetchall()}
+    cur.close()
+    conn.close()
+
+    return {
+        "id": crawl["id"],
+        "site": crawl["site"],
+        "root_url": crawl["root_url"],
+        "keyword": crawl["keyword"],
+        "status": crawl["status"],
+        "max_pages": crawl["max_pages"],
+        "pages": {state: states.get(state, (0, None))[0] for state in ("queued", "leased", "done", "failed")},
+        "average_score": round(float(states["done"][1]), 1) if states.get("done") else None,
+        "created_at": crawl["created_at"].isoformat(),
+        "finished_at": crawl["finished_at"].isoformat() if crawl["finished_at"] else None,
+    }
+
+
+def finish_crawls(cur, crawl_ids):
+    if crawl_ids:
+        cur.execute(
+            """
+            UPDATE crawls SET status = 'done', finished_at = now()
+            WHERE id = ANY(%s) AND status = 'running'
+              AND NOT EXISTS (
+                  SELECT 1 FROM crawl_frontier f
+                  WHERE f.crawl_id = crawls.id AND f.state IN ('queued', 'leased')
+              )
+            """,
+            (sorted(crawl_ids),)
+        )
+
+
+# -------------------------------------------------------------
+# CLAIM (hosts first, then their URLs; both SKIP LOCKED)
+# -------------------------------------------------------------
+def requeue_expired(cur, max_attempts=CRAWL_MAX_ATTEMPTS):
+    cur.execute(
+        """
+        UPDATE crawl_frontier SET
+            state = CASE WHEN attempts >= %s THEN 'failed' ELSE 'queued' END,
+            error = CASE WHEN attempts >= %s THEN 'lease expired' ELSE error END,
+            worker = NULL, lease_until = NULL
+        WHERE id IN (
+            SELECT id FROM crawl_frontier
+            WHERE state = 'leased' AND lease_until < now()
+            LIMIT 500
+            FOR UPDATE SKIP LOCKED
+        )
+        RETURNING crawl_id, state
+        """,
+        (max_attempts, max_attempts)
+    )
+    rows = cur.fetchall()
+    finish_crawls(cur, {crawl_id for crawl_id, state in rows if state == "failed"})
+    return len(rows)
+
+
+def claim(worker, limit=CRAWL_CLAIM_LIMIT, lookahead=CRAWL_LOOKAHEAD, lease=CRAWL_LEASE_SECONDS):
+    """Leased tasks, each with `wait`: seconds from now until its slot."""
+    conn = get_connection()
+    cur = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
+
+    requeue_expired(cur)
+    cur.execute(
+        """
+        SELECT h.host, h.delay_seconds,
+               GREATEST(EXTRACT(EPOCH FROM h.next_fetch_at - now()), 0)::float AS start
+        FROM crawl_hosts h
+        WHERE h.next_fetch_at <= now() + make_interval(secs => %s)
+          AND EXISTS (SELECT 1 FROM crawl_frontier f WHERE f.host = h.host AND f.state = 'queued')
+        ORDER BY h.next_fetch_at
+        LIMIT %s
+        FOR UPDATE OF h SKIP LOCKED
+        """,
+        (lookahead, limit)
+    )
+    hosts = cur.fetchall()
+
+    tasks = []
+    for host in hosts:
+        slots = host_slots(host["start"], host["delay_seconds"], lookahead, limit - len(tasks))
+        if not slots:
+            continue
+        cur.execute(
+            """
+            SELECT f.id, f.crawl_id, f.url, f.depth, f.attempts, c.user_id, c.keyword
+            FROM crawl_frontier f
+            JOIN crawls c ON c.id = f.crawl_id
+            WHERE f.host = %s AND f.state = 'queued' AND c.status = 'running'
+            ORDER BY f.depth, f.id
+            LIMIT %s
+            FOR UPDATE OF f SKIP LOCKED
+            """,
+            (host["host"], len(slots))
+        )
+        claimed = [dict(row, host=host["host"], wait=wait) for row, wait in zip(cur.fetchall(), slots)]
+        if not claimed:
+            continue
+
+        psycopg2.extras.execute_values(
+            cur,
+            """
+            UPDATE crawl_frontier SET
+                state = 'leased', worker = v.worker, attempts = attempts + 1,
+                fetch_at = now() + make_interval(secs => v.wait),
+                lease_until = now() + make_interval(secs => v.wait + v.lease)
+            FROM (VALUES %s) AS v (id, worker, wait, lease)
+            WHERE crawl_frontier.id = v.id
+            """,
+            [(task["id"], worker, task["wait"], lease) for task in claimed],
+            template="(%s, %s, %s::float, %s::float)"
+        )
+        cur.execute(
+            "UPDATE crawl_hosts SET next_fetch_at = now() + make_interval(secs => %s) WHERE host = %s",
+            (claimed[-1]["wait"] + host["delay_seconds"], host["host"])
+        )
+        for task in claimed:
+            task["attempts"] += 1
+        tasks.extend(claimed)
+
+    # Slots are offsets from the transaction start (now()); make them
+    # relative to this moment, when the caller starts its clock
+    cur.execute("SELECT EXTRACT(EPOCH FROM clock_timestamp() - now())::float")
+    spent = cur.fetchone()[0]
+    for task in tasks:
+        task["wait"] = max(task["wait"] - spent, 0)
+
+    conn.commit()
+    cur.close()
+    conn.close()
+    return tasks
+
+
+# -------------------------------------------------------------
+# SCAN (each task at its slot)
+# -------------------------------------------------------------
+def run_tasks(tasks, scan, clock=time.monotonic, sleep=time.sleep, threads=CRAWL_THREADS):
+    claimed_at = clock()
+
+    def run(task):
+        delay = claimed_at + task["wait"] - clock()
+        if delay > 0:
+            sleep(delay)
+        try:
+            return task, scan(task["url"], task["keyword"]), None
+        except Exception as e:
+            print("CRAWL SCAN ERROR:", task["url"], e)
+            return task, None, str(e)[:500]
+
+    tasks = sorted(tasks, key=lambda task: task["wait"])
+    with ThreadPoolExecutor(max_workers=max(1, min(threads, len(tasks))),
+                            thread_name_prefix="crawl") as pool:
+        return list(pool.map(run, tasks))
+
+
+# -------------------------------------------------------------
+# COMPLETE (outcomes + newly found links, one transaction)
+# -------------------------------------------------------------
+def enqueue_links(cur, found):
+    """found: {crawl_id: [(url, depth), ...]} → number of URLs added."""
+    if not found:
+        return 0
+    # Crawl rows are locked in id order, so concurrent completions of
+    # the same crawls queue up instead of deadlocking
+    cur.execute(
+        """
+        SELECT id, site, max_pages, max_depth, queued FROM crawls
+        WHERE id = ANY(%s) AND status = 'running'
+        ORDER BY id
+        FOR UPDATE
+        """,
+        (sorted(found),)
+    )
+    added = 0
+    for crawl_id, site, max_pages, max_depth, queued in cur.fetchall():
+        room = max_pages - queued
+        candidates = {}
+        for url, depth in found[crawl_id]:
+            key = crawlable(url, site) if depth <= max_depth else None
+            if key:
+                candidates.setdefault(key, depth)
+        if room <= 0 or not candidates:
+            continue
+
+        cur.execute(
+            "SELECT url FROM crawl_frontier WHERE crawl_id = %s AND url = ANY(%s)",
+            (crawl_id, list(candidates))
+        )
+        known = {row[0] for row in cur.fetchall()}
+        fresh = [(url, depth) for url, depth in candidates.items() if url not in known][:room]
+        if not fresh:
+            continue
+
+        inserted = psycopg2.extras.execute_values(
+            cur,
+            """
+            INSERT INTO crawl_frontier (crawl_id, url, host, depth) VALUES %s
+            ON CONFLICT (crawl_id, url) DO NOTHING
+            RETURNING host
+            """,
+            [(crawl_id, url, url_host(url), depth) for url, depth in fresh],
+            fetch=True
+        )
+        ensure_hosts(cur, [host for host, in inserted])
+        cur.execute("UPDATE crawls SET queued = queued + %s WHERE id = %s", (len(inserted), crawl_id))
+        added += len(inserted)
+    return added
+
+
+def complete(worker, outcomes, record=None, max_attempts=CRAWL_MAX_ATTEMPTS):
+    if record is None:
+        from utils.history import record_scan
+        record = record_scan
+
+    updates = []
+    for task, result, error in outcomes:
+        if result is not None and result.ok:
+            updates.append((task["id"], worker, task["attempts"], "done", result.score, None))
+        else:
+            error = error or "fetch failed"
+            state = "failed" if task["attempts"] >= max_attempts else "queued"
+            updates.append((task["id"], worker, task["attempts"], state, None, error))
+    if not updates:
+        return 0
+
+    conn = get_connection()
+    cur = conn.cursor()
+
+    # Only rows this worker still holds; a lease that expired and was
+    # handed to another worker keeps that worker's result instead
+    accepted = psycopg2.extras.execute_values(
+        cur,
+        """
+        UPDATE crawl_frontier SET
+            state = v.state, score = v.score, error = v.error,
+            worker = NULL, lease_until = NULL,
+            done_at = CASE WHEN v.state = 'queued' THEN NULL ELSE now() END
+        FROM (VALUES %s) AS v (id, worker, attempts, state, score, error)
+        WHERE crawl_frontier.id = v.id AND crawl_frontier.state = 'leased'
+          AND crawl_frontier.worker = v.worker AND crawl_frontier.attempts = v.attempts
+        RETURNING crawl_frontier.id
+        """,
+        updates,
+        template="(%s, %s, %s, %s, %s::smallint, %s)",
+        fetch=True
+    )
+    accepted = {row[0] for row in accepted}
+
+    found = {}
+    recorded = []
+    for task, result, _ in outcomes:
+        if task["id"] in accepted and result is not None and result.ok:
+            recorded.append((task, result))
+            found.setdefault(task["crawl_id"], []).extend(
+                (url, task["depth"] + 1) for url in result.outlinks or []
+            )
+    enqueue_links(cur, found)
+    finish_crawls(cur, {task["crawl_id"] for task, _, _ in outcomes})
+
+    conn.commit()
+    cur.close()
+    conn.close()
+
+    # History (and with it the link graph and duplicate sketches) after
+    # the frontier commit; it is buffered and flushed on its own
+    for task, result in recorded:
+        record(task["user_id"], task["url"], task["keyword"], result)
+    return len(accepted)
+
+
+# -------------------------------------------------------------
+# WORKER LOOP
+# -------------------------------------------------------------
+def crawl_scan(url, keyword=None):
+    """A scan that makes no request beyond its page fetch: link and asset
+    probes would hit the host outside the slots that keep the delay."""
+    from utils.analyzer import run_local_seo_analysis
+    from utils.budget import ScanBudget
+    return run_local_seo_analysis(url, keyword, budget=ScanBudget(max_requests=CRAWL_SCAN_REQUESTS))
+
+
+def run_worker(worker=None, scan=None, should_stop=None, sleep=time.sleep, idle=CRAWL_IDLE_SECONDS):
+    scan = scan or crawl_scan
+    worker = worker or worker_name()
+
+    print(f"CRAWLER {worker}: started")
+    scanned = 0
+    while not (should_stop and should_stop()):
+        try:
+            tasks = claim(worker)
+            if not tasks:
+                sleep(idle)
+                continue
+            scanned += complete(worker, run_tasks(tasks, scan, sleep=sleep))
+        except Exception as e:
+            print(f"CRAWLER {worker} ERROR:", e)
+            sleep(idle)
+    return scanned
+
+
+def crawl_done(crawl_id):
+    conn = get_connection()
+    cur = conn.cursor()
+    cur.execute("SELECT status FROM crawls WHERE id = %s", (crawl_id,))
+    row = cur.fetchone()
+    cur.close()
+    conn.close()
+    return row is None or row[0] != "running"
+
+
+def worker_process(crawl_id=None):
+    stop = (lambda: crawl_done(crawl_id)) if crawl_id else None
+    scanned = run_worker(should_stop=stop)
+    from utils.history import flush_history
+    flush_history()
+    return scanned
+
+
+def run_processes(count, crawl_id=None):
+    import multiprocessing
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(count) as pool:
+        return sum(pool.map(worker_process, [crawl_id] * count))
+
+
+# -------------------------------------------------------------
+# SCALE CHECK (fixture site on localhost, local Postgres)
+# -------------------------------------------------------------
+FIXTURE_LATENCY = 0.3  # network-bound pages, so the frontier is what's measured
+
+
+def fixture_site(pages, fanout=4, latency=FIXTURE_LATENCY):
+    """Local site of `pages` pages, each linking to `fanout` children (a
+    tree), plus a log of (time, path) for every page request."""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    hits = []
+    words = " ".join(f"espresso grinder burr{n % 17} portafilter tamp" for n in range(120))
+
+    class Page(BaseHTTPRequestHandler):
+        def do_GET(self):
+            hits.append((time.monotonic(), self.path))
+            number = int(self.path.strip("/").removeprefix("p") or 0)
+            links = "".join(
+                f'<a href="/p{child}">page {child}</a>'
+                for child in range(number * fanout + 1, number * fanout + fanout + 1) if child < pages
+            )
+            body = (
+                f"<html><head><title>Page {number}</title><meta name='description' content='fixture'>"
+                f"</head><body><h1>Page {number}</h1><p>{words}</p>{links}</body></html>"
+            ).encode()
+            time.sleep(latency)
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Page)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, hits
+
+
+def timed_crawl(root, pages, processes, delay, hits):
+    set_host_delay(url_host(root), delay)
+    crawl_id = start_crawl(0, root, max_pages=pages, max_depth=CRAWL_MAX_DEPTH)
+    hits.clear()
+    started = time.perf_counter()
+    run_processes(processes, crawl_id)
+    elapsed = time.perf_counter() - started
+    status = crawl_status(0, crawl_id)
+    return elapsed, status
+
+
+def scale_check(pages=80):
+    # One page at a time per worker and fast idle polling; scan settings
+    # are the defaults, so every fixture hit the delay check sees is a
+    # request a real crawl would make
+    os.environ["CRAWL_THREADS"] = "1"
+    os.environ["CRAWL_IDLE_SECONDS"] = "0.1"
+
+    conn = get_connection()
+    cur = conn.cursor()
+    cur.execute(CREATE_TABLES)
+    conn.commit()
+    cur.close()
+    conn.close()
+
+    server, hits = fixture_site(pages)
+    root = f"http://127.0.0.1:{server.server_port}/"
+
+    baseline = None
+    for processes in (1, 2, 4):
+        elapsed, status = timed_crawl(root, pages, processes, 0, hits)
+        rate = status["pages"]["done"] / elapsed
+        baseline = baseline or rate
+        print(f"{processes} worker(s): {status['pages']['done']} pages in {elapsed:.1f}s "
+              f"({rate:.1f} pages/s, ×{rate / baseline:.2f})")
+        assert status["pages"]["done"] == pages and status["status"] == "done", status
+
+    delay = 0.3
+    elapsed, status = timed_crawl(root, 12, 4, delay, hits)
+    starts = sorted(t for t, path in hits)
+    gaps = sorted(b - a for a, b in zip(starts, starts[1:]))
+    print(f"host delay {delay}s, 4 workers: {len(starts)} fetches, "
+          f"gap min {gaps[0]:.3f}s median {gaps[len(gaps) // 2]:.3f}s")
+    # No probe requests in between: every hit is a page fetch in its slot
+    assert len(starts) == status["pages"]["done"], (len(starts), status)
+    # Slots are exact; what arrives at the server carries scheduling jitter
+    assert gaps[0] >= delay * 0.8, gaps
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    if "--scale-check" in sys.argv:
+        scale_check()
+        sys.exit(0)
+    if "--processes" in sys.argv:
+        run_processes(int(sys.argv[sys.argv.index("--processes") + 1]))
+        sys.exit(0)
+    run_worker()
@@ -8,6 +8,21 @@ def get_connection():
     return psycopg2.connect(DATABASE_URL, sslmode="require")
 
 
+# -------------------------------------------------------------
+# FETCH ONE ROW (generic)
+# -------------------------------------------------------------
+def fetch_one(query, params=None):
+    conn = get_connection()
+    cur = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
+
+    cur.execute(query, params)
+    row = cur.fetchone()
+
+    cur.close()
+    conn.close()
+    return row
+
+
 # -------------------------------------------------------------
 # CREATE NEW USER
 # -------------------------------------------------------------
@@ -102,6 +117,18 @@ def reset_scans(user_id):
     conn.close()
 
 
+# -------------------------------------------------------------
+# INCREMENT SCANS USED
+# -------------------------------------------------------------
+def increment_scans_used(email):
+    conn = get_connection()
+    cur = conn.cursor()
+    cur.execute("UPDATE users SET scans_used = scans_used + 1 WHERE email = %s", (email,))
+    conn.commit()
+    cur.close()
+    conn.close()
+
+
 # -------------------------------------------------------------
 # MAKE ADMIN
 # -------------------------------------------------------------
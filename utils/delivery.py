@@ -0,0 +1,220 @@
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor, wait
+from urllib.parse import urljoin
+
+import requests
+
+from utils.budget import PROBE_HEADERS, cache_seconds
+from utils.image_audit import (
+    IMAGE_AUDIT_MAX, cached_images, image_inventory, image_report, probe_image, remember_images,
+)
+from utils.urls import normalize_url
+
+# ============================================================
+# DELIVERY AUDIT (page weight, compression, caching)
+# ============================================================
+# Takes the stylesheets, scripts and images the page references and
+# probes a bounded sample concurrently. CSS/JS get a HEAD, or a one-byte
+# ranged GET when HEAD is refused or reports no size (budget allowing:
+# that is a second request). Images get the image audit's header sniff
+# (utils/image_audit). No asset body is downloaded. Along with the
+# document's own TTFB, download time and headers (recorded by the
+# budgeted fetch), this gives a page-weight score and concrete tips.
+# Every probe counts against the scan budget; the analyzer hands this
+# stage a share of it that leaves the link checks their grants. A set
+# `cancel` event stops the audit before its next probe.
+
+DELIVERY_MAX_ASSETS = int(os.environ.get("DELIVERY_MAX_ASSETS", 12))
+DELIVERY_CONCURRENCY = int(os.environ.get("DELIVERY_CONCURRENCY", 6))
+DELIVERY_TIMEOUT = float(os.environ.get("DELIVERY_TIMEOUT", 4))
+
+# Text resources that should always go over the wire compressed
+COMPRESSIBLE_KINDS = {"stylesheet", "script"}
+MIN_CACHE_SECONDS = 7 * 24 * 3600
+
+# Page weight targets (bytes): full marks at or under GOOD, zero at BAD
+WEIGHT_GOOD = 1_000_000
+WEIGHT_BAD = 5_000_000
+TTFB_GOOD_MS = 200
+TTFB_BAD_MS = 1500
+
+CONTENT_RANGE_TOTAL = re.compile(r"/(\d+)$")
+
+# ---------------------------------------------------
+# INVENTORY + SAMPLE
+# ---------------------------------------------------
+def asset_inventory(url, assets, base_href=None):
+    base = urljoin(url, base_href) if base_href else url
+    inventory = {}
+    for kind, src in assets:
+        key = normalize_url(urljoin(base, src.strip()))
+        if key and key not in inventory:
+            inventory[key] = {"url": key, "kind": kind}
+    return list(inventory.values())
+
+
+def sample_assets(inventory, limit=DELIVERY_MAX_ASSETS):
+    # Render-blocking CSS first, then scripts; document order within
+    order = {"stylesheet": 0, "script": 1}
+    return sorted(inventory, key=lambda a: order.get(a["kind"], 2))[:limit]
+
+
+# ---------------------------------------------------
+# PROBE (headers only)
+# ---------------------------------------------------
+def probe_asset(asset, timeout, budget=None, cancel=None):
+    result = dict(asset, status=None, bytes=None, encoding=None, cache_seconds=0)
+    try:
+        r = requests.head(asset["url"], timeout=timeout, allow_redirects=True, headers=PROBE_HEADERS)
+        size = r.headers.get("Content-Length")
+        if (r.status_code >= 400 or size is None) and not (cancel is not None and cancel.is_set()):
+            # The fallback is a second request, so it needs its own grant
+            if budget is None or budget.take_request():
+                r = requests.get(asset["url"], timeout=timeout, stream=True,
+                                 headers=dict(PROBE_HEADERS, Range="bytes=0-0"))
+                r.close()
+                total = CONTENT_RANGE_TOTAL.search(r.headers.get("Content-Range", ""))
+                size = total.group(1) if total else r.headers.get("Content-Length")
+            else:
+                budget.truncate("delivery", "max_requests")
+    except requests.RequestException:
+        return result
+
+    result["status"] = r.status_code
+    result["bytes"] = int(size) if size and size.isdigit() else None
+    result["encoding"] = r.headers.get("Content-Encoding")
+    result["cache_seconds"] = cache_seconds(r.headers)
+    return result
+
+
+def probe_assets(sample, budget, cancel=None):
+    if not sample:
+        return []
+
+    granted = []
+    for asset in sample:
+        if cancel is not None and cancel.is_set():
+            return []
+        if not budget.take_request():
+            budget.truncate("delivery", "max_requests")
+            break
+        granted.append(asset)
+
+    if not granted:
+        return []
+
+    timeout = budget.timeout(DELIVERY_TIMEOUT)
+    pool = ThreadPoolExecutor(max_workers=min(DELIVERY_CONCURRENCY, len(granted)),
+                              thread_name_prefix="delivery")
+
+    def probe(asset):
+        if cancel is not None and cancel.is_set():
+            return None
+        if asset["kind"] == "image":
+            return probe_image(asset, timeout)
+        return probe_asset(asset, timeout, budget, cancel)
+
+    futures = [pool.submit(probe, asset) for asset in granted]
+    # Slow hosts never hold the scan: whatever is not back in time is dropped
+    done, pending = wait(futures, timeout=budget.timeout(DELIVERY_TIMEOUT + 1))
+    pool.shutdown(wait=False, cancel_futures=True)
+    if pending:
+        budget.truncate("delivery", "max_seconds")
+    return [f.result() for f in futures if f in done and f.result() is not None]
+
+
+# ---------------------------------------------------
+# SCORE + TIPS
+# ---------------------------------------------------
+def scale(value, good, bad):
+    if value <= good:
+        return 100
+    if value >= bad:
+        return 0
+    return int(100 * (bad - value) / (bad - good))
+
+
+def estimate_weight(inventory, sized, document):
+    # Per kind, the probed sizes stand in for the assets that were not probed
+    overall = sum(p["bytes"] for p in sized) / len(sized) if sized else 0
+    weight = document.get("transfer_bytes") or 0
+    for kind in {a["kind"] for a in inventory}:
+        kind_sizes = [p["bytes"] for p in sized if p["kind"] == kind]
+        average = sum(kind_sizes) / len(kind_sizes) if kind_sizes else overall
+        weight += average * sum(1 for a in inventory if a["kind"] == kind)
+    return int(weight)
+
+
+def delivery_report(inventory, probes, document):
+    sized = [p for p in probes if p["bytes"] is not None]
+    estimated_weight = estimate_weight(inventory, sized, document)
+
+    text = [p for p in probes if p["kind"] in COMPRESSIBLE_KINDS and p["status"] and p["status"] < 400]
+    uncompressed = [p for p in text if not p["encoding"]]
+    ok = [p for p in probes if p["status"] and p["status"] < 400]
+    short_cache = [p for p in ok if p["cache_seconds"] < MIN_CACHE_SECONDS]
+
+    ttfb = document.get("ttfb_ms")
+    weight_score = scale(estimated_weight, WEIGHT_GOOD, WEIGHT_BAD)
+    ttfb_score = scale(ttfb, TTFB_GOOD_MS, TTFB_BAD_MS) if ttfb is not None else 70
+    compression_score = 100 - int(100 * len(uncompressed) / len(text)) if text else 100
+    if document and not document.get("content_encoding"):
+        compression_score = compression_score // 2
+    cache_score = 100 - int(100 * len(short_cache) / len(ok)) if ok else 70
+
+    return {
+        "score": int(weight_score * 0.4 + ttfb_score * 0.2 + compression_score * 0.2 + cache_score * 0.2),
+        "ttfb_ms": ttfb,
+        "download_ms": document.get("download_ms"),
+        "document_bytes": document.get("transfer_bytes"),
+        "document_compressed": bool(document.get("content_encoding")),
+        "assets_total": len(inventory),
+        "assets_probed": len(probes),
+        "estimated_weight": estimated_weight,
+        "uncompressed": [p["url"] for p in uncompressed][:10],
+        "short_cache": [p["url"] for p in short_cache][:10],
+        "largest": [
+            {"url": p["url"], "bytes": p["bytes"]}
+            for p in sorted(sized, key=lambda p: p["bytes"], reverse=True)[:5]
+        ],
+    }
+
+
+def delivery_tips(report):
+    tips = []
+    if report["ttfb_ms"] is not None and report["ttfb_ms"] > 600:
+        tips.append(f"• Server response time (TTFB) is {report['ttfb_ms']} ms; aim for under 600 ms with caching or a CDN.")
+    if report["document_bytes"] and not report["document_compressed"]:
+        tips.append("• Serve the HTML compressed (gzip or brotli).")
+    if report["uncompressed"]:
+        tips.append(f"• Enable compression for {len(report['uncompressed'])} CSS/JS files (e.g. {report['uncompressed'][0]}).")
+    if report["short_cache"]:
+        tips.append(f"• Add long-lived Cache-Control headers to {len(report['short_cache'])} static assets.")
+    if report["estimated_weight"] > WEIGHT_GOOD:
+        tips.append(
+            f"• Page weighs ~{report['estimated_weight'] / 1_000_000:.1f} MB; compress images and trim scripts"
+            + (f" (largest: {report['largest'][0]['url']})." if report["largest"] else ".")
+        )
+    return tips
+
+
+# Images are probed by the image audit's ranged GET (format, dimensions
+# and size in one request), sharing the pool with the CSS/JS HEADs.
+def audit_delivery(url, assets, images, base_href, budget, cancel=None):
+    inventory = asset_inventory(url, assets, base_href)
+    pictures, missing_size = image_inventory(url, images, base_href)
+    cached, uncached = cached_images(pictures[:IMAGE_AUDIT_MAX])
+
+    others = [asset for asset in inventory if asset["kind"] != "image"]
+    probes = probe_assets(sample_assets(others) + uncached, budget, cancel)
+
+    image_probes = [p for p in probes if p["kind"] == "image"]
+    remember_images(image_probes)
+    image_probes += cached
+
+    report = delivery_report(
+        inventory, [p for p in probes if p["kind"] != "image"] + image_probes, budget.document
+    )
+    report["images"] = image_report(pictures, image_probes, missing_size, len(images))
+    return report
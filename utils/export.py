@@ -0,0 +1,280 @@
+import csv
+import io
+import json
+import re
+import zipfile
+import zlib
+from datetime import datetime, timezone
+from xml.sax.saxutils import escape
+
+from utils.db import get_connection
+from utils.history import scan_result
+
+# ============================================================
+# BULK EXPORT (streamed, constant memory)
+# ============================================================
+# Scan history is read through a server-side (named) cursor, EXPORT_BATCH
+# rows at a time, and every format is a generator of byte chunks, so
+# nothing holds more than one batch whatever the export size:
+#   csv    csv.writer over a reusable line buffer
+#   jsonl  one JSON object per line
+#   xlsx   a minimal workbook written into a streamed zip (inline
+#          strings, no shared-string table, so nothing is indexed)
+# gzip_chunks() compresses any of them on the fly.
+#
+# Resuming: an export is pinned to a snapshot (the highest scan id when
+# it started) and ordered by id, and every row carries its id. A broken
+# download continues with ?snapshot=<same>&after_id=<last id received>
+# and gets exactly the missing rows. Byte ranges are not offered: the
+# length of a generated, compressed stream is not known up front.
+
+EXPORT_BATCH = 2000
+EXPORT_CHUNK_BYTES = 64 * 1024
+
+EXPORT_COLUMNS = (
+    "id", "scanned_at", "url", "keyword", "score",
+    "content", "technical", "keyword_score", "onpage", "links",
+)
+# page_meta fields added with ?detail=1 (decodes every stored result)
+DETAIL_COLUMNS = ("title", "word_count", "readability_score", "description_length", "h1_count")
+
+FORMATS = {
+    "csv": ("text/csv; charset=utf-8", "csv"),
+    "jsonl": ("application/x-ndjson", "jsonl"),
+    "xlsx": ("application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", "xlsx"),
+}
+
+
+# ---------------------------------------------------
+# ROWS (server-side cursor, keyset order)
+# ---------------------------------------------------
+def export_snapshot(user_id):
+    conn = get_connection()
+    cur = conn.cursor()
+    cur.execute("SELECT COALESCE(max(id), 0) FROM scans WHERE user_id = %s", (user_id,))
+    snapshot = cur.fetchone()[0]
+    cur.close()
+    conn.close()
+    return snapshot
+
+
+def scan_rows(user_id, snapshot, after_id=0, url=None, detail=False):
+    """Tuples in export_columns(detail) order, id ascending, up to snapshot."""
+    conn = get_connection()
+    # Named cursor: rows stay on the server and arrive EXPORT_BATCH at a time
+    cur = conn.cursor(name="scan_export")
+    cur.itersize = EXPORT_BATCH
+    try:
+        cur.execute(
+            f"""
+            SELECT s.id, s.scanned_at, s.url, s.keyword, s.score, s.content, s.technical,
+                   s.keyword_score, s.onpage, s.links{", m.page_meta" if detail else ""}
+            FROM scans s
+            {"LEFT JOIN scan_meta m ON m.scan_id = s.id AND m.scanned_at = s.scanned_at" if detail else ""}
+            WHERE s.user_id = %s AND s.id > %s AND s.id <= %s
+              AND (%s::text IS NULL OR s.url = %s)
+            ORDER BY s.id
+            """,
+            (user_id, after_id, snapshot, url, url)
+        )
+        for row in cur:
+            if detail:
+                meta = scan_result(row[10]).page_meta if row[10] is not None else {}
+                row = row[:10] + tuple(meta.get(field) for field in DETAIL_COLUMNS)
+            yield row
+    finally:
+        cur.close()
+        conn.close()
+
+
+def export_columns(detail=False):
+    return EXPORT_COLUMNS + (DETAIL_COLUMNS if detail else ())
+
+
+def cell(value):
+    if isinstance(value, datetime):
+        return value.astimezone(timezone.utc).isoformat()
+    return value
+
+
+# ---------------------------------------------------
+# WRITERS (rows → byte chunks)
+# ---------------------------------------------------
+def batched(parts):
+    """Joins small byte strings into ~EXPORT_CHUNK_BYTES chunks."""
+    pending, size = [], 0
+    for part in parts:
+        pending.append(part)
+        size += len(part)
+        if size >= EXPORT_CHUNK_BYTES:
+            yield b"".join(pending)
+            pending, size = [], 0
+    if pending:
+        yield b"".join(pending)
+
+
+def csv_chunks(columns, rows):
+    return batched(csv_lines(columns, rows))
+
+
+def csv_lines(columns, rows):
+    # One reusable buffer; each row is encoded and the buffer emptied
+    line = io.StringIO()
+    writer = csv.writer(line)
+    writer.writerow(columns)
+    for row in rows:
+        yield line.getvalue().encode()
+        line.seek(0)
+        line.truncate()
+        writer.writerow([cell(v) for v in row])
+    yield line.getvalue().encode()
+
+
+def jsonl_chunks(columns, rows):
+    return batched(
+        (json.dumps(dict(zip(columns, map(cell, row))), separators=(",", ":")) + "\n").encode()
+        for row in rows
+    )
+
+
+# ---------------------------------------------------
+# XLSX (streamed zip, sheets of at most MAX_SHEET_ROWS)
+# ---------------------------------------------------
+# Sheets are written first and the workbook parts that list them last
+# (zip entry order does not matter), so a large export rolls over to
+# "Scans 2", "Scans 3", ... without knowing the row count up front.
+MAX_SHEET_ROWS = 1_048_575  # Excel's row limit, minus the header
+MAX_CELL_CHARS = 32_767
+XML_ILLEGAL = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+XML_HEAD = '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+SHEET_HEAD = XML_HEAD + '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+SHEET_TAIL = "</sheetData></worksheet>"
+SHEET_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"
+SHEET_REL = "http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet"
+
+
+def workbook_parts(sheets):
+    listed = "".join(
+        f'<sheet name="Scans{f" {n}" if n > 1 else ""}" sheetId="{n}" r:id="rId{n}"/>'
+        for n in range(1, sheets + 1)
+    )
+    rels = "".join(
+        f'<Relationship Id="rId{n}" Type="{SHEET_REL}" Target="worksheets/sheet{n}.xml"/>'
+        for n in range(1, sheets + 1)
+    )
+    overrides = "".join(
+        f'<Override PartName="/xl/worksheets/sheet{n}.xml" ContentType="{SHEET_TYPE}"/>'
+        for n in range(1, sheets + 1)
+    )
+    return {
+        "xl/workbook.xml": (
+            XML_HEAD + '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+            'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+            f"<sheets>{listed}</sheets></workbook>"
+        ),
+        "xl/_rels/workbook.xml.rels": (
+            XML_HEAD + '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            f"{rels}</Relationships>"
+        ),
+        "_rels/.rels": (
+            XML_HEAD + '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            '<Relationship Id="rId1" '
+            'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+            'Target="xl/workbook.xml"/></Relationships>'
+        ),
+        "[Content_Types].xml": (
+            XML_HEAD + '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+            '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+            '<Default Extension="xml" ContentType="application/xml"/>'
+            '<Override PartName="/xl/workbook.xml" '
+            'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+            f"{overrides}</Types>"
+        ),
+    }
+
+
+def xlsx_cell(value):
+    value = cell(value)
+    if value is None:
+        return "<c/>"
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return f"<c><v>{value}</v></c>"
+    text = XML_ILLEGAL.sub("", str(value))[:MAX_CELL_CHARS]
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{escape(text)}</t></is></c>'
+
+
+def xlsx_row(values):
+    return "<row>" + "".join(xlsx_cell(v) for v in values) + "</row>"
+
+
+class ChunkSink(io.RawIOBase):
+    """Write-only, unseekable file; zipfile then writes data descriptors
+    instead of seeking back, and the generator drains what was written."""
+
+    def __init__(self):
+        self.parts = []
+        self.size = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.parts.append(bytes(data))
+        self.size += len(data)
+        return len(data)
+
+    def drain(self):
+        data = b"".join(self.parts)
+        self.parts = []
+        self.size = 0
+        return data
+
+
+def xlsx_chunks(columns, rows, stamp=(2024, 1, 1, 0, 0, 0)):
+    # Fixed timestamps: the same export always produces the same bytes
+    sink = ChunkSink()
+    header = xlsx_row(columns)
+    rows = iter(rows)
+    row = next(rows, None)
+    sheets = 0
+    with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED) as book:
+        while sheets == 0 or row is not None:
+            sheets += 1
+            info = zipfile.ZipInfo(f"xl/worksheets/sheet{sheets}.xml", stamp)
+            info.compress_type = zipfile.ZIP_DEFLATED
+            with book.open(info, "w", force_zip64=True) as sheet:
+                sheet.write((SHEET_HEAD + header).encode())
+                written = 0
+                while row is not None and written < MAX_SHEET_ROWS:
+                    sheet.write(xlsx_row(row).encode())
+                    written += 1
+                    row = next(rows, None)
+                    if sink.size >= EXPORT_CHUNK_BYTES:
+                        yield sink.drain()
+                sheet.write(SHEET_TAIL.encode())
+
+        for name, xml in workbook_parts(sheets).items():
+            book.writestr(zipfile.ZipInfo(name, stamp), xml, zipfile.ZIP_DEFLATED)
+    yield sink.drain()
+
+
+WRITERS = {"csv": csv_chunks, "jsonl": jsonl_chunks, "xlsx": xlsx_chunks}
+
+
+# ---------------------------------------------------
+# GZIP ON THE FLY
+# ---------------------------------------------------
+def gzip_chunks(chunks, level=6):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)  # 31 → gzip container
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_stream(fmt, user_id, snapshot, after_id=0, url=None, detail=False, gzip=False):
+    columns = export_columns(detail)
+    chunks = WRITERS[fmt](columns, scan_rows(user_id, snapshot, after_id, url, detail))
+    return gzip_chunks(chunks) if gzip else chunks
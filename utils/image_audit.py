@@ -0,0 +1,408 @@
+import os
+import struct
+import sys
+import threading
+import time
+from urllib.parse import urljoin
+
+import psycopg2.extras
+import requests
+
+from utils.budget import PROBE_HEADERS, cache_seconds
+from utils.db import get_connection
+from utils.link_cache import cache_enabled
+from utils.urls import normalize_url
+
+# ============================================================
+# IMAGE AUDIT (ranged header sniffing)
+# ============================================================
+# For every distinct <img> on the page (a bounded sample), fetch only the
+# first IMAGE_SNIFF_BYTES with a Range request and read the format and
+# intrinsic size from the file header. The total size comes from
+# Content-Range. Probes are cached in Postgres for IMAGE_CACHE_TTL, so
+# images shared across pages and scans (logos, sprites) are sniffed once.
+#
+# Flags: oversized (bytes or far larger than displayed), legacy format
+# (JPEG/PNG/GIF where WebP/AVIF would do), and missing width/height
+# attributes (layout shift).
+#
+# python -m utils.image_audit   → probes every format from a local server,
+#                                 with and without Range support
+
+IMAGE_AUDIT_MAX = int(os.environ.get("IMAGE_AUDIT_MAX", 20))
+IMAGE_SNIFF_BYTES = int(os.environ.get("IMAGE_SNIFF_BYTES", 16 * 1024))
+IMAGE_CACHE_TTL = int(os.environ.get("IMAGE_CACHE_TTL", 7 * 24 * 3600))
+
+OVERSIZED_BYTES = 300 * 1024
+OVERSIZED_PIXELS = 2560
+LEGACY_FORMATS = {"jpeg", "png", "gif"}
+LEGACY_MIN_BYTES = 20 * 1024  # tiny icons are not worth converting
+
+CREATE_TABLES = """
+    CREATE TABLE IF NOT EXISTS image_probe_cache (
+        url_key TEXT PRIMARY KEY,
+        status SMALLINT,
+        bytes INTEGER,
+        format TEXT,
+        width INTEGER,
+        height INTEGER,
+        encoding TEXT,
+        cache_seconds INTEGER NOT NULL DEFAULT 0,
+        expires_at TIMESTAMPTZ NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS image_probe_cache_expires_idx
+        ON image_probe_cache (expires_at);
+"""
+
+JPEG_SOF = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+
+# ---------------------------------------------------
+# HEADER SNIFFING → (format, width, height)
+# ---------------------------------------------------
+def sniff_jpeg(data):
+    i = 2
+    while i + 9 < len(data):
+        if data[i] != 0xFF:
+            i += 1
+            continue
+        marker = data[i + 1]
+        if marker in (0xD8, 0x01) or 0xD0 <= marker <= 0xD7 or marker == 0xFF:
+            i += 1 if marker == 0xFF else 2
+            continue
+        length = struct.unpack(">H", data[i + 2:i + 4])[0]
+        if marker in JPEG_SOF:
+            height, width = struct.unpack(">HH", data[i + 5:i + 9])
+            return width, height
+        i += 2 + length
+    return None, None
+
+
+def sniff_avif(data):
+    # ispe box: size, "ispe", version/flags, width, height
+    at = data.find(b"ispe")
+    if at < 0 or at + 16 > len(data):
+        return None, None
+    return struct.unpack(">II", data[at + 8:at + 16])
+
+
+def sniff_webp(data):
+    chunk = data[12:16]
+    if chunk == b"VP8 " and len(data) >= 30:
+        width, height = struct.unpack("<HH", data[26:30])
+        return width & 0x3FFF, height & 0x3FFF
+    if chunk == b"VP8L" and len(data) >= 25:
+        bits = int.from_bytes(data[21:25], "little")
+        return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+    if chunk == b"VP8X" and len(data) >= 30:
+        return int.from_bytes(data[24:27], "little") + 1, int.from_bytes(data[27:30], "little") + 1
+    return None, None
+
+
+def sniff_image(data):
+    if data.startswith(b"\x89PNG\r\n\x1a\n") and len(data) >= 24:
+        return ("png",) + struct.unpack(">II", data[16:24])
+    if data[:6] in (b"GIF87a", b"GIF89a") and len(data) >= 10:
+        return ("gif",) + struct.unpack("<HH", data[6:10])
+    if data.startswith(b"\xff\xd8"):
+        return ("jpeg",) + sniff_jpeg(data)
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return ("webp",) + sniff_webp(data)
+    if data[4:8] == b"ftyp" and data[8:12] in (b"avif", b"avis"):
+        return ("avif",) + sniff_avif(data)
+    head = data[:512].lstrip().lower()
+    if head.startswith(b"<svg") or (head.startswith(b"<?xml") and b"<svg" in head):
+        return "svg", None, None
+    return None, None, None
+
+
+# ---------------------------------------------------
+# PROBE (one ranged GET)
+# ---------------------------------------------------
+def probe_image(asset, timeout):
+    result = dict(asset, status=None, bytes=None, encoding=None, cache_seconds=0,
+                  format=None, width=None, height=None)
+    try:
+        with requests.get(asset["url"], timeout=timeout, stream=True,
+                          headers=dict(PROBE_HEADERS, Range=f"bytes=0-{IMAGE_SNIFF_BYTES - 1}")) as r:
+            data = b""
+            # A server that ignores Range sends the whole file; stop reading
+            # once the header is in hand
+            for chunk in r.iter_content(4096):
+                data += chunk
+                if len(data) >= IMAGE_SNIFF_BYTES:
+                    break
+    except requests.RequestException:
+        return result
+
+    total = r.headers.get("Content-Range", "").rpartition("/")[2]
+    size = total if total.isdigit() else r.headers.get("Content-Length")
+
+    result["status"] = r.status_code
+    result["bytes"] = int(size) if size and size.isdigit() else None
+    result["encoding"] = r.headers.get("Content-Encoding")
+    result["cache_seconds"] = cache_seconds(r.headers)
+    if r.status_code < 400:
+        result["format"], result["width"], result["height"] = sniff_image(data[:IMAGE_SNIFF_BYTES])
+    return result
+
+
+# ---------------------------------------------------
+# SHARED CACHE
+# ---------------------------------------------------
+def lookup_images(url_keys):
+    conn = get_connection()
+    cur = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
+    cur.execute(
+        """
+        SELECT url_key, status, bytes, format, width, height, encoding, cache_seconds
+        FROM image_probe_cache
+        WHERE url_key = ANY(%s) AND expires_at > now()
+        """,
+        (list(url_keys),)
+    )
+    rows = {row["url_key"]: dict(row) for row in cur.fetchall()}
+    cur.close()
+    conn.close()
+    return rows
+
+
+def store_images(probes):
+    probes = [p for p in probes if p["status"] is not None]
+    if not probes:
+        return
+
+    conn = get_connection()
+    cur = conn.cursor()
+    psycopg2.extras.execute_values(
+        cur,
+        """
+        INSERT INTO image_probe_cache
+            (url_key, status, bytes, format, width, height, encoding, cache_seconds, expires_at)
+        VALUES %s
+        ON CONFLICT (url_key) DO UPDATE SET
+            status = EXCLUDED.status,
+            bytes = EXCLUDED.bytes,
+            format = EXCLUDED.format,
+            width = EXCLUDED.width,
+            height = EXCLUDED.height,
+            encoding = EXCLUDED.encoding,
+            cache_seconds = EXCLUDED.cache_seconds,
+            expires_at = EXCLUDED.expires_at
+        """,
+        [
+            (p["url"], p["status"], p["bytes"], p["format"], p["width"], p["height"],
+             p["encoding"], p["cache_seconds"], IMAGE_CACHE_TTL)
+            for p in probes
+        ],
+        template="(%s, %s, %s, %s, %s, %s, %s, %s, now() + make_interval(secs => %s))"
+    )
+    conn.commit()
+    cur.close()
+    conn.close()
+
+
+def cached_images(sample):
+    """Splits the sample into cached probe results and assets to probe."""
+    if not sample or not cache_enabled():
+        return [], sample
+    try:
+        cached = lookup_images({asset["url"] for asset in sample})
+    except Exception as e:
+        print("IMAGE CACHE ERROR:", e)
+        return [], sample
+
+    hits = [dict(asset, **{k: v for k, v in cached[asset["url"]].items() if k != "url_key"})
+            for asset in sample if asset["url"] in cached]
+    return hits, [asset for asset in sample if asset["url"] not in cached]
+
+
+def remember_images(probes):
+    if probes and cache_enabled():
+        try:
+            store_images(probes)
+        except Exception as e:
+            print("IMAGE CACHE ERROR:", e)
+
+
+# ---------------------------------------------------
+# INVENTORY + REPORT
+# ---------------------------------------------------
+def declared_size(value):
+    value = (value or "").strip().lower().removesuffix("px")
+    return int(value) if value.isdigit() else None
+
+
+def image_inventory(url, images, base_href=None):
+    """Distinct images with the largest size they are displayed at."""
+    base = urljoin(url, base_href) if base_href else url
+    inventory = {}
+    missing_size = 0
+    for src, width, height in images:
+        if width is None or height is None:
+            missing_size += 1
+        key = normalize_url(urljoin(base, src.strip()))
+        if not key:
+            continue
+        entry = inventory.setdefault(key, {"url": key, "kind": "image", "display_width": None})
+        shown = declared_size(width)
+        if shown and (entry["display_width"] or 0) < shown:
+            entry["display_width"] = shown
+    return list(inventory.values()), missing_size
+
+
+def image_flags(probe):
+    flags = []
+    if probe["bytes"] and probe["bytes"] > OVERSIZED_BYTES:
+        flags.append("heavy")
+    width = probe["width"]
+    if width and (width > OVERSIZED_PIXELS or
+                  (probe["display_width"] and width > 2 * probe["display_width"])):
+        flags.append("oversized")
+    if probe["format"] in LEGACY_FORMATS and (probe["bytes"] or 0) >= LEGACY_MIN_BYTES:
+        flags.append("legacy_format")
+    return flags
+
+
+def image_report(inventory, probes, missing_size, image_tags):
+    checked = [p for p in probes if p["status"] and p["status"] < 400]
+    flagged = []
+    for probe in checked:
+        flags = image_flags(probe)
+        if flags:
+            flagged.append({
+                "url": probe["url"], "flags": flags, "format": probe["format"],
+                "width": probe["width"], "height": probe["height"], "bytes": probe["bytes"],
+            })
+
+    formats = {}
+    for probe in checked:
+        formats[probe["format"] or "unknown"] = formats.get(probe["format"] or "unknown", 0) + 1
+
+    heavy = sum(1 for f in flagged if "heavy" in f["flags"] or "oversized" in f["flags"])
+    legacy = sum(1 for f in flagged if "legacy_format" in f["flags"])
+    if checked:
+        size_score = 100 - int(100 * heavy / len(checked))
+        format_score = 100 - int(100 * legacy / len(checked))
+    else:
+        size_score = format_score = 70
+    dimension_score = 100 - int(100 * missing_size / image_tags) if image_tags else 100
+
+    return {
+        "score": int(size_score * 0.5 + format_score * 0.25 + dimension_score * 0.25),
+        "total": len(inventory),
+        "checked": len(checked),
+        "missing_dimensions": missing_size,
+        "formats": formats,
+        "flagged": sorted(flagged, key=lambda f: f["bytes"] or 0, reverse=True)[:20],
+    }
+
+
+def image_tips(report):
+    tips = []
+    heavy = [f for f in report["flagged"] if "heavy" in f["flags"] or "oversized" in f["flags"]]
+    legacy = [f for f in report["flagged"] if "legacy_format" in f["flags"]]
+    if heavy:
+        tips.append(f"• Resize or recompress {len(heavy)} oversized images (e.g. {heavy[0]['url']}).")
+    if legacy:
+        tips.append(f"• Serve {len(legacy)} JPEG/PNG/GIF images as WebP or AVIF.")
+    if report["missing_dimensions"]:
+        tips.append(f"• Add width and height attributes to {report['missing_dimensions']} images to prevent layout shift.")
+    return tips
+
+
+# -------------------------------------------------------------
+# PROBE CHECK (every format, Range and no-Range servers)
+# -------------------------------------------------------------
+def fixture_images(size=400 * 1024):
+    """{name: (bytes, format, width, height)}, headers padded to `size`."""
+    def jpeg(width, height):
+        app0 = b"\xff\xe0" + struct.pack(">H", 16) + b"JFIF\x00" + b"\x00" * 9
+        exif = b"\xff\xe1" + struct.pack(">H", 4002) + b"Exif\x00\x00" + b"\x00" * 3994
+        sof = b"\xff\xc0" + struct.pack(">HBHHB", 17, 8, height, width, 3) + b"\x00" * 9
+        return b"\xff\xd8" + app0 + exif + sof
+
+    def riff(chunk, payload):
+        return b"RIFF" + struct.pack("<I", size - 8) + b"WEBP" + chunk + struct.pack("<I", len(payload)) + payload
+
+    headers = {
+        "photo.png": (b"\x89PNG\r\n\x1a\n" + struct.pack(">I", 13) + b"IHDR"
+                      + struct.pack(">II", 1920, 1080), "png", 1920, 1080),
+        "anim.gif": (b"GIF89a" + struct.pack("<HH", 320, 240), "gif", 320, 240),
+        "photo.jpg": (jpeg(3000, 2000), "jpeg", 3000, 2000),
+        "lossy.webp": (riff(b"VP8 ", b"\x00\x00\x00\x9d\x01\x2a" + struct.pack("<HH", 800, 600)),
+                       "webp", 800, 600),
+        "lossless.webp": (riff(b"VP8L", b"\x2f" + (399 | 299 << 14).to_bytes(4, "little")),
+                          "webp", 400, 300),
+        "extended.webp": (riff(b"VP8X", b"\x00" * 4 + (1199).to_bytes(3, "little") + (899).to_bytes(3, "little")),
+                          "webp", 1200, 900),
+        "photo.avif": (struct.pack(">I", 20) + b"ftypavif" + b"\x00" * 8
+                       + struct.pack(">I", 20) + b"ispe" + b"\x00" * 4 + struct.pack(">II", 2048, 1536),
+                       "avif", 2048, 1536),
+    }
+    return {name: (data + b"\x00" * (size - len(data)), fmt, w, h)
+            for name, (data, fmt, w, h) in headers.items()}
+
+
+def image_site(images, ranges=True):
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Image(BaseHTTPRequestHandler):
+        def do_GET(self):
+            data = images.get(self.path.lstrip("/"), (None,))[0]
+            if data is None:
+                self.send_error(404)
+                return
+            first, _, last = self.headers.get("Range", "").removeprefix("bytes=").partition("-")
+            if ranges and first.isdigit():
+                body = data[int(first):int(last or len(data) - 1) + 1]
+                self.send_response(206)
+                self.send_header("Content-Range", f"bytes {first}-{int(first) + len(body) - 1}/{len(data)}")
+            else:
+                body = data  # Range ignored: the whole file
+                self.send_response(200)
+            self.send_header("Content-Length", str(len(body)))
+            self.send_header("Cache-Control", "max-age=86400")
+            self.end_headers()
+            try:
+                self.wfile.write(body)
+            except OSError:
+                pass  # the probe hangs up once it has the header
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Image)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def check_probes():
+    images = fixture_images()
+    for ranges in (True, False):
+        server = image_site(images, ranges)
+        base = f"http://127.0.0.1:{server.server_port}/"
+        for name, (data, fmt, width, height) in images.items():
+            started = time.perf_counter()
+            probe = probe_image({"url": base + name, "kind": "image"}, timeout=5)
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            print(f"{'range' if ranges else 'no range':<9} {name:<14} {probe['status']} {probe['format']} "
+                  f"{probe['width']}x{probe['height']} {probe['bytes']:,} bytes ({elapsed_ms:.0f} ms)")
+            assert (probe["format"], probe["width"], probe["height"]) == (fmt, width, height), probe
+            assert probe["bytes"] == len(data) and probe["status"] == (206 if ranges else 200), probe
+            assert probe["cache_seconds"] == 86400, probe
+
+        missing = probe_image({"url": base + "missing.png", "kind": "image"}, timeout=5)
+        assert missing["status"] == 404 and missing["format"] is None, missing
+        server.shutdown()
+        server.server_close()
+
+    # Nothing listening: a failed probe, not an exception
+    refused = probe_image({"url": base + "photo.png", "kind": "image"}, timeout=1)
+    assert refused["status"] is None and refused["format"] is None, refused
+    print("404 and refused connections: ok")
+
+
+if __name__ == "__main__":
+    check_probes()
+    sys.exit(0)
@@ -0,0 +1,250 @@
+import hashlib
+import os
+import time
+from urllib.parse import urljoin
+
+import requests
+
+from utils.link_cache import cache_enabled, lookup_links, store_links
+from utils.urls import normalize_url, url_host
+
+# ============================================================
+# LINK AUDIT
+# ============================================================
+# Collects every anchor on the page, resolves it against <base> / the page
+# URL, normalizes and dedupes it, then checks all of them, or a
+# stratified sample when there are more than LINK_CHECK_BUDGET. Strata
+# are internal/external × followed/nofollow, so a sample of a big page
+# still represents each kind of link.
+
+LINK_CHECK_BUDGET = int(os.environ.get("LINK_CHECK_BUDGET", 20))
+MAX_BROKEN_REPORTED = 50
+
+SKIP_SCHEMES = ("mailto:", "tel:", "javascript:", "data:", "sms:", "ftp:")
+
+
+# ---------------------------------------------------
+# INVENTORY (resolve + normalize + dedupe + classify)
+# ---------------------------------------------------
+def same_site(host, page_host):
+    return host.removeprefix("www.") == page_host.removeprefix("www.")
+
+
+def link_inventory(url, links, base_href=None):
+    base = urljoin(url, base_href) if base_href else url
+    page_host = url_host(url)
+
+    inventory = {}
+    for href, nofollow in links:
+        href = href.strip()
+        if not href or href.startswith("#") or href.lower().startswith(SKIP_SCHEMES):
+            continue
+
+        key = normalize_url(urljoin(base, href))
+        if not key:
+            continue
+
+        if key in inventory:
+            # Followed anywhere on the page → followed
+            inventory[key]["nofollow"] = inventory[key]["nofollow"] and nofollow
+            inventory[key]["occurrences"] += 1
+            continue
+
+        inventory[key] = {
+            "url": key,
+            "internal": same_site(url_host(key), page_host),
+            "nofollow": nofollow,
+            "occurrences": 1,
+        }
+
+    return list(inventory.values())
+
+
+def stratum(link):
+    return ("internal" if link["internal"] else "external") + ("_nofollow" if link["nofollow"] else "")
+
+
+# ---------------------------------------------------
+# STRATIFIED SAMPLE (deterministic)
+# ---------------------------------------------------
+# Proportional allocation with at least one link per non-empty stratum.
+# With fewer checks than strata, only the largest strata get one each.
+# Within a stratum links are ordered by a hash of the URL, so the same
+# page always samples the same links (and hits the link cache).
+def sample_links(inventory, budget=LINK_CHECK_BUDGET):
+    strata = {}
+    for link in inventory:
+        strata.setdefault(stratum(link), []).append(link)
+
+    if budget <= 0:
+        return strata, {}
+    if len(inventory) <= budget:
+        return strata, {name: list(members) for name, members in strata.items()}
+
+    names = sorted(strata)
+    if budget < len(names):
+        names = sorted(sorted(names, key=lambda n: len(strata[n]), reverse=True)[:budget])
+    alloc = {name: 1 for name in names}
+    remaining = budget - len(names)
+
+    if remaining > 0:
+        extra = {name: remaining * (len(strata[name]) - 1) / (len(inventory) - len(names)) for name in names}
+        for name in names:
+            alloc[name] += int(extra[name])
+        leftover = budget - sum(alloc.values())
+        for name in sorted(names, key=lambda n: extra[n] - int(extra[n]), reverse=True)[:leftover]:
+            alloc[name] += 1
+
+    sample = {}
+    for name in names:
+        members = sorted(strata[name], key=lambda l: hashlib.md5(l["url"].encode()).digest())
+        sample[name] = members[:min(alloc[name], len(members))]
+
+    return strata, sample
+
+
+# ---------------------------------------------------
+# CHECK URLS (shared cache first, then probe)
+# ---------------------------------------------------
+# Returns {url: (ok, status)}, where ok is None for links skipped because
+# their host's breaker is open; `stats` is filled with cache metrics.
+# on_checked(done, total) is called after every URL; if `cancel` (a
+# threading.Event) gets set, or the scan budget runs out of time or
+# requests, checking stops and the partial map is returned.
+def check_urls(urls, stats=None, on_checked=None, cancel=None, budget=None):
+    hosts = {u: url_host(u) for u in urls}
+
+    cached, open_hosts = {}, set()
+    if cache_enabled():
+        try:
+            cached, open_hosts = lookup_links(set(urls), set(hosts.values()))
+        except Exception as e:
+            print("LINK CACHE ERROR:", e)
+
+    results = {}
+    hits = 0
+    saved_ms = 0
+    breaker_skips = 0
+    probe_ms_total = 0
+    probed = []
+
+    for u in urls:
+        if cancel is not None and cancel.is_set():
+            break
+
+        if on_checked is not None and results:
+            on_checked(len(results), len(urls))
+
+        if u in cached:
+            ok, status, probe_ms = cached[u]
+            results[u] = (ok, status)
+            hits += 1
+            saved_ms += probe_ms
+            continue
+
+        if hosts[u] in open_hosts:
+            results[u] = (None, None)
+            breaker_skips += 1
+            continue
+
+        timeout = 5
+        if budget is not None:
+            if budget.expired():
+                budget.truncate("links", "max_seconds")
+                break
+            if not budget.take_request():
+                budget.truncate("links", "max_requests")
+                break
+            timeout = budget.timeout(timeout)
+
+        started = time.perf_counter()
+        status = None
+        try:
+            r = requests.get(u, timeout=timeout, stream=True)
+            status = r.status_code
+            r.close()
+        except requests.RequestException:
+            pass  # no answer: status stays None
+        probe_ms = int((time.perf_counter() - started) * 1000)
+        probe_ms_total += probe_ms
+
+        ok = status is not None and status < 400
+        results[u] = (ok, status)
+        probed.append((u, hosts[u], ok, status, probe_ms, status is None or status >= 500))
+
+    if on_checked is not None and results:
+        on_checked(len(results), len(urls))
+
+    if probed and cache_enabled():
+        try:
+            store_links(probed)
+        except Exception as e:
+            print("LINK CACHE ERROR:", e)
+
+    if stats is not None:
+        stats.update({
+            "checked": len(urls),
+            "cache_hits": hits,
+            "cache_misses": len(probed),
+            "hit_ratio": round(hits / len(urls), 3) if urls else 0,
+            "saved_probe_ms": saved_ms,
+            "probe_ms": probe_ms_total,
+            "breaker_skips": breaker_skips,
+        })
+
+    return results
+
+
+# ---------------------------------------------------
+# AUDIT + SCORE
+# ---------------------------------------------------
+def audit_links(url, links, base_href=None, sample_size=LINK_CHECK_BUDGET, stats=None,
+                on_checked=None, cancel=None, budget=None):
+    inventory = link_inventory(url, links, base_href)
+    strata, sample = sample_links(inventory, sample_size)
+
+    to_check = [link["url"] for members in sample.values() for link in members]
+    results = check_urls(to_check, stats, on_checked, cancel, budget) if to_check else {}
+
+    checked = {u: result for u, result in results.items() if result[0] is not None}
+
+    broken = []
+    good_estimate = 0.0
+    covered = 0
+    for name, members in sample.items():
+        # Only links actually checked: checking can stop early, and hosts
+        # behind an open breaker are skipped, which says nothing either way
+        members = [link for link in members if link["url"] in checked]
+        if not members:
+            continue
+        bad = [link for link in members if not results[link["url"]][0]]
+        # Stratified estimator: each stratum's broken rate × its size
+        good_estimate += len(strata[name]) * (1 - len(bad) / len(members))
+        covered += len(strata[name])
+        for link in bad:
+            broken.append({
+                "url": link["url"],
+                "status": results[link["url"]][1],
+                "internal": link["internal"],
+                "nofollow": link["nofollow"],
+            })
+
+    if not covered:
+        score = 70  # neutral
+    else:
+        score = int(good_estimate / covered * 100)
+
+    return {
+        "score": score,
+        "total": len(inventory),
+        "internal": sum(1 for link in inventory if link["internal"]),
+        "external": sum(1 for link in inventory if not link["internal"]),
+        "nofollow": sum(1 for link in inventory if link["nofollow"]),
+        "checked": len(checked),
+        "skipped": len(results) - len(checked),
+        "sampled": len(results) < len(inventory),
+        "strata": {name: len(members) for name, members in strata.items()},
+        "broken": sorted(broken, key=lambda b: b["url"])[:MAX_BROKEN_REPORTED],
+        # Followed internal links, for the site link graph (utils/link_graph)
+        "outlinks": [link["url"] for link in inventory if link["internal"] and not link["nofollow"]],
+    }
@@ -0,0 +1,247 @@
+import os
+import sys
+
+import psycopg2.extras
+from utils.db import DATABASE_URL, get_connection
+
+# ============================================================
+# SHARED LINK-STATUS CACHE
+# ============================================================
+# One Postgres table shared by every gunicorn worker (and dyno) so that
+# popular outbound links are probed once per TTL instead of once per scan.
+# Broken results are cached too, with a shorter TTL, and hosts that keep
+# failing get a circuit breaker so we stop hammering them. Links of a
+# host with an open breaker are reported as skipped, not broken.
+#
+# Expired rows are purged every LINK_CACHE_PURGE_SECONDS by the monitor
+# loop (utils/scheduler).
+#
+# python -m utils.link_cache   → TTLs, breakers and the purge against a
+#                                scratch schema
+
+GOOD_TTL = int(os.environ.get("LINK_CACHE_GOOD_TTL", 24 * 3600))
+BAD_TTL = int(os.environ.get("LINK_CACHE_BAD_TTL", 3600))
+BREAKER_THRESHOLD = int(os.environ.get("LINK_BREAKER_THRESHOLD", 5))
+BREAKER_COOLDOWN = int(os.environ.get("LINK_BREAKER_COOLDOWN", 600))
+LINK_CACHE_PURGE_SECONDS = int(os.environ.get("LINK_CACHE_PURGE_SECONDS", 3600))
+
+CREATE_TABLES = """
+    CREATE TABLE IF NOT EXISTS link_status_cache (
+        url_key TEXT PRIMARY KEY,
+        ok BOOLEAN NOT NULL,
+        status SMALLINT,
+        probe_ms INTEGER NOT NULL DEFAULT 0,
+        checked_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+        expires_at TIMESTAMPTZ NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS link_status_cache_expires_idx
+        ON link_status_cache (expires_at);
+
+    CREATE TABLE IF NOT EXISTS link_host_breakers (
+        host TEXT PRIMARY KEY,
+        failures INTEGER NOT NULL DEFAULT 0,
+        open_until TIMESTAMPTZ
+    );
+"""
+
+
+def cache_enabled():
+    # LINK_CACHE=0: no lookups (offline batch scoring, utils/batch.py)
+    return bool(DATABASE_URL) and os.environ.get("LINK_CACHE", "1") == "1"
+
+
+# -------------------------------------------------------------
+# LOOKUP (one round trip for the whole page)
+# -------------------------------------------------------------
+def lookup_links(url_keys, hosts):
+    conn = get_connection()
+    cur = conn.cursor()
+
+    cur.execute(
+        """
+        SELECT url_key, ok, status, probe_ms
+        FROM link_status_cache
+        WHERE url_key = ANY(%s) AND expires_at > now()
+        """,
+        (list(url_keys),)
+    )
+    cached = {row[0]: (row[1], row[2], row[3]) for row in cur.fetchall()}
+
+    cur.execute(
+        """
+        SELECT host
+        FROM link_host_breakers
+        WHERE host = ANY(%s) AND open_until > now()
+        """,
+        (list(hosts),)
+    )
+    open_hosts = {row[0] for row in cur.fetchall()}
+
+    cur.close()
+    conn.close()
+    return cached, open_hosts
+
+
+# -------------------------------------------------------------
+# STORE PROBE RESULTS + UPDATE BREAKERS
+# -------------------------------------------------------------
+# results: list of (url_key, host, ok, status, probe_ms, host_failed)
+def store_links(results):
+    if not results:
+        return
+
+    conn = get_connection()
+    cur = conn.cursor()
+
+    psycopg2.extras.execute_values(
+        cur,
+        """
+        INSERT INTO link_status_cache (url_key, ok, status, probe_ms, expires_at)
+        VALUES %s
+        ON CONFLICT (url_key) DO UPDATE SET
+            ok = EXCLUDED.ok,
+            status = EXCLUDED.status,
+            probe_ms = EXCLUDED.probe_ms,
+            checked_at = now(),
+            expires_at = EXCLUDED.expires_at
+        """,
+        [
+            (key, ok, status, probe_ms, GOOD_TTL if ok else BAD_TTL)
+            for key, host, ok, status, probe_ms, host_failed in results
+        ],
+        template="(%s, %s, %s, %s, now() + make_interval(secs => %s))"
+    )
+
+    # Breakers: host-level failures (timeouts, 5xx) count up, any
+    # success resets. Once open, a host stays skipped for the cooldown;
+    # the first probe after that either resets it or re-opens it.
+    failed = {}
+    healthy = set()
+    for key, host, ok, status, probe_ms, host_failed in results:
+        if host_failed:
+            failed[host] = failed.get(host, 0) + 1
+        else:
+            healthy.add(host)
+    healthy -= set(failed)
+
+    if healthy:
+        cur.execute(
+            "UPDATE link_host_breakers SET failures = 0, open_until = NULL WHERE host = ANY(%s)",
+            (sorted(healthy),)
+        )
+
+    if failed:
+        hosts = sorted(failed)
+        cur.execute(
+            """
+            INSERT INTO link_host_breakers (host, failures)
+            SELECT * FROM unnest(%s::text[], %s::integer[])
+            ON CONFLICT (host) DO UPDATE
+                SET failures = link_host_breakers.failures + EXCLUDED.failures
+            """,
+            (hosts, [failed[h] for h in hosts])
+        )
+        cur.execute(
+            """
+            UPDATE link_host_breakers
+            SET open_until = now() + make_interval(secs => %s)
+            WHERE host = ANY(%s)
+              AND failures >= %s
+              AND (open_until IS NULL OR open_until < now())
+            """,
+            (BREAKER_COOLDOWN, hosts, BREAKER_THRESHOLD)
+        )
+
+    conn.commit()
+    cur.close()
+    conn.close()
+
+
+# -------------------------------------------------------------
+# PURGE EXPIRED ROWS
+# -------------------------------------------------------------
+PURGE_LINKS_SQL = "DELETE FROM link_status_cache WHERE expires_at < now()"
+PURGE_BREAKERS_SQL = "DELETE FROM link_host_breakers WHERE failures = 0 AND open_until IS NULL"
+
+
+def purge_expired_links():
+    """(cache rows, breaker rows) deleted."""
+    conn = get_connection()
+    cur = conn.cursor()
+    cur.execute(PURGE_LINKS_SQL)
+    links = cur.rowcount
+    cur.execute(PURGE_BREAKERS_SQL)
+    breakers = cur.rowcount
+    conn.commit()
+    cur.close()
+    conn.close()
+    return links, breakers
+
+
+# -------------------------------------------------------------
+# CHECK (scratch schema, dropped afterwards)
+# -------------------------------------------------------------
+CHECK_SCHEMA = "link_cache_check"
+
+
+def check_cache(rows=20_000):
+    conn = get_connection()
+    conn.autocommit = True
+    cur = conn.cursor()
+    cur.execute(f"DROP SCHEMA IF EXISTS {CHECK_SCHEMA} CASCADE")
+    cur.execute(f"CREATE SCHEMA {CHECK_SCHEMA}")
+    cur.execute(f"SET search_path = {CHECK_SCHEMA}")
+    cur.execute(CREATE_TABLES)
+    # Every connection the module opens lands in the scratch schema
+    os.environ["PGOPTIONS"] = f"-c search_path={CHECK_SCHEMA}"
+
+    try:
+        results = [(f"https://ok.example/{i}", "ok.example", True, 200, 40, False) for i in range(3)]
+        results += [(f"https://gone.example/{i}", "gone.example", False, 404, 30, False) for i in range(2)]
+        results += [(f"https://down.example/{i}", "down.example", False, None, 5000, True)
+                    for i in range(BREAKER_THRESHOLD)]
+        store_links(results)
+        store_links([("https://flaky.example/", "flaky.example", False, 503, 10, True)])
+        store_links([("https://flaky.example/", "flaky.example", True, 200, 10, False)])
+
+        keys = {r[0] for r in results}
+        cached, open_hosts = lookup_links(keys, {"ok.example", "gone.example", "down.example"})
+        assert len(cached) == len(keys) and open_hosts == {"down.example"}, (cached, open_hosts)
+
+        # Good rows outlive bad ones: past BAD_TTL only the 404s and timeouts expire
+        cur.execute("UPDATE link_status_cache SET expires_at = expires_at - make_interval(secs => %s)",
+                    (BAD_TTL + 1,))
+        cached, _ = lookup_links(keys, set())
+        assert set(cached) == {key for key in keys if key.startswith("https://ok.")}, sorted(cached)
+
+        # Bulk of live rows, so the purge has an index to prefer
+        cur.execute(
+            "INSERT INTO link_status_cache (url_key, ok, status, expires_at) "
+            "SELECT 'https://live.example/' || g, true, 200, now() + interval '1 day' "
+            "FROM generate_series(1, %s) AS g",
+            (rows,)
+        )
+        cur.execute("ANALYZE link_status_cache")
+        cur.execute("EXPLAIN " + PURGE_LINKS_SQL)
+        plan = " / ".join(row[0].strip() for row in cur.fetchall())
+        print("purge plan:", plan)
+        assert "link_status_cache_expires_idx" in plan, plan
+
+        live = rows + 4  # the 3 ok.example links and flaky.example's recovery
+        links, breakers = purge_expired_links()
+        print(f"purged {links} expired links and {breakers} healed breaker(s), kept {live} live links")
+        assert (links, breakers) == (2 + BREAKER_THRESHOLD, 1), (links, breakers)
+        cur.execute("SELECT count(*) FROM link_status_cache")
+        assert cur.fetchone()[0] == live
+        cur.execute("SELECT host FROM link_host_breakers")
+        assert [row[0] for row in cur.fetchall()] == ["down.example"]  # still open
+    finally:
+        os.environ.pop("PGOPTIONS", None)
+        cur.execute(f"DROP SCHEMA IF EXISTS {CHECK_SCHEMA} CASCADE")
+        cur.close()
+        conn.close()
+
+
+if __name__ == "__main__":
+    check_cache()
+    sys.exit(0)
@@ -0,0 +1,360 @@
+import os
+import sys
+import time
+
+import numpy as np
+import psycopg2.extras
+from utils.db import get_connection
+from utils.urls import normalize_url, url_host
+
+# ============================================================
+# INTERNAL LINK GRAPH (orphans, click depth, PageRank)
+# ============================================================
+# Every scan records the page's followed internal outlinks. URLs are
+# mapped to integer node ids (link_graph_nodes), and each scanned page
+# keeps its outlinks as an INTEGER[] of those ids (link_graph_pages).
+# That is the site's edge list in compact form.
+#
+# The graph stage loads one site's edge list into two int32 arrays and
+# works on those only:
+#   in/out degree   np.bincount
+#   click depth     BFS from the home page, one vectorized hop per level
+#   PageRank        power iteration, each step a bincount over the edges
+# Memory is O(nodes + edges) and there are no Python loops per edge, so
+# millions of edges take seconds.
+#
+# python -m utils.link_graph   → known-answer checks + timing on large graphs
+
+PAGERANK_DAMPING = 0.85
+PAGERANK_TOLERANCE = 1e-6
+PAGERANK_MAX_ITERATIONS = 100
+DEEP_PAGE_DEPTH = int(os.environ.get("DEEP_PAGE_DEPTH", 3))
+GRAPH_REPORT_LIMIT = 50
+
+CREATE_TABLES = """
+    CREATE TABLE IF NOT EXISTS link_graph_nodes (
+        id SERIAL PRIMARY KEY,
+        user_id INTEGER NOT NULL,
+        site TEXT NOT NULL,
+        url TEXT NOT NULL,
+        UNIQUE (user_id, url)
+    );
+    CREATE INDEX IF NOT EXISTS link_graph_nodes_site_idx ON link_graph_nodes (user_id, site);
+
+    CREATE TABLE IF NOT EXISTS link_graph_pages (
+        node_id INTEGER PRIMARY KEY,
+        user_id INTEGER NOT NULL,
+        site TEXT NOT NULL,
+        outlinks INTEGER[] NOT NULL,
+        scanned_at TIMESTAMPTZ NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS link_graph_pages_site_idx ON link_graph_pages (user_id, site);
+"""
+
+
+def site_of(url):
+    return url_host(url).removeprefix("www.")
+
+
+# ---------------------------------------------------
+# STORAGE (written by history.flush_history)
+# ---------------------------------------------------
+def assign_ids(cur, user_id, urls):
+    urls = sorted(set(urls))
+    if not urls:
+        return {}
+    rows = psycopg2.extras.execute_values(
+        cur,
+        """
+        INSERT INTO link_graph_nodes (user_id, site, url) VALUES %s
+        ON CONFLICT (user_id, url) DO UPDATE SET site = EXCLUDED.site
+        RETURNING url, id
+        """,
+        [(user_id, site_of(url), url) for url in urls],
+        fetch=True
+    )
+    return dict(rows)
+
+
+def store_outlinks(cur, pages):
+    """pages: (scanned_at, user_id, url, outlinks) from the history batch."""
+    latest = {}
+    for scanned_at, user_id, url, outlinks in pages:
+        key = normalize_url(url)
+        if key and outlinks is not None:
+            latest[(user_id, key)] = (scanned_at, outlinks)
+    if not latest:
+        return
+
+    by_user = {}
+    for (user_id, url), (scanned_at, outlinks) in latest.items():
+        by_user.setdefault(user_id, []).append((url, scanned_at, outlinks))
+
+    rows = []
+    for user_id, entries in by_user.items():
+        ids = assign_ids(cur, user_id, [u for url, _, outlinks in entries for u in (url, *outlinks)])
+        for url, scanned_at, outlinks in entries:
+            rows.append((ids[url], user_id, site_of(url), [ids[u] for u in dict.fromkeys(outlinks)], scanned_at))
+
+    psycopg2.extras.execute_values(
+        cur,
+        """
+        INSERT INTO link_graph_pages (node_id, user_id, site, outlinks, scanned_at)
+        VALUES %s
+        ON CONFLICT (node_id) DO UPDATE SET
+            outlinks = EXCLUDED.outlinks,
+            scanned_at = EXCLUDED.scanned_at
+        """,
+        rows
+    )
+
+
+def load_site(user_id, site):
+    """(node ids, urls, scanned ids, src ids, dst ids) for one site."""
+    conn = get_connection()
+    cur = conn.cursor()
+    cur.execute("SELECT id, url FROM link_graph_nodes WHERE user_id = %s AND site = %s", (user_id, site))
+    nodes = cur.fetchall()
+    # Edges come out of Postgres already flattened, one row per edge
+    cur.execute(
+        """
+        SELECT node_id, unnest(outlinks) FROM link_graph_pages
+        WHERE user_id = %s AND site = %s
+        """,
+        (user_id, site)
+    )
+    edges = cur.fetchall()
+    cur.execute("SELECT node_id FROM link_graph_pages WHERE user_id = %s AND site = %s", (user_id, site))
+    scanned = [row[0] for row in cur.fetchall()]
+    cur.close()
+    conn.close()
+
+    edges = np.array(edges, dtype=np.int64).reshape(-1, 2)
+    return (
+        np.array([n[0] for n in nodes], dtype=np.int64), [n[1] for n in nodes],
+        np.array(scanned, dtype=np.int64), edges[:, 0], edges[:, 1],
+    )
+
+
+# ---------------------------------------------------
+# GRAPH (dense int32 ids, deduped edges)
+# ---------------------------------------------------
+def dense_edges(node_ids, src, dst):
+    """Maps arbitrary node ids to 0..n-1 and drops self-loops and edges
+    to unknown nodes. Edges are unique already: each page's outlinks are
+    stored deduped."""
+    n = len(node_ids)
+    if n == 0:
+        return np.zeros(0, np.int32), np.zeros(0, np.int32)
+
+    low, high = int(node_ids.min()), int(node_ids.max())
+    if high - low < 4 * n + 1_000_000:
+        # SERIAL ids of one site are close together: a direct lookup table
+        lookup = np.full(high - low + 1, -1, dtype=np.int32)
+        lookup[node_ids - low] = np.arange(n, dtype=np.int32)
+
+        def remap(ids):
+            inside = (ids >= low) & (ids <= high)
+            dense = np.full(len(ids), -1, dtype=np.int32)
+            dense[inside] = lookup[ids[inside] - low]
+            return dense
+    else:
+        order = np.argsort(node_ids)
+        sorted_ids = node_ids[order]
+
+        def remap(ids):
+            at = np.minimum(np.searchsorted(sorted_ids, ids), n - 1)
+            return np.where(sorted_ids[at] == ids, order[at], -1).astype(np.int32)
+
+    s, d = remap(src), remap(dst)
+    keep = (s >= 0) & (d >= 0) & (s != d)
+    return s[keep], d[keep]
+
+
+def pagerank(n, src, dst, damping=PAGERANK_DAMPING, tolerance=PAGERANK_TOLERANCE,
+             max_iterations=PAGERANK_MAX_ITERATIONS):
+    if n == 0:
+        return np.zeros(0), 0
+    out_degree = np.bincount(src, minlength=n).astype(np.float64)
+    dangling = out_degree == 0
+    share = np.divide(1.0, out_degree, out=np.zeros(n), where=~dangling)
+
+    rank = np.full(n, 1.0 / n)
+    for iteration in range(1, max_iterations + 1):
+        # Pages without outlinks spread their rank over every page
+        flow = np.bincount(dst, weights=(rank * share)[src], minlength=n)
+        new = (1 - damping) / n + damping * (flow + rank[dangling].sum() / n)
+        delta = np.abs(new - rank).sum()
+        rank = new
+        if delta < tolerance:
+            break
+    return rank, iteration
+
+
+def click_depth(n, src, dst, home):
+    """Hops from `home` along the edges; -1 where unreachable."""
+    depth = np.full(n, -1, dtype=np.int32)
+    if home is None or n == 0:
+        return depth
+
+    order = np.argsort(src, kind="stable")
+    targets = dst[order]
+    starts = np.concatenate(([0], np.cumsum(np.bincount(src, minlength=n))))
+
+    depth[home] = 0
+    frontier = np.array([home])
+    level = 0
+    while len(frontier):
+        level += 1
+        begin, lengths = starts[frontier], starts[frontier + 1] - starts[frontier]
+        total = lengths.sum()
+        if not total:
+            break
+        # Offsets of every outgoing edge of the frontier, without a loop
+        offsets = np.repeat(begin - np.concatenate(([0], np.cumsum(lengths)[:-1])), lengths) + np.arange(total)
+        reached = targets[offsets]
+        reached = np.unique(reached[depth[reached] < 0])
+        depth[reached] = level
+        frontier = reached
+    return depth
+
+
+def find_home(urls, site):
+    for i, url in enumerate(urls):
+        if url.rstrip("/") in (f"https://{site}", f"http://{site}", f"https://www.{site}", f"http://www.{site}"):
+            return i
+    return None
+
+
+def analyze_graph(urls, scanned, src, dst, home=None):
+    """Degree, orphans, click depth and PageRank for a dense graph.
+
+    `scanned` is a boolean mask of the pages whose outlinks are known.
+    """
+    n = len(urls)
+    in_degree = np.bincount(dst, minlength=n)
+    out_degree = np.bincount(src, minlength=n)
+    rank, iterations = pagerank(n, src, dst)
+    depth = click_depth(n, src, dst, home)
+
+    orphan = scanned & (in_degree == 0)
+    if home is not None:
+        orphan[home] = False
+    deep = depth > DEEP_PAGE_DEPTH
+    unreachable = scanned & (depth < 0) if home is not None else np.zeros(n, bool)
+
+    top = np.argsort(-rank)[:GRAPH_REPORT_LIMIT]
+    levels = np.bincount(depth[depth >= 0]) if (depth >= 0).any() else np.zeros(0, int)
+
+    return {
+        "pages": n,
+        "scanned": int(scanned.sum()),
+        "edges": int(len(src)),
+        "home": urls[home] if home is not None else None,
+        "pagerank_iterations": iterations,
+        "top_pages": [
+            {"url": urls[i], "pagerank": round(float(rank[i]) * n, 4),
+             "in_degree": int(in_degree[i]), "out_degree": int(out_degree[i]),
+             "depth": int(depth[i]) if depth[i] >= 0 else None}
+            for i in top
+        ],
+        "orphans": [urls[i] for i in np.flatnonzero(orphan)[:GRAPH_REPORT_LIMIT]],
+        "orphan_count": int(orphan.sum()),
+        "unreachable_count": int(unreachable.sum()),
+        "deep_pages": [
+            {"url": urls[i], "depth": int(depth[i])}
+            for i in np.flatnonzero(deep)[np.argsort(-depth[deep])][:GRAPH_REPORT_LIMIT]
+        ],
+        "depth_histogram": [int(c) for c in levels],
+    }
+
+
+def site_graph(user_id, site):
+    node_ids, urls, scanned_ids, src, dst = load_site(user_id, site)
+    src, dst = dense_edges(node_ids, src, dst)
+    scanned = np.isin(node_ids, scanned_ids)
+    return analyze_graph(urls, scanned, src, dst, find_home(urls, site))
+
+
+# -------------------------------------------------------------
+# BENCHMARK (generated graphs with known answers)
+# -------------------------------------------------------------
+def check_known_answers():
+    # Directed cycle: every page ranks 1/n, depth i for page i
+    n = 1000
+    src = np.arange(n, dtype=np.int32)
+    dst = (src + 1) % n
+    rank, _ = pagerank(n, src, dst)
+    assert np.allclose(rank, 1 / n)
+    assert (click_depth(n, src, dst, 0) == np.arange(n)).all()
+
+    # Star: leaves all link to the hub, hub links to every leaf
+    leaves = np.arange(1, n, dtype=np.int32)
+    src = np.concatenate((leaves, np.zeros(n - 1, np.int32)))
+    dst = np.concatenate((np.zeros(n - 1, np.int32), leaves))
+    rank, _ = pagerank(n, src, dst)
+    d = PAGERANK_DAMPING
+    # Fixed point: hub = (1 - d) / n + d * (1 - hub)
+    assert abs(rank[0] - ((1 - d) / n + d) / (1 + d)) < 1e-6 and abs(rank.sum() - 1) < 1e-9
+    assert np.allclose(rank[1:], rank[1])
+    assert click_depth(n, src, dst, 0).max() == 1
+
+    # Dangling page + orphan: 0 → 1 → 2, page 3 links to 0 but nothing links to 3
+    src = np.array([0, 1, 3], np.int32)
+    dst = np.array([1, 2, 0], np.int32)
+    urls = ["home", "a", "b", "orphan"]
+    report = analyze_graph(urls, np.ones(4, bool), src, dst, home=0)
+    assert report["orphans"] == ["orphan"] and report["unreachable_count"] == 1
+    assert abs(sum(p["pagerank"] for p in report["top_pages"]) / 4 - 1) < 1e-6
+
+    # Remapping sparse ids, self-loops and unknown nodes (both lookup paths)
+    for ids in ([10, 500, 7], [10, 5_000_000_000, 7]):
+        ids = np.array(ids)
+        src = np.append(ids[[0, 0, 1, 2]], 99)
+        dst = np.append(ids[[1, 0, 2, 2]], ids[0])
+        s, t = dense_edges(ids, src, dst)
+        assert list(zip(s.tolist(), t.tolist())) == [(0, 1), (1, 2)]
+
+    # Matches a dense-matrix power iteration on a small random graph
+    rng = np.random.default_rng(3)
+    n = 60
+    src = rng.integers(0, n, 400).astype(np.int32)
+    dst = rng.integers(0, n, 400).astype(np.int32)
+    src, dst = np.unique(np.stack((src, dst)), axis=1)
+    src, dst = dense_edges(np.arange(n), src, dst)
+    matrix = np.zeros((n, n))
+    matrix[dst, src] = 1
+    out = matrix.sum(axis=0)
+    matrix[:, out == 0] = 1
+    matrix /= matrix.sum(axis=0)
+    expected = np.linalg.matrix_power(PAGERANK_DAMPING * matrix + (1 - PAGERANK_DAMPING) / n, 200) @ np.full(n, 1 / n)
+    rank, _ = pagerank(n, src, dst, tolerance=1e-12, max_iterations=500)
+    assert np.allclose(rank, expected, atol=1e-9)
+    print("known answers ok")
+
+
+def benchmark(nodes=1_000_000, edges=10_000_000, seed=1):
+    rng = np.random.default_rng(seed)
+    # Skewed targets, like real sites: a few hub pages get most links
+    src = rng.integers(0, nodes, edges)
+    dst = (rng.pareto(1.2, edges) * 50).astype(np.int64) % nodes
+    node_ids = np.arange(nodes) * 7 + 100  # non-contiguous, like SERIAL ids after deletes
+
+    started = time.perf_counter()
+    s, d = dense_edges(node_ids, node_ids[src], node_ids[dst])
+    dense_s = time.perf_counter() - started
+
+    urls = [f"https://example.com/p{i}" for i in range(nodes)]
+    started = time.perf_counter()
+    report = analyze_graph(urls, np.ones(nodes, bool), s, d, home=0)
+    graph_s = time.perf_counter() - started
+
+    print(f"{nodes:,} nodes, {len(s):,} edges: remap {dense_s:.2f} s, "
+          f"degree+depth+pagerank {graph_s:.2f} s ({report['pagerank_iterations']} iterations), "
+          f"edge arrays {(s.nbytes + d.nbytes) / 1e6:.0f} MB")
+
+
+if __name__ == "__main__":
+    check_known_answers()
+    benchmark()
+    sys.exit(0)
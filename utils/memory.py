@@ -0,0 +1,284 @@
+import gc
+import linecache
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter, deque
+
+from utils.startup import proc_memory_kb
+
+# ============================================================
+# MEMORY DIAGNOSTICS (opt-in: MEMORY_DIAGNOSTICS=1)
+# ============================================================
+# For workers whose RSS creeps up. When enabled, tracemalloc runs with
+# MEMORY_TRACE_FRAMES frames per allocation and every request records:
+#   rss_delta_kb   RSS after − before (what the OS sees)
+#   peak_kb        tracemalloc peak during the request − start
+#   retained_kb    Python memory still held after the request
+# Requests whose peak passes MEMORY_FLAG_KB are flagged and logged. The
+# last MEMORY_RECENT_REQUESTS requests and per-endpoint totals are kept.
+#
+# heap_report() (GET /admin/memory) adds allocation sites by module and
+# by line, growth since the baseline snapshot, and live counts of the
+# usual suspects (BeautifulSoup trees, BytesIO buffers, responses).
+#
+# The tracemalloc peak is process-wide: per-request numbers are exact
+# with one thread per worker (gunicorn.conf.py default), approximate
+# with more.
+#
+# python -m utils.memory --soak 2000   → scans + PDFs against a local
+#                                        fixture site, fails if memory
+#                                        keeps growing
+
+MEMORY_DIAGNOSTICS = os.environ.get("MEMORY_DIAGNOSTICS", "0") == "1"
+MEMORY_TRACE_FRAMES = int(os.environ.get("MEMORY_TRACE_FRAMES", 1))
+MEMORY_FLAG_KB = int(os.environ.get("MEMORY_FLAG_KB", 20 * 1024))
+MEMORY_RECENT_REQUESTS = int(os.environ.get("MEMORY_RECENT_REQUESTS", 200))
+MEMORY_TOP_SITES = 25
+
+# Type names counted in every report (gc-tracked objects only)
+SUSPECT_TYPES = ("BeautifulSoup", "Tag", "BytesIO", "Response", "ScanResult", "SimpleDocTemplate")
+
+_recent = deque(maxlen=MEMORY_RECENT_REQUESTS)
+_flagged = deque(maxlen=50)
+_endpoints = {}
+_lock = threading.Lock()
+_baseline = None
+_started_at = time.time()
+_local = threading.local()
+
+
+def enabled():
+    return tracemalloc.is_tracing()
+
+
+def start_tracing(frames=MEMORY_TRACE_FRAMES):
+    global _baseline
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(frames)
+    _baseline = tracemalloc.take_snapshot()
+
+
+def rss_kb():
+    return proc_memory_kb()["rss_kb"] or 0
+
+
+# -------------------------------------------------------------
+# PER REQUEST
+# -------------------------------------------------------------
+def begin_request():
+    tracemalloc.reset_peak()
+    _local.start = (time.perf_counter(), rss_kb(), tracemalloc.get_traced_memory()[0])
+
+
+def end_request(endpoint, method, status):
+    start = getattr(_local, "start", None)
+    if start is None:
+        return None
+    _local.start = None
+    started, rss_before, traced_before = start
+
+    current, peak = tracemalloc.get_traced_memory()
+    entry = {
+        "endpoint": endpoint,
+        "method": method,
+        "status": status,
+        "ms": round((time.perf_counter() - started) * 1000, 1),
+        "rss_delta_kb": rss_kb() - rss_before,
+        "peak_kb": (peak - traced_before) // 1024,
+        "retained_kb": (current - traced_before) // 1024,
+        "at": time.time(),
+    }
+
+    with _lock:
+        _recent.append(entry)
+        totals = _endpoints.setdefault(endpoint, Counter())
+        totals["requests"] += 1
+        totals["rss_delta_kb"] += entry["rss_delta_kb"]
+        totals["retained_kb"] += entry["retained_kb"]
+        totals["max_peak_kb"] = max(totals["max_peak_kb"], entry["peak_kb"])
+        if entry["peak_kb"] >= MEMORY_FLAG_KB:
+            _flagged.append(entry)
+
+    if entry["peak_kb"] >= MEMORY_FLAG_KB:
+        print(f"MEMORY: {method} {endpoint} peaked at {entry['peak_kb']} KB "
+              f"(retained {entry['retained_kb']} KB, RSS {entry['rss_delta_kb']:+} KB)")
+    return entry
+
+
+def init_memory(app):
+    """Request hooks; a no-op unless MEMORY_DIAGNOSTICS=1."""
+    if not MEMORY_DIAGNOSTICS:
+        return
+    from flask import request
+
+    start_tracing()
+
+    @app.before_request
+    def memory_begin():
+        begin_request()
+
+    @app.after_request
+    def memory_end(response):
+        endpoint, method = request.endpoint or request.path, request.method
+        # Streamed bodies allocate after the view returns; measure on close
+        response.call_on_close(lambda: end_request(endpoint, method, response.status_code))
+        return response
+
+
+# -------------------------------------------------------------
+# HEAP REPORT
+# -------------------------------------------------------------
+def module_of(filename):
+    """Dotted module name for a source file, or the file name."""
+    path = os.path.abspath(filename)
+    for root in sorted((os.path.abspath(p) for p in sys.path if p), key=len, reverse=True):
+        if path.startswith(root + os.sep):
+            relative = os.path.splitext(path[len(root) + 1:])[0]
+            return relative.replace(os.sep, ".").removesuffix(".__init__")
+    return filename
+
+
+def top_sites(snapshot, limit=MEMORY_TOP_SITES):
+    by_module = Counter()
+    for stat in snapshot.statistics("filename"):
+        by_module[module_of(stat.traceback[0].filename)] += stat.size
+
+    lines = []
+    for stat in snapshot.statistics("lineno")[:limit]:
+        frame = stat.traceback[0]
+        lines.append({
+            "site": f"{module_of(frame.filename)}:{frame.lineno}",
+            "code": linecache.getline(frame.filename, frame.lineno).strip(),
+            "kb": stat.size // 1024,
+            "blocks": stat.count,
+        })
+
+    return {
+        "by_module": [{"module": m, "kb": size // 1024} for m, size in by_module.most_common(limit)],
+        "by_line": lines,
+    }
+
+
+def growth_sites(snapshot, baseline, limit=MEMORY_TOP_SITES):
+    sites = []
+    for stat in snapshot.compare_to(baseline, "lineno")[:limit]:
+        if stat.size_diff <= 0:
+            break
+        frame = stat.traceback[0]
+        sites.append({
+            "site": f"{module_of(frame.filename)}:{frame.lineno}",
+            "kb_diff": stat.size_diff // 1024,
+            "blocks_diff": stat.count_diff,
+        })
+    return sites
+
+
+def suspect_counts():
+    counts = Counter(type(o).__name__ for o in gc.get_objects())
+    return {name: counts.get(name, 0) for name in SUSPECT_TYPES}
+
+
+def heap_report(reset_baseline=False):
+    global _baseline
+    report = {
+        "tracing": enabled(),
+        "pid": os.getpid(),
+        "uptime_s": round(time.time() - _started_at),
+        "process": proc_memory_kb(),
+        "gc": {"counts": gc.get_count(), "objects": len(gc.get_objects())},
+        "suspects": suspect_counts(),
+    }
+    with _lock:
+        report["endpoints"] = {
+            endpoint: dict(totals, avg_rss_delta_kb=round(totals["rss_delta_kb"] / totals["requests"], 1))
+            for endpoint, totals in _endpoints.items()
+        }
+        report["flagged"] = list(_flagged)
+        report["recent"] = list(_recent)[-20:]
+
+    if not enabled():
+        return report
+
+    # Filter tracemalloc's own bookkeeping out of the sites
+    snapshot = tracemalloc.take_snapshot().filter_traces(
+        [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, "<frozen importlib._bootstrap*>")]
+    )
+    current, peak = tracemalloc.get_traced_memory()
+    report["traced_kb"] = {"current": current // 1024, "peak": peak // 1024}
+    report["top"] = top_sites(snapshot)
+    if _baseline is not None:
+        report["growth_since_baseline"] = growth_sites(snapshot, _baseline)
+    if reset_baseline:
+        _baseline = snapshot
+    return report
+
+
+# -------------------------------------------------------------
+# SOAK (local fixture site, no DB)
+# -------------------------------------------------------------
+MEMORY_SOAK_MAX_GROWTH_KB = int(os.environ.get("MEMORY_SOAK_MAX_GROWTH_KB", 16 * 1024))
+
+
+def soak(scans=2000, pages=40, pdf_every=10):
+    """Scans fixture pages (and builds a PDF through send_file every
+    `pdf_every` scans), sampling RSS and traced memory after gc. After a
+    warm-up tenth, memory has to stay within MEMORY_SOAK_MAX_GROWTH_KB."""
+    from flask import Flask, send_file
+    import io
+
+    from utils.analyzer import run_local_seo_analysis
+    from utils.crawler import fixture_site
+    from utils.pdf_builder import build_pdf
+
+    server, hits = fixture_site(pages, latency=0)
+    base = f"http://127.0.0.1:{server.server_port}/p"
+    app = Flask(__name__)
+    start_tracing()
+
+    samples = []
+    warmup = max(1, scans // 10)
+    started = time.perf_counter()
+    for i in range(scans):
+        result = run_local_seo_analysis(f"{base}{i % pages}", "espresso grinder")
+        if i % pdf_every == 0:
+            pdf = build_pdf({"email": "soak@example.com"}, result.to_dict())
+            with app.test_request_context():
+                response = send_file(io.BytesIO(pdf), mimetype="application/pdf",
+                                     as_attachment=True, download_name="seo_report.pdf")
+                response.direct_passthrough = False
+                response.get_data()
+                response.close()
+        del result
+
+        if (i + 1) % warmup == 0:
+            hits.clear()  # the fixture's own request log
+            gc.collect()
+            samples.append((i + 1, rss_kb(), tracemalloc.get_traced_memory()[0] // 1024))
+            print(f"{i + 1:>6} scans  rss {samples[-1][1]:>7} KB  traced {samples[-1][2]:>6} KB")
+
+    server.shutdown()
+    elapsed = time.perf_counter() - started
+    _, rss_start, traced_start = samples[0]
+    _, rss_end, traced_end = samples[-1]
+    print(f"{scans} scans in {elapsed:.0f}s; after warm-up: RSS {rss_end - rss_start:+} KB, "
+          f"traced {traced_end - traced_start:+} KB")
+
+    growth = growth_sites(tracemalloc.take_snapshot(), _baseline, 5)
+    for site in growth:
+        print(f"  {site['site']:<40} {site['kb_diff']:>+7} KB  {site['blocks_diff']:>+7} blocks")
+    assert traced_end - traced_start < MEMORY_SOAK_MAX_GROWTH_KB, "traced memory keeps growing"
+    assert rss_end - rss_start < MEMORY_SOAK_MAX_GROWTH_KB, "RSS keeps growing"
+
+
+if __name__ == "__main__":
+    if "--soak" in sys.argv:
+        position = sys.argv.index("--soak") + 1
+        soak(int(sys.argv[position]) if position < len(sys.argv) else 2000)
+        sys.exit(0)
+    start_tracing()
+    report = heap_report()
+    for module in report["top"]["by_module"][:10]:
+        print(f"{module['module']:<40} {module['kb']:>8} KB")
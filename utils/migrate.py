@@ -1,6 +1,14 @@
 import psycopg2
 from psycopg2 import sql
 from utils.db import get_connection
+from utils.link_cache import CREATE_TABLES as LINK_CACHE_TABLES
+from utils.image_audit import CREATE_TABLES as IMAGE_CACHE_TABLES
+from utils.history import CREATE_TABLES as HISTORY_TABLES, ensure_partitions
+from utils.near_dup import CREATE_TABLES as SKETCH_TABLES
+from utils.link_graph import CREATE_TABLES as LINK_GRAPH_TABLES
+from utils.scheduler import CREATE_TABLES as MONITOR_TABLES
+from utils.crawler import CREATE_TABLES as CRAWL_TABLES
+from utils.api_tokens import CREATE_TABLES as API_TOKEN_TABLES
 
 
 # ============================================================
@@ -12,6 +20,18 @@ REQUIRED_COLUMNS = {
     "scans_reset_date": "DATE"
 }
 
+# Idempotent DDL (CREATE ... IF NOT EXISTS) for subsystem tables
+REQUIRED_TABLES = {
+    "link_status_cache": LINK_CACHE_TABLES,
+    "image_probe_cache": IMAGE_CACHE_TABLES,
+    "scans": HISTORY_TABLES,
+    "page_sketches": SKETCH_TABLES,
+    "link_graph": LINK_GRAPH_TABLES,
+    "monitors": MONITOR_TABLES,
+    "crawls": CRAWL_TABLES,
+    "api_tokens": API_TOKEN_TABLES,
+}
+
 
 def column_exists(cursor, table, column):
     cursor.execute("""
@@ -39,6 +59,15 @@ def run_migrations():
         else:
             print(f"✓ Column already exists: {column}")
 
+    for table, ddl in REQUIRED_TABLES.items():
+        print(f"➕ Ensuring table: {table}")
+        cursor.execute(ddl)
+        conn.commit()
+
+    print("➕ Ensuring monthly scan partitions")
+    ensure_partitions(cursor)
+    conn.commit()
+
     cursor.close()
     conn.close()
     print("✅ Migration complete.\n")
@@ -69,11 +69,21 @@ def build_pdf(user_data, analysis_data, competitor_data=None):
     # =========================
     story.append(section("Site Audit"))
 
-    audit_text = safe(analysis_data.get("audit"))
-    for line in audit_text.split("\n"):
-        line = line.strip()
-        if line:
-            story.append(Paragraph(f"- {html.escape(line)}", normal))
+    audit_items = analysis_data.get("audit_items")
+    if audit_items:
+        # Structured items (ScanResult.to_dict) – no text re-parsing
+        section_name = None
+        for item in audit_items:
+            if item["section"] != section_name:
+                section_name = item["section"]
+                story.append(Paragraph(f"<b>{html.escape(section_name)}</b>", normal))
+            story.append(Paragraph(f"- {html.escape(item['label'])}: {safe(item['value'])}", normal))
+    else:
+        audit_text = safe(analysis_data.get("audit"))
+        for line in audit_text.split("\n"):
+            line = line.strip()
+            if line:
+                story.append(Paragraph(f"- {html.escape(line)}", normal))
 
     story.append(Spacer(1, 0.25 * inch))
 
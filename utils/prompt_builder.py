@@ -0,0 +1,253 @@
+import glob
+import os
+import re
+import sys
+from utils.analyzer import clean_text
+
+# Token budget for the page context part of an AI prompt. Counting is a
+# local ~4 chars/token estimate, close enough for gpt-4o-mini English text.
+#
+# python -m utils.prompt_builder   → prompt size and grounding over
+#                                    fixtures/html plus generated long pages
+PROMPT_TOKEN_BUDGET = int(os.environ.get("AI_PROMPT_TOKEN_BUDGET", 600))
+
+SENTENCE_SPLIT = re.compile(r"(?<=[.!?])\s+")
+
+
+# ---------------------------------------------------
+# TOKEN ESTIMATE
+# ---------------------------------------------------
+def estimate_tokens(text):
+    return len(text) // 4 + 1
+
+
+# ---------------------------------------------------
+# SENTENCE CANDIDATES (split + dedupe)
+# ---------------------------------------------------
+def candidate_sentences(paragraphs, min_words=5, max_words=60):
+    seen = set()
+    kept = []
+
+    for paragraph in paragraphs:
+        for sentence in SENTENCE_SPLIT.split(paragraph):
+            sentence = " ".join(sentence.split())
+            if len(sentence.split()) > max_words:
+                # Run-on text (no punctuation): keep its opening words
+                sentence = " ".join(sentence.split()[:max_words]) + "…"
+            words = clean_text(sentence).split()
+            if len(words) < min_words:
+                continue
+
+            key = " ".join(words)
+            if key in seen:
+                continue
+
+            # Near-duplicates (boilerplate repeated with small edits)
+            word_set = set(words)
+            if any(len(word_set & other) / len(word_set | other) >= 0.8 for _, other in kept):
+                continue
+
+            seen.add(key)
+            kept.append((sentence, word_set))
+
+    return kept
+
+
+# ---------------------------------------------------
+# EXTRACTIVE SUMMARY UNDER A TOKEN BUDGET
+# ---------------------------------------------------
+def summarize(paragraphs, top_terms, keyword=None, budget=PROMPT_TOKEN_BUDGET):
+    candidates = candidate_sentences(paragraphs)
+    if not candidates or budget <= 0:
+        return []
+
+    weights = {term: len(top_terms) - i for i, term in enumerate(top_terms)}
+    if keyword:
+        for word in clean_text(keyword).split():
+            weights[word] = weights.get(word, 0) + len(top_terms) + 1
+
+    scored = []
+    for position, (sentence, word_set) in enumerate(candidates):
+        hits = sum(weights.get(w, 0) for w in word_set)
+        # Lead sentences carry most of a page's topic, so ties go to them
+        lead_bonus = 1.0 / (1 + position)
+        score = hits / (len(word_set) ** 0.5) + lead_bonus
+        scored.append((-score, position, sentence))
+
+    # Deterministic: best score first, document order on ties
+    scored.sort()
+
+    chosen = []
+    used = 0
+    for _, position, sentence in scored:
+        cost = estimate_tokens(sentence)
+        if used + cost > budget:
+            continue
+        chosen.append((position, sentence))
+        used += cost
+
+    return [sentence for _, sentence in sorted(chosen)]
+
+
+# ---------------------------------------------------
+# PAGE FACTS BLOCK
+# ---------------------------------------------------
+FACT_MAX_CHARS = 300
+
+
+def clip(text, limit=FACT_MAX_CHARS):
+    text = " ".join(text.split())
+    return text if len(text) <= limit else text[:limit - 1].rstrip() + "…"
+
+
+def page_facts(context, keyword=None, budget=PROMPT_TOKEN_BUDGET):
+    """Fact lines that fit `budget`, most important first: keyword, title,
+    H1s, description, top terms. Kept lines stay in display order."""
+    facts = []  # (priority, display order, line)
+
+    if keyword:
+        facts.append((0, 4, f"Target keyword: {clip(keyword, 100)}"))
+    if context.get("title"):
+        facts.append((1, 0, f"Title: {clip(context['title'])}"))
+    if context.get("h1"):
+        facts.append((2, 2, "H1: " + clip(" | ".join(context["h1"]))))
+    if context.get("description"):
+        facts.append((3, 1, f"Meta description: {clip(context['description'])}"))
+    if context.get("top_terms"):
+        facts.append((4, 3, "Top terms: " + clip(", ".join(context["top_terms"]))))
+
+    kept = []
+    used = 0
+    for _, order, line in sorted(facts):
+        cost = estimate_tokens(line)
+        if used + cost > budget:
+            continue
+        kept.append((order, line))
+        used += cost
+
+    return "\n".join(line for _, line in sorted(kept))
+
+
+# ---------------------------------------------------
+# GROUNDED PROMPT
+# ---------------------------------------------------
+# `budget` covers everything taken from the page: the facts block and
+# the excerpt together. The instruction and section headers are not counted.
+def build_page_prompt(instruction, context, keyword=None, budget=PROMPT_TOKEN_BUDGET):
+    facts = page_facts(context, keyword, budget)
+    remaining = budget - (estimate_tokens(facts) if facts else 0)
+
+    excerpt = summarize(
+        context.get("paragraphs", []),
+        context.get("top_terms", []),
+        keyword=keyword,
+        budget=remaining,
+    )
+
+    parts = [instruction]
+    if facts:
+        parts += ["", "PAGE FACTS:", facts]
+    if excerpt:
+        parts += ["", "KEY CONTENT:", "\n".join(excerpt)]
+
+    return "\n".join(parts)
+
+
+# -------------------------------------------------------------
+# BENCHMARK (fixture pages: prompt size versus grounding)
+# -------------------------------------------------------------
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "fixtures", "html")
+BENCH_INSTRUCTION = "Write an optimized SEO page title for this website: {url}. Keep it under 60 characters."
+HEADER_TOKENS = 8  # "PAGE FACTS:" / "KEY CONTENT:" and blank lines, outside the budget
+
+
+def long_article(sections=40):
+    """Long page with repeated boilerplate, where compression matters."""
+    parts = [
+        "<html><head><title>How to dial in espresso at home</title>",
+        "<meta name='description' content='Grind size, dose and yield for better espresso shots.'>",
+        "</head><body><h1>Dial in espresso</h1>",
+    ]
+    for i in range(sections):
+        parts.append(
+            f"<p>Step {i}: adjust the grind size by one notch and pull another shot. "
+            f"Taste it and note whether the espresso is sour or bitter. "
+            f"A {18 + i % 3} gram dose in a {36 + i % 5} gram yield is a good start.</p>"
+            "<p>Free shipping on all orders over fifty dollars. Sign up for our newsletter today.</p>"
+        )
+    parts.append("</body></html>")
+    return "".join(parts)
+
+
+def full_prompt(instruction, context):
+    """The unbudgeted alternative: every fact and every key paragraph."""
+    facts = [
+        f"Title: {context.get('title')}",
+        f"Meta description: {context.get('description')}",
+        "H1: " + " | ".join(context.get("h1") or []),
+        "Top terms: " + ", ".join(context.get("top_terms") or []),
+    ]
+    return "\n".join([instruction, "", "PAGE FACTS:", *facts, "", "PAGE TEXT:", *context.get("paragraphs", [])])
+
+
+def grounding_gaps(prompt, context, keyword):
+    """Required facts the prompt lost: keyword, title, first H1, description,
+    and a keyword sentence when the page has one."""
+    required = {
+        "keyword": keyword and clip(keyword, 100),
+        "title": context.get("title") and clip(context["title"]),
+        "h1": context.get("h1") and clip(context["h1"][0]),
+        "description": context.get("description") and clip(context["description"]),
+    }
+    gaps = [name for name, text in required.items() if text and text not in prompt]
+
+    if keyword:
+        words = set(clean_text(keyword).split())
+        on_topic = [s for s, word_set in candidate_sentences(context.get("paragraphs", [])) if words <= word_set]
+        if on_topic and not any(sentence in prompt for sentence in on_topic):
+            gaps.append("keyword sentence")
+    return gaps
+
+
+def coverage(prompt, section, context):
+    text = clean_text(prompt.partition(section)[2])
+    terms = context["top_terms"]
+    return sum(term in text for term in terms) / len(terms) if terms else 1
+
+
+def benchmark(directory=FIXTURE_DIR, budgets=(PROMPT_TOKEN_BUDGET, 150)):
+    from bs4 import BeautifulSoup
+    from utils.analyzer import page_context
+    from utils.stream_scan import large_page
+
+    pages = [(os.path.basename(path), open(path, encoding="utf-8").read())
+             for path in sorted(glob.glob(os.path.join(directory, "*.html")))]
+    pages += [("generated long article", long_article()), ("generated large page", large_page())]
+
+    print(f"{'page':<26} {'url only':>9} {'full':>11} " + " ".join(f"{f'budget {b}':>11}" for b in budgets)
+          + "   (estimated tokens, share of top terms the page text covers)")
+    for name, html in pages:
+        url = "https://example.com/" + name.replace(" ", "-")
+        context = page_context(url, BeautifulSoup(html, "html.parser"))
+        keyword = context["top_terms"][0] if context["top_terms"] else None
+        instruction = BENCH_INSTRUCTION.format(url=url)
+
+        full = full_prompt(instruction, context)
+        columns = []
+        for budget in budgets:
+            prompt = build_page_prompt(instruction, context, keyword, budget)
+            assert prompt == build_page_prompt(instruction, context, keyword, budget), name  # deterministic
+            assert estimate_tokens(prompt) <= estimate_tokens(instruction) + budget + HEADER_TOKENS, (name, budget)
+            gaps = grounding_gaps(prompt, context, keyword)
+            assert not gaps, (name, budget, gaps)
+            columns.append(f"{estimate_tokens(prompt):>5} {coverage(prompt, 'KEY CONTENT:', context):>4.0%}")
+
+        full_column = f"{estimate_tokens(full):>6} {coverage(full, 'PAGE TEXT:', context):>4.0%}"
+        print(f"{name:<26} {estimate_tokens(instruction):>9} {full_column:>11} " + " ".join(
+            f"{column:>11}" for column in columns))
+    print("grounding facts (keyword, title, H1, description, keyword sentence) kept in every prompt")
+
+
+if __name__ == "__main__":
+    benchmark(sys.argv[1] if len(sys.argv) > 1 else FIXTURE_DIR)
+    sys.exit(0)
@@ -0,0 +1,220 @@
+import json
+import struct
+import sys
+import time
+import zlib
+
+# ============================================================
+# SCAN RESULT MODEL
+# ============================================================
+# What run_local_seo_analysis returns: the main score, five sub-scores,
+# structured audit items, tips and page_meta. to_dict() is the JSON shape
+# the API has always returned; encode()/decode() is a compact binary form
+# used for history storage and anywhere a result is cached or shipped
+# between processes.
+#
+# Binary layout (big-endian):
+#   "SR" | version:B | score:B | 5 sub-scores:B | item count:B
+#   | count × (layout index:B, value:h) | zlib(JSON [tips, page_meta])
+#
+# AUDIT_LAYOUT is append-only: new audit items get new indices, so old
+# payloads keep decoding. Anything that changes the meaning of existing
+# bytes bumps FORMAT_VERSION.
+#
+# python -m utils.scan_result   → size + speed versus the JSON payload
+
+MAGIC = b"SR"
+FORMAT_VERSION = 1
+
+SUBSCORE_FIELDS = ("content", "technical", "keyword", "onpage", "links")
+
+AUDIT_LAYOUT = (
+    ("CONTENT ANALYSIS", "Word count score"),
+    ("CONTENT ANALYSIS", "Readability score"),
+    ("CONTENT ANALYSIS", "Semantic richness score"),
+    ("CONTENT ANALYSIS", "Heading structure"),
+    ("KEYWORD ANALYSIS", "Keyword relevance score"),
+    ("TECHNICAL HEALTH", "Technical score"),
+    ("ON-PAGE STRUCTURE", "On-page score"),
+    ("LINK HEALTH", "Link score"),
+    ("PAGE SPEED", "Page weight score"),
+    ("IMAGES", "Image optimization score"),
+)
+AUDIT_INDEX = {entry: i for i, entry in enumerate(AUDIT_LAYOUT)}
+
+HEADER = struct.Struct(">2sBB5BB")
+ITEM = struct.Struct(">Bh")
+
+
+# -------------------------------------------------------------
+# MODEL
+# -------------------------------------------------------------
+class SubScores:
+    __slots__ = SUBSCORE_FIELDS
+
+    def __init__(self, content=0, technical=0, keyword=0, onpage=0, links=0):
+        self.content = content
+        self.technical = technical
+        self.keyword = keyword
+        self.onpage = onpage
+        self.links = links
+
+    def as_tuple(self):
+        return tuple(getattr(self, field) for field in SUBSCORE_FIELDS)
+
+    def to_dict(self):
+        return dict(zip(SUBSCORE_FIELDS, self.as_tuple()))
+
+    def __eq__(self, other):
+        return isinstance(other, SubScores) and self.as_tuple() == other.as_tuple()
+
+    def __repr__(self):
+        return f"SubScores({', '.join(f'{k}={v}' for k, v in self.to_dict().items())})"
+
+
+class AuditItem:
+    __slots__ = ("section", "label", "value")
+
+    def __init__(self, section, label, value):
+        self.section = section
+        self.label = label
+        self.value = value
+
+    def line(self):
+        return f"{self.label}: {self.value}"
+
+    def to_dict(self):
+        return {"section": self.section, "label": self.label, "value": self.value}
+
+    def __eq__(self, other):
+        return isinstance(other, AuditItem) and (
+            (self.section, self.label, self.value) == (other.section, other.label, other.value)
+        )
+
+    def __repr__(self):
+        return f"AuditItem({self.section!r}, {self.label!r}, {self.value!r})"
+
+
+class ScanResult:
+    __slots__ = ("score", "subscores", "audit", "tips", "page_meta", "outlinks", "terms", "phrases")
+
+    # In-process only, never encoded or returned: `outlinks` (followed
+    # internal URLs) feeds the link graph, `terms` / `phrases` (the page's
+    # word and bigram Counters, capped) feed the competitor comparisons
+    def __init__(self, score, subscores, audit, tips, page_meta, outlinks=None, terms=None,
+                 phrases=None):
+        self.score = score
+        self.subscores = subscores
+        self.audit = audit
+        self.tips = tips
+        self.page_meta = page_meta
+        self.outlinks = outlinks
+        self.terms = terms
+        self.phrases = phrases
+
+    @classmethod
+    def error(cls):
+        return cls(0, SubScores(), [], "Unable to analyze page.", {})
+
+    @property
+    def ok(self):
+        return bool(self.page_meta)
+
+    # ---------------------------------------------------
+    # RENDERING
+    # ---------------------------------------------------
+    def audit_text(self):
+        """The sectioned plain-text audit the dashboard and PDF show."""
+        if not self.audit:
+            return "Error fetching page."
+
+        blocks = []
+        for item in self.audit:
+            if not blocks or blocks[-1][0] != item.section:
+                blocks.append((item.section, []))
+            blocks[-1][1].append(f"- {item.line()}")
+        return "\n".join(f"{section}:\n" + "\n".join(lines) + "\n" for section, lines in blocks)
+
+    def to_dict(self):
+        data = {"score": self.score, "audit": self.audit_text(), "tips": self.tips}
+        data.update(self.subscores.to_dict())
+        data["audit_items"] = [item.to_dict() for item in self.audit]
+        data["page_meta"] = self.page_meta
+        return data
+
+    def summary(self):
+        """Scores only (competitor column, monitor snapshots)."""
+        data = self.subscores.to_dict()
+        data["score"] = self.score
+        return data
+
+    # ---------------------------------------------------
+    # BINARY ENCODING
+    # ---------------------------------------------------
+    def encode(self, level=6):
+        parts = [HEADER.pack(MAGIC, FORMAT_VERSION, self.score, *self.subscores.as_tuple(), len(self.audit))]
+        for item in self.audit:
+            parts.append(ITEM.pack(AUDIT_INDEX[(item.section, item.label)], item.value))
+        body = json.dumps([self.tips, self.page_meta], separators=(",", ":")).encode()
+        parts.append(zlib.compress(body, level))
+        return b"".join(parts)
+
+    @classmethod
+    def decode(cls, data):
+        data = bytes(data)
+        magic, version, score, *subscores, count = HEADER.unpack_from(data)
+        if magic != MAGIC:
+            raise ValueError("not an encoded scan result")
+        if version != FORMAT_VERSION:
+            raise ValueError(f"unsupported scan result version {version}")
+
+        audit = []
+        offset = HEADER.size
+        for _ in range(count):
+            index, value = ITEM.unpack_from(data, offset)
+            offset += ITEM.size
+            section, label = AUDIT_LAYOUT[index]
+            audit.append(AuditItem(section, label, value))
+
+        tips, page_meta = json.loads(zlib.decompress(data[offset:]))
+        return cls(score, SubScores(*subscores), audit, tips, page_meta)
+
+    def __eq__(self, other):
+        return isinstance(other, ScanResult) and (
+            self.score == other.score and self.subscores == other.subscores
+            and self.audit == other.audit and self.tips == other.tips
+            and self.page_meta == other.page_meta
+        )
+
+    def __repr__(self):
+        return f"ScanResult(score={self.score}, {self.subscores!r}, items={len(self.audit)})"
+
+
+def is_encoded(data):
+    return bytes(data[:2]) == MAGIC
+
+
+# -------------------------------------------------------------
+# BENCHMARK (encoded vs the JSON API payload)
+# -------------------------------------------------------------
+def benchmark(result, rounds=2000):
+    def timed(fn):
+        started = time.perf_counter()
+        for _ in range(rounds):
+            fn()
+        return (time.perf_counter() - started) / rounds * 1e6
+
+    as_json = json.dumps(result.to_dict()).encode()
+    as_binary = result.encode()
+
+    print(f"{'format':<8} {'bytes':>8} {'encode us':>10} {'decode us':>10}")
+    print(f"{'json':<8} {len(as_json):>8} {timed(lambda: json.dumps(result.to_dict()).encode()):>10.1f} "
+          f"{timed(lambda: json.loads(as_json)):>10.1f}")
+    print(f"{'binary':<8} {len(as_binary):>8} {timed(result.encode):>10.1f} "
+          f"{timed(lambda: ScanResult.decode(as_binary)):>10.1f}")
+
+
+if __name__ == "__main__":
+    from utils.analyzer import run_local_seo_analysis
+    url = sys.argv[1] if len(sys.argv) > 1 else "https://example.com"
+    benchmark(run_local_seo_analysis(url, sys.argv[2] if len(sys.argv) > 2 else None))
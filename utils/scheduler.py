@@ -0,0 +1,651 @@
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+import psycopg2.extras
+from utils.db import get_connection
+from utils.scan_result import SUBSCORE_FIELDS
+from utils.urls import url_host
+
+# ============================================================
+# MONITORING SCHEDULER
+# ============================================================
+# Pro users register (url, keyword) pairs to be re-scanned every N hours.
+# Each monitor runs at a fixed, hash-derived offset inside its interval,
+# so runs are spread over the whole period instead of piling up at the
+# top of the hour, and a monitor keeps the same slot across restarts.
+#
+# Every tick: claim the due monitors (SKIP LOCKED, so several worker
+# dynos can run side by side), group them by host, and run each host's
+# batch sequentially (one request at a time per site, with a pause
+# between) while batches for different hosts run in parallel. A global
+# pool size bounds how much scanning happens at once; the per-user bound
+# is enforced by the claim itself: a claimed monitor holds a running_until
+# lease until its outcome is saved, and a user with
+# MONITOR_PER_USER_CONCURRENCY live leases (from any process) gets no more
+# monitors claimed until one ends. When a score drops by MONITOR_ALERT_DROP or more compared to the
+# previous run, an alert row is written.
+#
+# python -m utils.scheduler              → run the loop (Procfile `monitor` process)
+# python -m utils.scheduler --simulate   → two simulated days against a local
+#                                          fixture site and a scratch schema
+#
+# Time is always passed in (`now`, `clock`, `sleep`), so the planning
+# functions can be driven by a simulated clock.
+
+MONITOR_TICK_SECONDS = int(os.environ.get("MONITOR_TICK_SECONDS", 60))
+MONITOR_MIN_INTERVAL = int(os.environ.get("MONITOR_MIN_INTERVAL_HOURS", 6)) * 3600
+MONITOR_BATCH_LIMIT = int(os.environ.get("MONITOR_BATCH_LIMIT", 100))
+MONITOR_CONCURRENCY = int(os.environ.get("MONITOR_CONCURRENCY", 4))
+MONITOR_PER_USER_CONCURRENCY = int(os.environ.get("MONITOR_PER_USER_CONCURRENCY", 1))
+MONITOR_HOST_DELAY = float(os.environ.get("MONITOR_HOST_DELAY", 2))
+MONITOR_ALERT_DROP = int(os.environ.get("MONITOR_ALERT_DROP", 10))
+MONITOR_MAX_PER_USER = int(os.environ.get("MONITOR_MAX_PER_USER", 25))
+MONITOR_RUN_LEASE = int(os.environ.get("MONITOR_RUN_LEASE_SECONDS", 900))  # crashed runs free the slot after this
+
+CREATE_TABLES = """
+    CREATE TABLE IF NOT EXISTS monitors (
+        id SERIAL PRIMARY KEY,
+        user_id INTEGER NOT NULL,
+        url TEXT NOT NULL,
+        keyword TEXT,
+        interval_seconds INTEGER NOT NULL,
+        next_run_at TIMESTAMPTZ NOT NULL,
+        last_run_at TIMESTAMPTZ,
+        last_scores JSONB,
+        active BOOLEAN NOT NULL DEFAULT TRUE,
+        created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+        running_until TIMESTAMPTZ
+    );
+    ALTER TABLE monitors ADD COLUMN IF NOT EXISTS running_until TIMESTAMPTZ;
+    CREATE INDEX IF NOT EXISTS monitors_due_idx
+        ON monitors (next_run_at) WHERE active;
+    CREATE INDEX IF NOT EXISTS monitors_user_idx ON monitors (user_id);
+
+    CREATE TABLE IF NOT EXISTS monitor_alerts (
+        id BIGSERIAL PRIMARY KEY,
+        monitor_id INTEGER NOT NULL,
+        user_id INTEGER NOT NULL,
+        url TEXT NOT NULL,
+        previous_score SMALLINT NOT NULL,
+        score SMALLINT NOT NULL,
+        details JSONB NOT NULL,
+        created_at TIMESTAMPTZ NOT NULL DEFAULT now()
+    );
+    CREATE INDEX IF NOT EXISTS monitor_alerts_user_idx
+        ON monitor_alerts (user_id, created_at DESC);
+"""
+
+# -------------------------------------------------------------
+# JITTERED SLOTS (deterministic per monitor)
+# -------------------------------------------------------------
+def slot_offset(monitor_id, interval):
+    digest = hashlib.blake2b(str(monitor_id).encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big") % interval
+
+
+def next_run_at(monitor_id, interval, now):
+    """First slot of this monitor strictly after `now` (epoch seconds)."""
+    period_start = int(now) - int(now) % interval
+    candidate = period_start + slot_offset(monitor_id, interval)
+    if candidate <= now:
+        candidate += interval
+    return candidate
+
+
+# -------------------------------------------------------------
+# PLANNING (pure: host batches + alerts)
+# -------------------------------------------------------------
+def host_batches(monitors):
+    """Groups claimed monitors by host, biggest batch first."""
+    batches = {}
+    for monitor in monitors:
+        batches.setdefault(url_host(monitor["url"]) or "", []).append(monitor)
+    return sorted(batches.values(), key=len, reverse=True)
+
+
+def scores_of(result):
+    if not result.ok:
+        return None  # fetch failed
+    return result.summary()
+
+
+def score_alert(previous, current, threshold=MONITOR_ALERT_DROP):
+    if not previous or not current:
+        return None
+
+    drop = previous["score"] - current["score"]
+    if drop < threshold:
+        return None
+
+    return {
+        "drop": drop,
+        "components": {
+            field: {"before": previous[field], "after": current[field]}
+            for field in SUBSCORE_FIELDS
+            if current.get(field, 0) < previous.get(field, 0)
+        },
+    }
+
+
+# -------------------------------------------------------------
+# EXECUTION (host batches in parallel)
+# -------------------------------------------------------------
+def run_batch(batch, scan, sleep=time.sleep, host_delay=MONITOR_HOST_DELAY):
+    outcomes = []
+    for i, monitor in enumerate(batch):
+        if i:
+            sleep(host_delay)  # politeness between hits on the same host
+        try:
+            result = scan(monitor["url"], monitor["keyword"])
+        except Exception as e:
+            print("MONITOR SCAN ERROR:", monitor["url"], e)
+            result = None
+        outcomes.append((monitor, result))
+    return outcomes
+
+
+def run_batches(batches, scan, sleep=time.sleep, concurrency=MONITOR_CONCURRENCY):
+    outcomes = []
+    if not batches:
+        return outcomes
+    with ThreadPoolExecutor(max_workers=min(concurrency, len(batches)),
+                            thread_name_prefix="monitor") as pool:
+        for batch_outcomes in pool.map(lambda batch: run_batch(batch, scan, sleep), batches):
+            outcomes.extend(batch_outcomes)
+    return outcomes
+
+
+# -------------------------------------------------------------
+# STORAGE
+# -------------------------------------------------------------
+def to_timestamp(epoch):
+    return datetime.fromtimestamp(epoch, timezone.utc)
+
+
+def add_monitor(user_id, url, keyword=None, interval_hours=24, now=None):
+    interval = max(int(interval_hours * 3600), MONITOR_MIN_INTERVAL)
+    now = now if now is not None else time.time()
+
+    conn = get_connection()
+    cur = conn.cursor()
+
+    cur.execute("SELECT count(*) FROM monitors WHERE user_id = %s AND active", (user_id,))
+    if cur.fetchone()[0] >= MONITOR_MAX_PER_USER:
+        cur.close()
+        conn.close()
+        return None
+
+    cur.execute(
+        """
+        INSERT INTO monitors (user_id, url, keyword, interval_seconds, next_run_at)
+        VALUES (%s, %s, %s, %s, now())
+        RETURNING id
+        """,
+        (user_id, url, keyword or None, interval)
+    )
+    monitor_id = cur.fetchone()[0]
+
+    # The slot depends on the id, so it is set once the id exists
+    cur.execute(
+        "UPDATE monitors SET next_run_at = %s WHERE id = %s",
+        (to_timestamp(next_run_at(monitor_id, interval, now)), monitor_id)
+    )
+
+    conn.commit()
+    cur.close()
+    conn.close()
+    return monitor_id
+
+
+def remove_monitor(user_id, monitor_id):
+    conn = get_connection()
+    cur = conn.cursor()
+    cur.execute(
+        "UPDATE monitors SET active = FALSE WHERE id = %s AND user_id = %s",
+        (monitor_id, user_id)
+    )
+    conn.commit()
+    cur.close()
+    conn.close()
+
+
+def list_monitors(user_id):
+    conn = get_connection()
+    cur = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
+    cur.execute(
+        """
+        SELECT id, url, keyword, interval_seconds, next_run_at, last_run_at, last_scores
+        FROM monitors
+        WHERE user_id = %s AND active
+        ORDER BY id
+        """,
+        (user_id,)
+    )
+    rows = cur.fetchall()
+    cur.close()
+    conn.close()
+    return rows
+
+
+def recent_alerts(user_id, limit=20):
+    conn = get_connection()
+    cur = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
+    cur.execute(
+        """
+        SELECT id, monitor_id, url, previous_score, score, details, created_at
+        FROM monitor_alerts
+        WHERE user_id = %s
+        ORDER BY created_at DESC
+        LIMIT %s
+        """,
+        (user_id, limit)
+    )
+    rows = cur.fetchall()
+    cur.close()
+    conn.close()
+    return rows
+
+
+def claim_due(now, limit=MONITOR_BATCH_LIMIT, per_user=MONITOR_PER_USER_CONCURRENCY):
+    """Locks the due monitors, keeps as many per user as that user has free
+    run slots, and moves those to their next slot with a running lease.
+    The rest stay due for a later tick."""
+    conn = get_connection()
+    cur = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
+
+    cur.execute(
+        """
+        SELECT m.id, m.user_id, m.url, m.keyword, m.interval_seconds, m.last_scores
+        FROM monitors m
+        JOIN users u ON u.id = m.user_id
+        WHERE m.active AND u.is_pro AND m.next_run_at <= %s
+        ORDER BY m.next_run_at
+        LIMIT %s
+        FOR UPDATE OF m SKIP LOCKED
+        """,
+        (to_timestamp(now), limit)
+    )
+    candidates = [dict(row) for row in cur.fetchall()]
+
+    monitors = []
+    if candidates:
+        # Serialize claims per user across processes (in user order, so two
+        # claimers can't deadlock), then count what is already running
+        users = sorted({m["user_id"] for m in candidates})
+        cur.execute(
+            """
+            SELECT pg_advisory_xact_lock(hashtext('monitors.user'), u)
+            FROM (SELECT unnest(%s::int[]) AS u ORDER BY 1) AS users
+            """,
+            (users,)
+        )
+        cur.execute(
+            """
+            SELECT user_id, count(*) FROM monitors
+            WHERE user_id = ANY(%s) AND running_until > %s
+            GROUP BY user_id
+            """,
+            (users, to_timestamp(now))
+        )
+        free = {user_id: per_user for user_id in users}
+        for user_id, running in cur.fetchall():
+            free[user_id] -= running
+
+        for monitor in candidates:
+            if free[monitor["user_id"]] > 0:
+                free[monitor["user_id"]] -= 1
+                monitors.append(monitor)
+
+    if monitors:
+        psycopg2.extras.execute_values(
+            cur,
+            """
+            UPDATE monitors SET next_run_at = v.next_run_at, running_until = v.running_until
+            FROM (VALUES %s) AS v (id, next_run_at, running_until)
+            WHERE monitors.id = v.id
+            """,
+            [(m["id"], to_timestamp(next_run_at(m["id"], m["interval_seconds"], now)),
+              to_timestamp(now + MONITOR_RUN_LEASE))
+             for m in monitors]
+        )
+
+    conn.commit()
+    cur.close()
+    conn.close()
+    return monitors
+
+
+def save_outcomes(outcomes, now):
+    from utils.history import record_scan
+
+    updates = []
+    alerts = []
+    for monitor, result in outcomes:
+        current = scores_of(result) if result else None
+        if current is None:
+            continue
+        record_scan(monitor["user_id"], monitor["url"], monitor["keyword"], result)
+
+        alert = score_alert(monitor["last_scores"], current)
+        if alert:
+            alerts.append((
+                monitor["id"], monitor["user_id"], monitor["url"],
+                monitor["last_scores"]["score"], current["score"], json.dumps(alert),
+            ))
+        updates.append((monitor["id"], to_timestamp(now), json.dumps(current)))
+
+    if not outcomes:
+        return 0
+
+    conn = get_connection()
+    cur = conn.cursor()
+
+    # Failed runs give their slot back too
+    cur.execute(
+        "UPDATE monitors SET running_until = NULL WHERE id = ANY(%s)",
+        ([monitor["id"] for monitor, _ in outcomes],)
+    )
+
+    if updates:
+        psycopg2.extras.execute_values(
+            cur,
+            """
+            UPDATE monitors SET last_run_at = v.last_run_at, last_scores = v.last_scores::jsonb
+            FROM (VALUES %s) AS v (id, last_run_at, last_scores)
+            WHERE monitors.id = v.id
+            """,
+            updates
+        )
+
+    if alerts:
+        psycopg2.extras.execute_values(
+            cur,
+            """
+            INSERT INTO monitor_alerts (monitor_id, user_id, url, previous_score, score, details)
+            VALUES %s
+            """,
+            alerts
+        )
+        for alert in alerts:
+            print(f"MONITOR ALERT: {alert[2]} dropped {alert[3]} → {alert[4]}")
+
+    conn.commit()
+    cur.close()
+    conn.close()
+    return len(alerts)
+
+
+# -------------------------------------------------------------
+# LOOP
+# -------------------------------------------------------------
+def run_tick(now, scan=None, sleep=time.sleep):
+    if scan is None:
+        from utils.analyzer import run_local_seo_analysis
+        scan = run_local_seo_analysis
+
+    monitors = claim_due(now)
+    if not monitors:
+        return 0
+
+    outcomes = run_batches(host_batches(monitors), scan, sleep)
+    save_outcomes(outcomes, now)
+    return len(monitors)
+
+
+def run_forever(clock=time.time, sleep=time.sleep):
+    from utils.link_cache import LINK_CACHE_PURGE_SECONDS, purge_expired_links
+
+    print("MONITOR SCHEDULER: started")
+    purged_at = None
+    while True:
+        started = clock()
+        try:
+            ran = run_tick(started, sleep=sleep)
+            if ran:
+                print(f"MONITOR SCHEDULER: ran {ran} scans in {clock() - started:.1f}s")
+        except Exception as e:
+            print("MONITOR SCHEDULER ERROR:", e)
+
+        # Housekeeping for the shared link cache rides on this loop
+        if purged_at is None or started - purged_at >= LINK_CACHE_PURGE_SECONDS:
+            purged_at = started
+            try:
+                links, breakers = purge_expired_links()
+                print(f"MONITOR SCHEDULER: purged {links} expired links, {breakers} breakers")
+            except Exception as e:
+                print("LINK CACHE PURGE ERROR:", e)
+        sleep(max(0, MONITOR_TICK_SECONDS - (clock() - started)))
+
+
+# -------------------------------------------------------------
+# SIMULATION (simulated clock, fixture site, scratch schema)
+# -------------------------------------------------------------
+SIM_SCHEMA = "monitor_sim"
+SIM_HOSTS = 6
+SIM_PRO_USERS = 4
+SIM_MONITORS_PER_USER = 8
+SIM_DOWNTIME = 12 * 3600  # the scheduler starts late, so the first tick is a backlog
+
+
+def monitor_fixture(latency=0.2):
+    """Local page that scores well until state["degraded"] is set."""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    state = {"degraded": False}
+    words = " ".join(f"espresso grinder burr{n % 17} portafilter tamp" for n in range(80))
+    healthy = (
+        "<html><head><title>Espresso grinders compared</title>"
+        "<meta name='description' content='Espresso grinder reviews, burr sizes and prices.'>"
+        f"</head><body><h1>Espresso grinders</h1><h2>Burr sizes</h2><p>{words}</p></body></html>"
+    ).encode()
+    thin = b"<html><body><p>Coming soon</p></body></html>"
+
+    class Page(BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = thin if state["degraded"] else healthy
+            time.sleep(latency)
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Page)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, state
+
+
+def sim_schema():
+    """Fresh scratch schema; PGOPTIONS points every new connection at it."""
+    from utils.migrate import REQUIRED_TABLES
+    from utils.history import ensure_partitions
+
+    conn = get_connection()
+    conn.autocommit = True
+    cur = conn.cursor()
+    cur.execute(f"DROP SCHEMA IF EXISTS {SIM_SCHEMA} CASCADE")
+    cur.execute(f"CREATE SCHEMA {SIM_SCHEMA}")
+    cur.execute(f"SET search_path = {SIM_SCHEMA}")
+    cur.execute("CREATE TABLE users (id SERIAL PRIMARY KEY, email TEXT, is_pro BOOLEAN NOT NULL)")
+    for ddl in REQUIRED_TABLES.values():
+        cur.execute(ddl)
+    ensure_partitions(cur)
+    cur.close()
+    conn.close()
+    os.environ["PGOPTIONS"] = f"-c search_path={SIM_SCHEMA}"
+
+
+def drop_sim_schema():
+    os.environ.pop("PGOPTIONS", None)
+    conn = get_connection()
+    conn.autocommit = True
+    cur = conn.cursor()
+    cur.execute(f"DROP SCHEMA IF EXISTS {SIM_SCHEMA} CASCADE")
+    cur.close()
+    conn.close()
+
+
+def simulate(days=2):
+    """Drives run_tick with a simulated clock (one tick per simulated
+    minute) and checks slots, host batching, concurrency bounds and alerts.
+    Scans are real, against a local fixture; host pauses are recorded
+    instead of slept."""
+    from utils.analyzer import run_local_seo_analysis
+    from utils.history import flush_history
+
+    interval = 24 * 3600
+    start = int(time.time()) // interval * interval
+    server, state = monitor_fixture()
+    base = f"http://127.0.0.1:{server.server_port}"
+
+    events = []  # (tick, host, user_id, monitor url)
+    active = {"all": 0}
+    peaks = {}
+    pauses = []
+    lock = threading.Lock()
+    tick = {"now": start}
+
+    def enter(key, step):
+        active[key] = active.get(key, 0) + step
+        peaks[key] = max(peaks.get(key, 0), active[key])
+
+    def scan(url, keyword):
+        host = url_host(url)
+        user = int(url.split("/u")[1].split("/")[0])
+        with lock:
+            events.append((tick["now"], host, user, url))
+            for key in ("all", host, f"user {user}"):
+                enter(key, 1)
+        try:
+            # Same fixture behind every simulated host
+            return run_local_seo_analysis(base + url.split(".test", 1)[1], keyword)
+        finally:
+            with lock:
+                for key in ("all", host, f"user {user}"):
+                    enter(key, -1)
+
+    sim_schema()
+    try:
+        conn = get_connection()
+        cur = conn.cursor()
+        cur.execute(
+            "INSERT INTO users (email, is_pro) SELECT 'sim' || g || '@example.com', g <= %s "
+            "FROM generate_series(1, %s) AS g",
+            (SIM_PRO_USERS, SIM_PRO_USERS + 1)
+        )
+        conn.commit()
+        cur.close()
+        conn.close()
+
+        # The last user is on the free plan: their monitors must never run
+        monitor_ids = []
+        for user_id in range(1, SIM_PRO_USERS + 2):
+            for n in range(SIM_MONITORS_PER_USER):
+                url = f"http://shop{n % SIM_HOSTS}.test/u{user_id}/p{n}"
+                monitor_ids.append(add_monitor(user_id, url, "espresso grinder", 24, now=start))
+        assert None not in monitor_ids
+
+        started = time.perf_counter()
+        for minute in range(SIM_DOWNTIME // 60, days * 24 * 60 + 1):
+            tick["now"] = start + minute * 60
+            state["degraded"] = tick["now"] >= start + interval
+            run_tick(tick["now"], scan, sleep=pauses.append)
+        flush_history()
+        elapsed = time.perf_counter() - started
+
+        conn = get_connection()
+        cur = conn.cursor()
+        cur.execute("SELECT monitor_id, previous_score, score FROM monitor_alerts")
+        alerts = cur.fetchall()
+
+        # Two claimers at once on their own connections, as two monitor
+        # processes would be: every user is due in both halves of the
+        # queue, and still only gets the per-user limit started
+        cur.execute(
+            "UPDATE monitors SET running_until = NULL, "
+            "next_run_at = %s - interval '1 minute' * (%s - (id - 1) %% %s)",
+            (to_timestamp(tick["now"]), SIM_MONITORS_PER_USER, SIM_MONITORS_PER_USER)
+        )
+        conn.commit()
+        cur.close()
+        conn.close()
+        half = SIM_PRO_USERS * SIM_MONITORS_PER_USER // 2
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            claimed = [m for claim in pool.map(lambda _: claim_due(tick["now"], half), range(2))
+                       for m in claim]
+    finally:
+        drop_sim_schema()
+        server.shutdown()
+
+    pro_monitors = SIM_PRO_USERS * SIM_MONITORS_PER_USER
+    slots = {}
+    for user_id in range(1, SIM_PRO_USERS + 1):
+        for n in range(SIM_MONITORS_PER_USER):
+            monitor_id = monitor_ids[(user_id - 1) * SIM_MONITORS_PER_USER + n]
+            slots[f"http://shop{n % SIM_HOSTS}.test/u{user_id}/p{n}"] = start + slot_offset(monitor_id, interval)
+    runs = {}
+    batches = {}
+    for now, host, user, url in events:
+        runs.setdefault(url, []).append(now)
+        batches[(now, host)] = batches.get((now, host), 0) + 1
+    # Monitors whose first slot fell in the downtime drain one per user per tick
+    held = {url for url, slot in slots.items() if slot <= start + SIM_DOWNTIME}
+    backlog_ticks = {runs[url][0] for url in held}
+    backlog = [e for e in events if e[3] in held and e[0] == runs[e[3]][0]]
+    rest = [e for e in events if e not in backlog]
+    busiest = max(sum(1 for now, *_ in rest if now == t) for t in {e[0] for e in rest})
+    hours = {(times[-1] - start) // 3600 for times in runs.values()}
+    # How far each run started after its slot: one tick, plus a tick per
+    # monitor of the same user due ahead of it
+    lags = [times[1] - (slots[url] + interval) for url, times in runs.items()]
+    lags += [times[0] - slots[url] for url, times in runs.items() if url not in held]
+    users_claimed = [m["user_id"] for m in claimed]
+
+    print(f"{days} simulated days in {elapsed:.1f}s: {len(events)} scans, {pro_monitors} pro monitors "
+          f"on {SIM_HOSTS} hosts × {SIM_PRO_USERS} users")
+    print(f"  backlog after {SIM_DOWNTIME // 3600}h down: {len(backlog)} scans over {len(backlog_ticks)} ticks; "
+          f"busiest tick otherwise: {busiest}; second runs spread over {len(hours)} of 24 hours; "
+          f"max lag behind slot {max(lags)}s")
+    print(f"  two concurrent claimers started {len(claimed)} monitors for {len(set(users_claimed))} users")
+    print(f"  peak concurrency {peaks['all']} (limit {MONITOR_CONCURRENCY}), "
+          f"per host {max(v for k, v in peaks.items() if k.startswith('shop'))}, "
+          f"per user {max(v for k, v in peaks.items() if k.startswith('user'))} "
+          f"(limit {MONITOR_PER_USER_CONCURRENCY}); {len(pauses)} host pauses")
+    print(f"  {len(alerts)} alerts after the fixture degraded "
+          f"(drops {sorted({previous - score for _, previous, score in alerts})})")
+
+    # Every pro monitor, once per interval; the free user's never
+    assert len(runs) == pro_monitors, len(runs)
+    assert all(len(times) == days for times in runs.values()), runs
+    assert not any(f"/u{SIM_PRO_USERS + 1}/" in url for url in runs)
+    assert all(0 <= lag < 60 * SIM_MONITORS_PER_USER for lag in lags), lags
+    assert len(backlog_ticks) <= max(sum(1 for url in held if f"/u{u}/" in url) for u in range(1, SIM_PRO_USERS + 1))
+    # Jittered slots, not one pile at the top of the period
+    assert len(hours) >= 12 and busiest <= 3, (hours, busiest)
+    # One request at a time per host, inside the global and per-user bounds
+    assert all(v == 1 for k, v in peaks.items() if k.startswith("shop")), peaks
+    assert 2 <= peaks["all"] <= MONITOR_CONCURRENCY, peaks
+    assert all(v <= MONITOR_PER_USER_CONCURRENCY for k, v in peaks.items() if k.startswith("user")), peaks
+    assert sorted(users_claimed) == sorted(list(range(1, SIM_PRO_USERS + 1)) * MONITOR_PER_USER_CONCURRENCY), claimed
+    # A pause between consecutive scans of the same host in a tick
+    assert len(pauses) == sum(n - 1 for n in batches.values()), (len(pauses), batches)
+    assert all(pause == MONITOR_HOST_DELAY for pause in pauses)
+    # Every second run saw the degraded page
+    assert len(alerts) == pro_monitors, alerts
+    assert all(previous - score >= MONITOR_ALERT_DROP for _, previous, score in alerts)
+
+
+if __name__ == "__main__":
+    if "--simulate" in sys.argv:
+        simulate()
+        sys.exit(0)
+    run_forever()
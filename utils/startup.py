@@ -0,0 +1,115 @@
+import os
+import re
+import subprocess
+import sys
+
+# ============================================================
+# STARTUP REPORT (import time + per-worker memory)
+# ============================================================
+# python -m utils.startup              → import-time table for the app
+# python -m utils.startup --pid 1234   → RSS/PSS of a gunicorn master and
+#                                        its forked workers
+# STARTUP_BUDGET_MS makes the first form exit non-zero when importing the
+# app gets slower than the budget, so startup regressions fail CI.
+
+# Modules the app pulls in lazily; listed so the report shows what each
+# one would cost if it crept back into the import path.
+WATCHED_MODULES = [
+    "app",
+    "flask",
+    "psycopg2",
+    "requests",
+    "bs4",
+    "utils.analyzer",
+    "utils.pdf_builder",
+    "utils.ai_tools",
+    "stripe",
+]
+
+STARTUP_BUDGET_MS = int(os.environ.get("STARTUP_BUDGET_MS", 0))
+
+IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)")
+
+
+# ---------------------------------------------------
+# IMPORT TIME (cold, in a fresh interpreter)
+# ---------------------------------------------------
+def import_time_ms(module):
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    )
+    if result.returncode != 0:
+        return None
+
+    for line in reversed(result.stderr.splitlines()):
+        match = IMPORTTIME_LINE.match(line)
+        if match and match.group(4) == module and not match.group(3).strip(" "):
+            return int(match.group(2)) / 1000
+    return None
+
+
+# ---------------------------------------------------
+# MEMORY (RSS + PSS from /proc)
+# ---------------------------------------------------
+def proc_memory_kb(pid="self"):
+    memory = {"rss_kb": None, "pss_kb": None}
+
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    memory["rss_kb"] = int(line.split()[1])
+        # PSS splits shared (copy-on-write) pages between the processes
+        # sharing them, so it shows what preloading actually saves.
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                if line.startswith("Pss:"):
+                    memory["pss_kb"] = int(line.split()[1])
+    except OSError:
+        pass
+
+    return memory
+
+
+def child_pids(pid):
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as f:
+            return [int(p) for p in f.read().split()]
+    except OSError:
+        return []
+
+
+# ---------------------------------------------------
+# REPORTS
+# ---------------------------------------------------
+def import_report():
+    print(f"{'module':<20} {'import ms':>10}")
+    timings = {}
+    for module in WATCHED_MODULES:
+        timings[module] = import_time_ms(module)
+        value = f"{timings[module]:.1f}" if timings[module] is not None else "error"
+        print(f"{module:<20} {value:>10}")
+    return timings
+
+
+def worker_report(master_pid):
+    rows = [("master", master_pid)] + [("worker", pid) for pid in child_pids(master_pid)]
+    print(f"{'role':<8} {'pid':>8} {'rss_kb':>10} {'pss_kb':>10}")
+    for role, pid in rows:
+        memory = proc_memory_kb(pid)
+        print(f"{role:<8} {pid:>8} {memory['rss_kb'] or '-':>10} {memory['pss_kb'] or '-':>10}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 3 and sys.argv[1] == "--pid":
+        worker_report(int(sys.argv[2]))
+        sys.exit(0)
+
+    timings = import_report()
+    app_ms = timings.get("app")
+    if STARTUP_BUDGET_MS and (app_ms is None or app_ms > STARTUP_BUDGET_MS):
+        print(f"app import {app_ms} ms exceeds STARTUP_BUDGET_MS={STARTUP_BUDGET_MS}")
+        sys.exit(1)
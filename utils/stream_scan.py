@@ -0,0 +1,329 @@
+import codecs
+import glob
+import os
+import re
+import sys
+from html.parser import HTMLParser
+
+import requests
+
+from utils.analyzer import MAX_ASSETS, MAX_LINKS, SYLLABLE_RE, clean_text, empty_features
+from utils.budget import ScanBudget, body_chunks, open_page
+from utils.charset import SNIFF_BYTES, detect_encoding, header_charset
+
+# ============================================================
+# LOW-MEMORY STREAMING SCAN
+# ============================================================
+# Feeds the response body into an event-based tokenizer chunk by chunk
+# and folds every event straight into the feature dict that
+# analyzer.score_features() consumes. No tree and no full-text string
+# is ever built, so peak memory depends on the chunk size and the
+# page's vocabulary rather than on the page size.
+#
+# python -m utils.stream_scan   → feature parity with the DOM path over
+#                                  fixtures/html plus a generated large page
+
+# Text longer than this inside a single node is processed in slices
+# (cut at whitespace so word counts are unaffected).
+MAX_TEXT_BUFFER = 64 * 1024
+
+# Same strings BeautifulSoup's get_text() leaves out
+SKIP_TEXT_TAGS = {"script", "style", "template", "rt", "rp"}
+
+LAST_SPACE = re.compile(r"\s(?=\S*$)")
+
+
+class FeatureParser(HTMLParser):
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.features = empty_features()
+        self.text = []
+        self.text_size = 0
+        self.skip_depth = 0
+        self.h1_open = []  # one entry per open <h1>: its slot in features["h1"] or None
+        self.h1_parts = {}  # slot → text parts
+        self.title_state = None  # None → not seen, "open", "done"
+        self.title_parts = []
+        self.canonical_seen = False
+        self.nodes = 0
+        self.last_word = None  # bigrams run across text nodes, as in get_text()
+
+    # -------------------------------
+    # TEXT NODES
+    # -------------------------------
+    def handle_data(self, data):
+        if self.skip_depth:
+            return
+        self.text.append(data)
+        self.text_size += len(data)
+
+        if self.text_size > MAX_TEXT_BUFFER and not self.h1_open and self.title_state != "open":
+            self.flush_text(partial=True)
+
+    def flush_text(self, partial=False):
+        if not self.text:
+            return
+
+        text = "".join(self.text)
+        self.text = []
+        self.text_size = 0
+
+        if partial:
+            cut = LAST_SPACE.search(text)
+            if cut:
+                self.text = [text[cut.end():]]
+                self.text_size = len(self.text[0])
+                text = text[:cut.start()]
+
+        self.count_text(text)
+
+        # Text inside nested <h1>s belongs to every open one, as in get_text()
+        stripped = text.strip() if self.h1_parts else ""
+        if stripped:
+            for parts in self.h1_parts.values():
+                parts.append(stripped)
+        if self.title_state == "open":
+            self.title_parts.append(text)
+
+    def count_text(self, text):
+        f = self.features
+
+        words = text.split()
+        f["raw_words"] += len(words)
+        f["sentences"] += text.count('.') + text.count('!') + text.count('?')
+        f["syllables"] += sum(len(SYLLABLE_RE.findall(w)) for w in words)
+
+        clean = clean_text(text).split()
+        f["word_count"] += len(clean)
+        f["term_counts"].update(clean)
+        if clean:
+            sequence = [self.last_word] + clean if self.last_word else clean
+            f["bigram_counts"].update(map(" ".join, zip(sequence, sequence[1:])))
+            self.last_word = clean[-1]
+
+    def unknown_decl(self, data):
+        self.flush_text()
+        if data.upper().startswith("CDATA[") and not self.skip_depth:
+            self.count_text(data[len("CDATA["):])
+
+    def handle_comment(self, data):
+        self.flush_text()
+
+    def handle_decl(self, decl):
+        self.flush_text()
+
+    def handle_pi(self, data):
+        self.flush_text()
+
+    # -------------------------------
+    # TAGS
+    # -------------------------------
+    def handle_starttag(self, tag, attrs):
+        self.nodes += 1
+        self.flush_text()
+        f = self.features
+        attrs = dict(attrs)
+
+        if tag in SKIP_TEXT_TAGS:
+            self.skip_depth += 1
+            if tag == "script" and attrs.get("type") == "application/ld+json":
+                f["schema"] = True
+            if tag == "script" and attrs.get("src"):
+                self.add_asset("script", attrs["src"])
+
+        elif tag == "title":
+            if self.title_state is None:
+                self.title_state = "open"
+
+        elif tag == "meta":
+            name = attrs.get("name")
+            if name == "description" and f["description"] is None:
+                f["description"] = attrs.get("content") or ""
+            elif name == "viewport":
+                f["viewport"] = True
+
+        elif tag == "link":
+            rel = (attrs.get("rel") or "").split()
+            if "canonical" in rel and not self.canonical_seen:
+                f["canonical"] = attrs.get("href")
+                self.canonical_seen = True
+            if "stylesheet" in rel and attrs.get("href"):
+                self.add_asset("stylesheet", attrs["href"])
+
+        elif tag == "h1":
+            # The slot is taken at the start tag so nested headings keep
+            # document order (outer first), like soup.find_all("h1")
+            f["h1_count"] += 1
+            slot = None
+            if len(f["h1"]) < 3:
+                slot = len(f["h1"])
+                f["h1"].append("")
+                self.h1_parts[slot] = []
+            self.h1_open.append(slot)
+
+        elif tag == "h2":
+            f["h2_count"] += 1
+
+        elif tag == "h3":
+            f["h3_count"] += 1
+
+        elif tag == "img":
+            f["img_count"] += 1
+            if attrs.get("alt"):
+                f["img_with_alt"] += 1
+            if attrs.get("src"):
+                self.add_asset("image", attrs["src"])
+                if len(f["images"]) < MAX_ASSETS:
+                    f["images"].append((attrs["src"], attrs.get("width"), attrs.get("height")))
+
+        elif tag == "a":
+            href = attrs.get("href")
+            if href and len(f["links"]) < MAX_LINKS:
+                f["links"].append((href, "nofollow" in (attrs.get("rel") or "").split()))
+
+        elif tag == "base":
+            if f["base_href"] is None and attrs.get("href") is not None:
+                f["base_href"] = attrs["href"]
+
+    def add_asset(self, kind, src):
+        if len(self.features["assets"]) < MAX_ASSETS:
+            self.features["assets"].append((kind, src))
+
+    def handle_endtag(self, tag):
+        self.flush_text()
+
+        if tag in SKIP_TEXT_TAGS:
+            self.skip_depth = max(0, self.skip_depth - 1)
+        elif tag == "ruby":
+            self.skip_depth = 0
+
+        elif tag == "title" and self.title_state == "open":
+            self.features["title"] = "".join(self.title_parts)
+            self.title_parts = []
+            self.title_state = "done"
+
+        elif tag == "h1" and self.h1_open:
+            self.close_h1(self.h1_open.pop())
+
+    def close_h1(self, slot):
+        if slot is not None:
+            self.features["h1"][slot] = "".join(self.h1_parts.pop(slot))
+
+    def finish(self):
+        self.close()
+        self.flush_text()
+
+        f = self.features
+        if self.title_state == "open":
+            f["title"] = "".join(self.title_parts)
+        while self.h1_open:
+            self.close_h1(self.h1_open.pop())
+        return f
+
+
+# ---------------------------------------------------
+# FEED ANY ITERABLE OF TEXT CHUNKS
+# ---------------------------------------------------
+def features_from_chunks(chunks, budget=None):
+    parser = FeatureParser()
+    for chunk in chunks:
+        parser.feed(chunk)
+        if budget is not None and parser.nodes >= budget.max_nodes:
+            budget.truncate("parse", "max_nodes")
+            break
+    return parser.finish()
+
+
+# ---------------------------------------------------
+# FETCH + STREAM-PARSE PAGE
+# ---------------------------------------------------
+def make_decoder(head, declared):
+    encoding, _ = detect_encoding(head, declared)
+    return codecs.getincrementaldecoder(encoding)(errors="replace")
+
+
+def stream_features(url, budget=None):
+    budget = budget or ScanBudget()
+    response = open_page(url, budget)
+    if response is None:
+        return None
+
+    try:
+        with response:
+            declared = header_charset(response.headers.get("Content-Type"))
+
+            def chunks():
+                # Hold back the first SNIFF_BYTES so BOM / <meta charset>
+                # can pick the decoder before any text is parsed
+                head, decoder = b"", None
+                for raw in body_chunks(response, budget):
+                    if decoder is None:
+                        head += raw
+                        if len(head) < SNIFF_BYTES:
+                            continue
+                        raw, decoder = head, make_decoder(head, declared)
+                    yield decoder.decode(raw)
+                if decoder is None:
+                    raw, decoder = head, make_decoder(head, declared)
+                    yield decoder.decode(raw)
+                yield decoder.decode(b"", final=True)
+
+            return features_from_chunks(chunks(), budget)
+
+    # html.parser rejects some malformed declarations (e.g. "<![foo[")
+    # with an AssertionError; the DOM path fails on the same markup
+    except (requests.RequestException, AssertionError) as e:
+        print("STREAM SCAN ERROR:", url, repr(e))
+        return None
+
+
+# ---------------------------------------------------
+# PARITY CHECK (streaming vs. DOM features)
+# ---------------------------------------------------
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "fixtures", "html")
+PARITY_CHUNK_SIZES = (1, 7, 100, 4096)
+
+
+def large_page(paragraphs=400):
+    """Multi-MB page with text nodes longer than MAX_TEXT_BUFFER."""
+    words = "grinder burr espresso retention dial roast light flat conical dose".split()
+    body = " ".join(words[i % len(words)] for i in range(MAX_TEXT_BUFFER // 4))
+    parts = ["<html><head><title>Large listing</title></head><body><h1>Listing</h1>"]
+    for i in range(paragraphs):
+        parts.append(f"<p>Item {i}. {body if i % 50 == 0 else body[:2000]}</p><a href='/item/{i}'>item</a>")
+    parts.append("</body></html>")
+    return "".join(parts)
+
+
+def feature_diff(expected, actual):
+    return {key: (expected[key], actual[key]) for key in expected if expected[key] != actual[key]}
+
+
+def check_parity(directory=FIXTURE_DIR):
+    from bs4 import BeautifulSoup
+    from utils.analyzer import extract_features
+
+    pages = [(os.path.basename(path), open(path, encoding="utf-8").read())
+             for path in sorted(glob.glob(os.path.join(directory, "*.html")))]
+    pages.append(("generated large page", large_page()))
+
+    failures = 0
+    for name, html in pages:
+        expected = extract_features(BeautifulSoup(html, "html.parser"))
+        for size in PARITY_CHUNK_SIZES if len(html) < 100_000 else PARITY_CHUNK_SIZES[-1:]:
+            actual = features_from_chunks(html[i:i + size] for i in range(0, len(html), size))
+            diff = feature_diff(expected, actual)
+            if diff:
+                failures += 1
+                print(f"MISMATCH {name} @ {size} chars: {sorted(diff)}")
+        print(f"{name:<32} {len(html):>9} chars  {expected['word_count']:>7} words  h1 {expected['h1']}")
+
+    assert pages[:-1], f"no fixtures in {directory}"
+    assert not failures, f"{failures} mismatches"
+    print(f"{len(pages)} pages identical on both paths")
+
+
+if __name__ == "__main__":
+    check_parity(sys.argv[1] if len(sys.argv) > 1 else FIXTURE_DIR)
+    sys.exit(0)
@@ -0,0 +1,55 @@
+import posixpath
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+DEFAULT_PORTS = {"http": 80, "https": 443}
+TRACKING_PREFIXES = ("utm_",)
+TRACKING_PARAMS = {"gclid", "fbclid", "mc_cid", "mc_eid"}
+
+
+# ---------------------------------------------------
+# NORMALIZE URL (cache keys, dedupe)
+# ---------------------------------------------------
+# Lowercases scheme/host, drops default ports, fragments and tracking
+# parameters, resolves dot segments and sorts the query, so trivially
+# different spellings of one URL map to the same key.
+def normalize_url(url):
+    try:
+        parts = urlsplit(url.strip())
+    except ValueError:
+        return None
+
+    scheme = parts.scheme.lower()
+    if scheme not in DEFAULT_PORTS or not parts.hostname:
+        return None
+
+    host = parts.hostname.lower().rstrip(".")
+    try:
+        port = parts.port
+    except ValueError:
+        return None
+    if port and port != DEFAULT_PORTS[scheme]:
+        host = f"{host}:{port}"
+
+    path = parts.path or "/"
+    if "." in path:
+        trailing = path.endswith("/")
+        path = posixpath.normpath(path)
+        if path.startswith("//"):
+            path = "/" + path.lstrip("/")
+        if trailing and path != "/":
+            path += "/"
+
+    query = [
+        (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if k not in TRACKING_PARAMS and not k.startswith(TRACKING_PREFIXES)
+    ]
+    query.sort()
+
+    return urlunsplit((scheme, host, path, urlencode(query), ""))
+
+
+def url_host(url):
+    try:
+        return (urlsplit(url).hostname or "").lower()
+    except ValueError:
+        return ""
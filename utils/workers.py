@@ -0,0 +1,222 @@
+import multiprocessing
+import os
+import signal
+import sys
+import threading
+import time
+import weakref
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+# ============================================================
+# CPU WORKER POOL
+# ============================================================
+# With threaded gunicorn workers, BeautifulSoup parsing, get_text, the
+# clean_text regexes and readability all hold the GIL and serialize
+# across requests. When ANALYZER_PROCESS_POOL=1 those stages run in a
+# persistent pool of worker processes instead:
+#   - workers are pre-warmed (heavy imports done before the first scan)
+#   - each worker is recycled after ANALYZER_POOL_MAX_TASKS tasks
+#   - at most ANALYZER_POOL_MAX_PENDING tasks are queued (backpressure);
+#     callers wait up to ANALYZER_POOL_WAIT seconds for a slot, then
+#     run the task inline
+#   - a task that crashes its worker (segfault, OOM kill) fails with
+#     WorkerCrashed and is never re-run in the web process; the pool is
+#     rebuilt for the next caller
+#   - a task gets ANALYZER_POOL_TASK_TIMEOUT seconds: the worker stops it
+#     with SIGALRM; if the worker is stuck where the signal can't land
+#     (inside C code), the caller terminates the pool's processes so the
+#     slot is not held until the task finishes. Other tasks on that pool
+#     are resubmitted once to the new pool; tasks still queued when the
+#     caller gives up are cancelled and run inline.
+#   - gunicorn's post_fork hook pre-warms each web worker's pool
+#
+# python -m utils.workers   → scans/s inline vs. pooled at 1..N threads
+
+POOL_ENABLED = os.environ.get("ANALYZER_PROCESS_POOL", "0") == "1"
+POOL_WORKERS = int(os.environ.get("ANALYZER_POOL_WORKERS", os.cpu_count() or 2))
+POOL_MAX_TASKS = int(os.environ.get("ANALYZER_POOL_MAX_TASKS", 200))
+POOL_MAX_PENDING = int(os.environ.get("ANALYZER_POOL_MAX_PENDING", POOL_WORKERS * 2))
+POOL_WAIT = float(os.environ.get("ANALYZER_POOL_WAIT", 5))
+POOL_TASK_TIMEOUT = float(os.environ.get("ANALYZER_POOL_TASK_TIMEOUT", 30))
+POOL_KILL_GRACE = 2  # seconds past the timeout before workers are terminated
+
+_pool = None
+_pool_lock = threading.Lock()
+_slots = threading.BoundedSemaphore(POOL_MAX_PENDING)
+_terminated = weakref.WeakSet()  # pools we killed on purpose
+
+
+class WorkerCrashed(RuntimeError):
+    pass
+
+
+class TrackedContext:
+    """The spawn context, remembering the processes it starts, so a stuck
+    pool's workers can be terminated without executor internals."""
+
+    def __init__(self):
+        self.context = multiprocessing.get_context("spawn")
+        self.processes = weakref.WeakSet()
+
+    def __getattr__(self, name):
+        return getattr(self.context, name)
+
+    def Process(self, *args, **kwargs):
+        process = self.context.Process(*args, **kwargs)
+        self.processes.add(process)
+        return process
+
+
+def pool_enabled():
+    return POOL_ENABLED
+
+
+# ---------------------------------------------------
+# WORKER INITIALIZER (pre-warm imports)
+# ---------------------------------------------------
+def warm_worker():
+    import bs4  # noqa: F401
+    import utils.analyzer  # noqa: F401
+
+
+def _noop():
+    return os.getpid()
+
+
+class TaskTimeout(Exception):
+    pass
+
+
+def _alarm(signum, frame):
+    raise TaskTimeout()
+
+
+def run_limited(fn, args, seconds):
+    """Runs in the worker: stops fn after `seconds` so the worker is freed."""
+    previous = signal.signal(signal.SIGALRM, _alarm)
+    signal.setitimer(signal.ITIMER_REAL, seconds)
+    try:
+        return fn(*args)
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+
+# ---------------------------------------------------
+# POOL LIFECYCLE
+# ---------------------------------------------------
+def get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # max_tasks_per_child needs a non-fork start method; spawn is
+            # also the safe choice from inside a threaded server.
+            context = TrackedContext()
+            _pool = ProcessPoolExecutor(
+                max_workers=POOL_WORKERS,
+                mp_context=context,
+                initializer=warm_worker,
+                max_tasks_per_child=POOL_MAX_TASKS,
+            )
+            _pool.context = context
+        return _pool
+
+
+def reset_pool(broken, terminate=False):
+    global _pool
+    with _pool_lock:
+        if _pool is broken:
+            _pool = None
+    if terminate:
+        # Executor has no per-task kill; other tasks on this pool fail with
+        # BrokenProcessPool and are resubmitted by their callers
+        _terminated.add(broken)
+        for process in list(broken.context.processes):
+            if process.is_alive():
+                process.terminate()
+    broken.shutdown(wait=False, cancel_futures=True)
+
+
+def prewarm_pool():
+    pool = get_pool()
+    futures = [pool.submit(_noop) for _ in range(POOL_WORKERS)]
+    return sorted({f.result() for f in futures})
+
+
+def shutdown_pool():
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=True)
+
+
+# ---------------------------------------------------
+# RUN A TASK (module-level function + picklable args)
+# ---------------------------------------------------
+def run_in_pool(fn, *args):
+    if not POOL_ENABLED:
+        return fn(*args)
+
+    if not _slots.acquire(timeout=POOL_WAIT):
+        print("WORKER POOL: saturated, running inline")
+        return fn(*args)
+
+    try:
+        for attempt in range(2):
+            pool = get_pool()
+            future = pool.submit(run_limited, fn, args, POOL_TASK_TIMEOUT)
+            try:
+                return future.result(timeout=POOL_TASK_TIMEOUT + POOL_KILL_GRACE)
+            except BrokenProcessPool as e:
+                reset_pool(pool)
+                if pool in _terminated and attempt == 0:
+                    print("WORKER POOL: pool was terminated under this task, resubmitting")
+                    continue
+                # This input may be what killed the worker: it must not run
+                # in the web process
+                print("WORKER POOL: worker crashed, rebuilding pool")
+                raise WorkerCrashed("pool worker died running this task") from e
+            except TaskTimeout:
+                raise TimeoutError(f"pool task exceeded {POOL_TASK_TIMEOUT}s")
+            except TimeoutError:
+                if future.cancel():
+                    print("WORKER POOL: task never started, running inline")
+                    return fn(*args)
+                print("WORKER POOL: task ignored its time limit, terminating workers")
+                reset_pool(pool, terminate=True)
+                raise
+    finally:
+        _slots.release()
+
+
+# ---------------------------------------------------
+# BENCHMARK (inline vs. pooled under threads)
+# ---------------------------------------------------
+def benchmark(scans=48, thread_counts=(1, 2, 4)):
+    global POOL_ENABLED
+    from concurrent.futures import ThreadPoolExecutor
+    from utils.analyzer import analyze_html
+    from utils.stream_scan import large_page
+
+    raw = large_page(60).encode()
+    print(f"{os.cpu_count()} CPU(s), {POOL_WORKERS} pool workers, {len(raw) // 1024} KB page, {scans} scans")
+
+    prewarm_pool()
+    for pooled in (False, True):
+        POOL_ENABLED = pooled
+        for threads in thread_counts:
+            started = time.perf_counter()
+            with ThreadPoolExecutor(threads) as executor:
+                list(executor.map(lambda _: run_in_pool(analyze_html, raw, "utf-8"), range(scans)))
+            rate = scans / (time.perf_counter() - started)
+            print(f"{'pooled' if pooled else 'inline':<7} {threads} thread(s): {rate:6.1f} scans/s")
+    shutdown_pool()
+
+
+if __name__ == "__main__":
+    # Through the package module, so pickled tasks resolve in the workers
+    from utils.workers import benchmark
+    benchmark()
+    sys.exit(0)